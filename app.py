@@ -3,52 +3,42 @@ import os
 import json
 import time
 import asyncio
-from main import render_and_extract
+from config.tools import read_json_cached, is_cloud_environment
+from utils import jobs
+from utils.jobs import JobRegistry, JobReporter, JobLimitReached
 import platform
 import glob
 import sys
-
-# Ensure directories exist
-os.makedirs("outputs", exist_ok=True)
-os.makedirs("status", exist_ok=True)
+import uuid
 
 # Enable debug mode
 DEBUG_MODE = False  # Set to True to see debug information
 
-# File paths for status communication
-STATUS_FILE = "status/current_status.txt"
-PROPERTIES_FILE = "status/properties.json"
-LOG_FILE = "status/log.txt"
-ACTIVE_FILE = "status/active.txt"
-PAGE_INFO_FILE = "status/page_info.json"  # New file to track page progress
-
-# Clean up any stale status files on startup
-def cleanup_stale_files():
-    # Check if active file exists but is stale (older than 30 minutes)
-    if os.path.exists(ACTIVE_FILE):
-        try:
-            with open(ACTIVE_FILE, "r") as f:
-                start_time = float(f.read().strip())
-                if time.time() - start_time > 30 * 60:  # 30 minutes
-                    # This is a stale file, remove it
-                    os.remove(ACTIVE_FILE)
-                    if os.path.exists(STATUS_FILE):
-                        with open(STATUS_FILE, "w") as f:
-                            f.write("Ready")
-        except:
-            # If there's any issue reading the file, just remove it
-            os.remove(ACTIVE_FILE)
-
-# Run cleanup on startup
-cleanup_stale_files()
-
-# Set up page
+# One-time startup work, shared by every session and rerun of this server process
+@st.cache_resource
+def startup():
+    # Ensure directories exist
+    os.makedirs("outputs", exist_ok=True)
+    os.makedirs("status", exist_ok=True)
+    # Drop old jobs and release any left behind by a previous server
+    get_job_registry().cleanup()
+    return True
+
+# Scrape jobs of every session; each session follows its own job through st.session_state.job_id
+@st.cache_resource
+def get_job_registry():
+    config = read_json_cached("config/config.json")
+    return JobRegistry(config.get("maxConcurrentJobs", 3))
+
+# Set up page; this has to be the first Streamlit call of every run
 st.set_page_config(
     page_title="AI Estate Scraper",
     page_icon="🏠",
     layout="wide"
 )
 
+startup()
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -174,369 +164,151 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Helper functions for file operations
+# Helper functions for this session's job files
+def current_job():
+    """Id of this session's current job, or None before the first one"""
+    return st.session_state.get("job_id")
+
+def session_id():
+    """Stable id of this browser session, recorded as the owner of its jobs"""
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
 def write_status(message):
-    """Write a status message to the status file"""
-    with open(STATUS_FILE, "w") as f:
-        f.write(message)
-    
-    # Also append to log with timestamp
-    with open(LOG_FILE, "a") as f:
-        timestamp = time.strftime('%H:%M:%S')
-        f.write(f"[{timestamp}] {message}\n")
+    """Write a status message to the current job's status file and log"""
+    log_config = read_json_cached("config/config.json").get("logging")
+    JobReporter(current_job(), flush_interval=None, log_config=log_config)("status", message)
 
 def read_status():
-    """Read the current status from the status file"""
-    if os.path.exists(STATUS_FILE):
-        with open(STATUS_FILE, "r") as f:
-            return f.read().strip()
-    return "Ready"
+    """Read the current job's status"""
+    job_id = current_job()
+    return jobs.read_status(job_id) if job_id else "Ready"
 
 def read_log():
-    """Read the log file"""
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r") as f:
-            return f.readlines()
-    return []
+    """Read the current job's log"""
+    job_id = current_job()
+    return jobs.read_log(job_id) if job_id else []
 
 def read_properties():
-    """Read the properties file"""
-    if os.path.exists(PROPERTIES_FILE):
-        try:
-            with open(PROPERTIES_FILE, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return []
-    return []
-
-def write_properties(properties):
-    """Write properties to the properties file"""
-    with open(PROPERTIES_FILE, "w") as f:
-        json.dump(properties, f, indent=4)
-
-def is_scraping_active():
-    """Check if scraping is active"""
-    return os.path.exists(ACTIVE_FILE)
-
-def mark_as_active():
-    """Mark scraping as active"""
-    with open(ACTIVE_FILE, "w") as f:
-        f.write(str(time.time()))
-
-def mark_as_inactive():
-    """Mark scraping as inactive"""
-    if os.path.exists(ACTIVE_FILE):
-        os.remove(ACTIVE_FILE)
-
-def write_page_info(current_page, total_pages=None):
-    """Write page progress information"""
-    info = {
-        "current_page": current_page,
-        "total_pages": total_pages
-    }
-    with open(PAGE_INFO_FILE, "w") as f:
-        json.dump(info, f)
+    """Read the current job's properties"""
+    job_id = current_job()
+    if not job_id:
+        return []
+    demo = st.session_state.get("demo")
+    if demo and demo["job_id"] == job_id:
+        # Demo jobs show the in-memory snapshot instead of a copy on disk
+        return load_demo_properties()[:demo_shown_count(demo)]
+    return jobs.read_properties(job_id)
 
 def read_page_info():
-    """Read page progress information"""
-    if os.path.exists(PAGE_INFO_FILE):
-        try:
-            with open(PAGE_INFO_FILE, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return {"current_page": 1, "total_pages": None}
-    return {"current_page": 1, "total_pages": None}
-
-# Progress callback
-def status_callback(update_type, data):
-    """Callback function for scraping progress"""
-    if update_type == "status":
-        write_status(data)
+    """Read the current job's page progress"""
+    job_id = current_job()
+    return jobs.read_page_info(job_id) if job_id else {"current_page": 1, "total_pages": None}
+
+def read_usage():
+    """The current job's LLM token, cost and latency accounting (see utils/usage.py)"""
+    job_id = current_job()
+    return jobs.read_metrics(job_id).get("usage") if job_id else None
+
+def usage_text(usage):
+    """Statistics panel lines for a job's LLM usage"""
+    if not usage or not usage.get("listings"):
+        return ""
+    per_minute = usage.get("listings_per_minute")
+    cost = f"~${usage['cost']:.4f}" + (" (some models unpriced)" if usage.get("unpriced_models") else "")
+    return f"""
+        Tokens per listing: {usage['tokens_per_listing']:.0f}
         
-        # Track page progress
-        if "Moving to page" in data:
-            parts = data.split()
-            try:
-                page_num = int(parts[-1])
-                write_page_info(page_num)
-            except (ValueError, IndexError):
-                pass
-        elif "No further pages to scrape" in data:
-            page_info = read_page_info()
-            write_page_info(page_info["current_page"], page_info["current_page"])
-            
-    elif update_type == "property":
-        # Read current properties, add new one, write back
-        properties = read_properties()
-        properties.append(data)
-        write_properties(properties)
-        # Also log the property
-        with open(LOG_FILE, "a") as f:
-            timestamp = time.strftime('%H:%M:%S')
-            f.write(f"[{timestamp}] Found property: {data.get('address', 'Unknown')} - {data.get('price', 'N/A')}\n")
-    elif update_type == "complete":
-        write_status(f"Completed! Found {data} properties.")
-        mark_as_inactive()
-
-# Function to run the scraping process in a subprocess
-def run_scraper(location, headless):
-    import subprocess
-    import sys
-    
+        Listings per minute: {f"{per_minute:.1f}" if per_minute else "-"}
+        
+        Estimated LLM cost: {cost} (~${usage['cost_per_listing'] * 1000:.3f} per 1,000 listings)
+        """
+
+def read_cpu_profile():
+    """The current job's CPU profile summary, if it was profiled"""
+    from utils.cpuprofile import summary_path
+    job_id = current_job()
+    if not job_id:
+        return None
+    try:
+        with open(summary_path(jobs.job_paths(job_id)["profile"]), "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def is_scraping_active():
+    """Check if this session's job is queued or running"""
+    job_id = current_job()
+    return bool(job_id) and get_job_registry().is_active(job_id)
+
+def load_demo_job(message, location="demo", stream=False):
+    """Show the pre-scraped data as a finished job of this session, optionally revealed a few listings at a time"""
+    st.session_state.demo_loaded = True
+    st.session_state.job_id = get_job_registry().create(location, owner=session_id(), state="done")
+    st.session_state.demo = {"job_id": current_job(), "started": time.time(), "stream": stream}
+    write_status(message)
+    # Set basic state for UI continuity
+    jobs.write_page_info(current_job(), {"current_page": 1, "total_pages": 1})
+
+# Listings revealed per second when demo data is streamed
+DEMO_STREAM_RATE = 10
+
+def demo_shown_count(demo):
+    """How many demo listings are visible so far"""
+    total = len(load_demo_properties())
+    if not demo["stream"]:
+        return total
+    return min(total, int((time.time() - demo["started"]) * DEMO_STREAM_RATE) + 1)
+
+def is_demo_streaming():
+    demo = st.session_state.get("demo")
+    return bool(demo) and demo["job_id"] == current_job() and demo_shown_count(demo) < len(load_demo_properties())
+
+# The scraper worker process is started once per server and shared by all sessions
+@st.cache_resource
+def get_scraper_worker():
+    from utils.worker import ScraperWorker
+    return ScraperWorker()
+
+# Function to run the scraping process in the background worker
+def run_scraper(location, headless, limits=None, profile=False):
     # Check if running in cloud environment
     if is_cloud_environment():
         st.error("Cannot run live scraping in cloud environment. Using demo data instead.")
-        st.session_state.demo_loaded = True
-        write_status(f"Cloud environment detected - using demo data for {location}")
-        # Set basic state for UI continuity
-        write_properties(load_prescraped_data())
-        write_page_info(1, 1)
+        load_demo_job(f"Cloud environment detected - using demo data for {location}", location)
         return
     
-    # Clear previous status files
-    if os.path.exists(STATUS_FILE):
-        os.remove(STATUS_FILE)
-    if os.path.exists(PROPERTIES_FILE):
-        os.remove(PROPERTIES_FILE)
-    if os.path.exists(LOG_FILE):
-        os.remove(LOG_FILE)
-    if os.path.exists(ACTIVE_FILE):
-        os.remove(ACTIVE_FILE)
-    if os.path.exists(PAGE_INFO_FILE):
-        os.remove(PAGE_INFO_FILE)
+    # Register the job; other sessions' jobs keep running alongside it up to the cap
+    try:
+        job_id = get_job_registry().create(location, owner=session_id())
+    except JobLimitReached as e:
+        st.error(f"Too many scrapes in progress ({e}). Please try again in a few minutes.")
+        return
+    st.session_state.job_id = job_id
+    st.session_state.demo_loaded = False
     
     # Write initial status
     write_status(f"Starting scrape for {location}...")
-    write_properties([])
-    write_page_info(1)
-    mark_as_active()
-    
-    # Create a very simple script without trying to use f-strings for the boolean
-    with open("run_scraper.py", "w") as f:
-        f.write("""
-import asyncio
-import os
-import json
-import time
-import sys
-import traceback
-from main import render_and_extract
-
-# Get command line arguments
-if len(sys.argv) < 3:
-    print("Error: Missing arguments")
-    sys.exit(1)
-
-location = sys.argv[1]
-headless_str = sys.argv[2]
-headless = (headless_str.lower() == 'true')
-
-# Function to check if running in cloud environment
-def is_cloud_environment():
-    # Check for common cloud environment indicators
-    if (os.environ.get("STREAMLIT_CLOUD") is not None or 
-            os.environ.get("IS_CLOUD_ENV") is not None or 
-            "streamlit.app" in os.environ.get("HOSTNAME", "") or 
-            os.path.exists("/.dockerenv")):
-        return True
     
-    # Check for Streamlit Cloud specific paths
-    if (os.path.exists("/mount/src") or 
-            "/home/adminuser/venv" in sys.path or 
-            os.path.exists("/home/adminuser/venv")):
-        return True
-        
-    # Check if we're running in a path that looks like Streamlit Cloud
-    current_path = os.getcwd()
-    if "/mount/src" in current_path:
-        return True
-        
-    return False
-
-# Status file paths
-STATUS_FILE = "status/current_status.txt"
-PROPERTIES_FILE = "status/properties.json"
-LOG_FILE = "status/log.txt"
-ACTIVE_FILE = "status/active.txt"
-PAGE_INFO_FILE = "status/page_info.json"
-
-# Function to load pre-scraped demo data
-def load_demo_data():
+    # Hand the job to the persistent worker, starting (or restarting) it if needed
+    worker = get_scraper_worker()
+    if not worker.is_alive():
+        get_scraper_worker.clear()
+        worker = get_scraper_worker()
+    worker.submit(job_id, location, headless, limits, profile)
+
+# Mark jobs whose runner went away as failed, at most once every few seconds per session
+ACTIVE_CHECK_INTERVAL = 5  # seconds
+if time.time() - st.session_state.get("last_active_check", 0) > ACTIVE_CHECK_INTERVAL:
+    st.session_state.last_active_check = time.time()
+    get_job_registry().cleanup()
+
+# Pre-scraped demo data, loaded once per server process from its snapshot (see utils/demo.py)
+def load_demo_properties():
+    from utils.demo import load_demo_properties as load_snapshot
     try:
-        with open("outputs/outputs.json", "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading demo data: {e}")
-        return []
-
-# Make sure to mark as inactive when exiting
-def ensure_inactive():
-    if os.path.exists(ACTIVE_FILE):
-        try:
-            os.remove(ACTIVE_FILE)
-            print("Marked as inactive on exit")
-        except:
-            pass
-
-# Status callback
-def status_callback(update_type, data):
-    if update_type == "status":
-        with open(STATUS_FILE, "w") as f:
-            f.write(data)
-        # Also append to log with timestamp
-        with open(LOG_FILE, "a") as f:
-            timestamp = time.strftime('%H:%M:%S')
-            f.write(f"[{timestamp}] {data}\\n")
-            
-        # Track page progress
-        if "Moving to page" in data:
-            parts = data.split()
-            try:
-                page_num = int(parts[-1])
-                # Update page info
-                page_info = {"current_page": page_num, "total_pages": None}
-                with open(PAGE_INFO_FILE, "w") as f:
-                    json.dump(page_info, f)
-            except (ValueError, IndexError):
-                pass
-        elif "No further pages to scrape" in data:
-            # We've reached the last page
-            try:
-                with open(PAGE_INFO_FILE, "r") as f:
-                    page_info = json.load(f)
-                page_info["total_pages"] = page_info["current_page"]
-                with open(PAGE_INFO_FILE, "w") as f:
-                    json.dump(page_info, f)
-            except:
-                pass
-            
-    elif update_type == "property":
-        # Read current properties, add new one, write back
-        properties = []
-        if os.path.exists(PROPERTIES_FILE):
-            try:
-                with open(PROPERTIES_FILE, "r") as f:
-                    properties = json.load(f)
-            except:
-                properties = []
-        properties.append(data)
-        with open(PROPERTIES_FILE, "w") as f:
-            json.dump(properties, f, indent=4)
-        # Also log the property
-        with open(LOG_FILE, "a") as f:
-            timestamp = time.strftime('%H:%M:%S')
-            f.write(f"[{timestamp}] Found property: {data.get('address', 'Unknown')} - {data.get('price', 'N/A')}\\n")
-    elif update_type == "complete":
-        with open(STATUS_FILE, "w") as f:
-            f.write(f"Completed! Found {data} properties.")
-        ensure_inactive()
-
-async def main():
-    try:
-        # Check if running in cloud environment
-        if is_cloud_environment():
-            print("Cloud environment detected - using demo data instead of scraping")
-            with open(STATUS_FILE, "w") as f:
-                f.write(f"Using pre-scraped demo data instead of live scraping")
-                
-            # Load demo data
-            demo_properties = load_demo_data()
-            for prop in demo_properties:
-                status_callback("property", prop)
-                await asyncio.sleep(0.1)  # Small delay between properties
-                
-            status_callback("complete", len(demo_properties))
-            return
-            
-        print(f"Starting scraping process for {location} with headless={headless}")
-        await render_and_extract(
-            location=location,
-            headless_browser=headless,
-            running_from_file=True,
-            callback=status_callback
-        )
-    except Exception as e:
-        error_msg = str(e)
-        print(f"Error: {error_msg}")
-        with open(STATUS_FILE, "w") as f:
-            f.write(f"Error: {error_msg}")
-        with open(LOG_FILE, "a") as f:
-            timestamp = time.strftime('%H:%M:%S')
-            f.write(f"[{timestamp}] Error: {error_msg}\\n")
-        traceback.print_exc()
-    finally:
-        ensure_inactive()
-
-if __name__ == "__main__":
-    try:
-        asyncio.run(main())
-    except Exception as e:
-        print(f"Unhandled exception: {str(e)}")
-        with open(STATUS_FILE, "w") as f:
-            f.write(f"Scraping failed with error: {str(e)}")
-        traceback.print_exc()
-    finally:
-        # Always make sure we mark scraping as inactive
-        ensure_inactive()
-""")
-    
-    # Launch the process with command line arguments for location and headless
-    subprocess.Popen([
-        sys.executable, 
-        "run_scraper.py", 
-        location, 
-        str(headless)
-    ])
-
-# Check if active process is stale
-def check_active_process():
-    """Check if the active process is stale (hasn't updated status in a while)"""
-    if not is_scraping_active():
-        return False
-    
-    # Check if the status file was recently updated
-    if os.path.exists(STATUS_FILE):
-        status_mtime = os.path.getmtime(STATUS_FILE)
-        current_time = time.time()
-        
-        # If status hasn't updated in 2 minutes, consider process stale
-        if current_time - status_mtime > 120:  # 2 minutes
-            write_status("Scraping process appears to be stale - automatically stopped")
-            mark_as_inactive()
-            return True
-    
-    return False
-
-# Run the active process check
-check_active_process()
-
-# Function to determine if we're running in a cloud environment
-def is_cloud_environment():
-    # Check for common cloud environment indicators
-    if (os.environ.get("STREAMLIT_CLOUD") is not None or 
-            os.environ.get("IS_CLOUD_ENV") is not None or 
-            "streamlit.app" in os.environ.get("HOSTNAME", "") or 
-            os.path.exists("/.dockerenv")):
-        return True
-    
-    # Check for Streamlit Cloud specific paths
-    if (os.path.exists("/mount/src") or 
-            "/home/adminuser/venv" in sys.path or 
-            os.path.exists("/home/adminuser/venv")):
-        return True
-        
-    # Check if we're running in a path that looks like Streamlit Cloud
-    current_path = os.getcwd()
-    if "/mount/src" in current_path:
-        return True
-        
-    return False
-
-# Function to load pre-scraped data
-def load_prescraped_data():
-    try:
-        with open("outputs/outputs.json", "r") as f:
-            return json.load(f)
+        return load_snapshot()
     except Exception as e:
         print(f"Error loading pre-scraped data: {e}")
         return []
@@ -559,32 +331,48 @@ with st.form("scraper_form"):
     with col2:
         headless = st.checkbox("Headless Mode", value=True, help="Run browser in headless mode (no visible browser)")
     
+    # Optional job budget; 0 means no limit
+    with st.expander("Limits"):
+        limit_cols = st.columns(4)
+        with limit_cols[0]:
+            max_pages = st.number_input("Max pages", min_value=0, value=0, step=1)
+        with limit_cols[1]:
+            max_listings = st.number_input("Max listings", min_value=0, value=0, step=10)
+        with limit_cols[2]:
+            max_tokens = st.number_input("Max LLM tokens", min_value=0, value=0, step=1000)
+        with limit_cols[3]:
+            deadline_minutes = st.number_input("Time limit (min)", min_value=0, value=0, step=1)
+        profile_job = st.checkbox("Profile CPU time", value=False,
+                                  help="Run the job under cProfile and show the slowest functions when it ends")
+    
     submit_button = st.form_submit_button("Start Scraping", use_container_width=True)
 
     # Handle form submission based on environment
     if submit_button:
         if is_cloud_environment():
             # In cloud environment, use pre-scraped data
-            st.session_state.demo_loaded = True
-            write_status(f"Loading demo data for {location}...")
-            # Set basic state for UI continuity
-            write_properties(load_prescraped_data())
-            write_page_info(1, 1)
+            load_demo_job(f"Loading demo data for {location}...", location)
             st.rerun()
         elif not is_scraping_active():
             # Only run live scraping in local environment
-            run_scraper(location, headless)
+            limits = {
+                "max_pages": int(max_pages) or None,
+                "max_listings": int(max_listings) or None,
+                "max_tokens": int(max_tokens) or None,
+                "deadline": deadline_minutes * 60 or None,
+            }
+            run_scraper(location, headless, limits, profile_job)
             st.rerun()
 
 # Add a demo data button outside the form
 if not is_scraping_active() and not st.session_state.get("demo_loaded", False):
-    if st.button("Load Demo Data"):
-        st.session_state.demo_loaded = True
-        write_status("Loading demo data...")
-        # Set basic state for UI continuity
-        write_properties(load_prescraped_data())
-        write_page_info(1, 1)
-        st.rerun()
+    demo_cols = st.columns([1, 3])
+    with demo_cols[1]:
+        stream_demo = st.checkbox("Simulate streaming", value=False, help="Reveal the demo listings a few at a time, like a live scrape")
+    with demo_cols[0]:
+        if st.button("Load Demo Data"):
+            load_demo_job("Loading demo data...", stream=stream_demo)
+            st.rerun()
 
 # Check if scraping is active and add a stop button
 if is_scraping_active():
@@ -592,8 +380,10 @@ if is_scraping_active():
     
     # Add a stop button
     if st.button("Stop Scraping"):
-        write_status("Scraping stopped by user")
-        mark_as_inactive()
+        # The worker cancels the job; it reports the stop and keeps the partial results
+        write_status("Stopping...")
+        get_scraper_worker().cancel(current_job())
+        time.sleep(0.5)
         st.rerun()
 
 # Progress display
@@ -617,12 +407,10 @@ if is_scraping_active() and page_info["current_page"] > 1:
         # We don't know total pages yet, just show current page
         st.progress(0.0)  # Indeterminate progress
 
-# Add additional checking for error status to prevent false "scraping in progress"
-if is_scraping_active() and current_status.lower().startswith("error:"):
-    # If there's an error message but scraping is still marked as active, fix it
+# Surface failed jobs; the job registry has already released them
+job_meta = jobs.read_meta(current_job()) if current_job() else None
+if job_meta and job_meta["state"] == "failed":
     st.error(f"Scraping process failed: {current_status}")
-    mark_as_inactive()
-    st.rerun()
 
 # Property progress bar
 progress_percentage = 0  
@@ -667,14 +455,12 @@ with progress_col:
 with time_col:
     st.subheader("Statistics")
     
-    # Calculate start time from active file if it exists
+    usage = read_usage()
+
+    # Elapsed time runs from when the worker picked the job up (or was asked to)
     start_time = None
-    if os.path.exists(ACTIVE_FILE):
-        try:
-            with open(ACTIVE_FILE, "r") as f:
-                start_time = float(f.read().strip())
-        except:
-            pass
+    if is_scraping_active() and job_meta:
+        start_time = job_meta.get("started", job_meta["created"])
     
     if start_time:
         elapsed = time.time() - start_time
@@ -692,10 +478,60 @@ with time_col:
         Elapsed time: {elapsed_formatted}
         
         {estimated_text}
-        """
+        {usage_text(usage)}"""
         st.info(stats_text)
+    elif usage and usage.get("listings"):
+        st.info(f"Properties found: {len(properties)}\n{usage_text(usage)}")
     else:
         st.info("Not started")
+    
+    if usage and usage.get("pages"):
+        with st.expander("LLM usage per page"):
+            st.dataframe(
+                [{"Page": page["page"], "Listings": page["listings"], "Tokens/listing": page["tokens_per_listing"],
+                  "Sec/listing": page["seconds_per_listing"], "p90 sec": page["latency_p90"], "Cost ($)": page["cost"]}
+                 for page in usage["pages"]],
+                hide_index=True,
+            )
+    
+    cpu_profile = read_cpu_profile()
+    if cpu_profile:
+        with st.expander("CPU profile"):
+            st.code(cpu_profile, language=None)
+            with open(jobs.job_paths(current_job())["profile"], "rb") as f:
+                st.download_button("Download profile (.prof)", f.read(), file_name=f"{current_job()}.prof")
+
+# Price analytics, recomputed only when the result set changes. Jobs only ever append
+# properties, so the job id and property count identify a version of the results.
+@st.cache_data(max_entries=32)
+def compute_analytics(job_id, version, _properties):
+    from utils.analytics import summarize
+    return summarize(_properties)
+
+if properties:
+    analytics = compute_analytics(current_job(), len(properties), properties)
+    if analytics["priced"]:
+        st.markdown("<h2 class='section-header'>Price Analytics</h2>", unsafe_allow_html=True)
+        metric_cols = st.columns(3)
+        metric_cols[0].metric("Listings with a price", f"{analytics['priced']} / {analytics['listings']}")
+        metric_cols[1].metric("Median price", f"${analytics['median_price']:,.0f}")
+        if analytics["median_price_per_bed"] is not None:
+            metric_cols[2].metric("Median price per bed", f"${analytics['median_price_per_bed']:,.0f}")
+        
+        chart_cols = st.columns(3)
+        with chart_cols[0]:
+            st.caption("Price distribution (lowest price per listing, $)")
+            bin_starts, counts = analytics["price_histogram"]
+            st.bar_chart({"Listings": dict(zip(bin_starts, counts))})
+        if analytics["median_by_beds"] is not None:
+            with chart_cols[1]:
+                st.caption("Median price by bedrooms (0 = studio)")
+                bed_counts, medians = analytics["median_by_beds"]
+                st.bar_chart({"Median price": dict(zip(bed_counts, medians))})
+            with chart_cols[2]:
+                st.caption("Price per bed distribution ($)")
+                bin_starts, counts = analytics["price_per_bed_histogram"]
+                st.bar_chart({"Listings": dict(zip(bin_starts, counts))})
 
 # Results display
 st.markdown("<h2 class='section-header'>Properties Found</h2>", unsafe_allow_html=True)
@@ -794,6 +630,9 @@ with property_container:
 if is_scraping_active():
     time.sleep(1)  # Small delay
     st.rerun()
+elif is_demo_streaming():
+    time.sleep(0.5)
+    st.rerun()
 
 # Function to display properties from a list
 def display_properties(properties_list):
@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules whose cold import time is tracked. app.py runs its Streamlit script on import,
+# so its number covers a full bare-mode render of the page as well.
+IMPORT_TARGETS = ["main", "app"]
+
+def bench_import_time(module:str, runs:int=5):
+    '''
+    Measures the cold import time of `module` in fresh interpreters.
+
+    Args:
+     - module: (str) Module name to import.
+     - runs: (int) Number of fresh interpreters to time.
+
+    Returns:
+     A dict with the median and best wall time in milliseconds, or an error message.
+    '''
+    # Baseline: interpreter startup without the import, so only the import is reported
+    baseline = _time_python("pass", runs)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed"}
+        timings.append(elapsed)
+
+    return {
+        "median_ms": round((statistics.median(timings) - baseline) * 1000, 1),
+        "best_ms": round((min(timings) - baseline) * 1000, 1),
+    }
+
+def _time_python(code:str, runs:int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], capture_output=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def synthetic_page(page_number:int, listings:int=40):
+    '''
+    Builds a results page shaped like the site's markup, with `listings` placards.
+    '''
+    placards = "".join(
+        f'<li class="mortar-wrapper"><article class="placard"><header>'
+        f'<div class="property-title">Building {page_number}-{i}</div>'
+        f'<div class="property-address">{100 + i} Main St, New York, NY 100{i % 40:02d}</div></header>'
+        f'<div class="price-range">${1500 + i * 25:,} - ${2500 + i * 25:,}</div>'
+        f'<div class="bed-range">{i % 4 + 1} Beds</div><span>Verified</span><span>Virtual Tour</span>'
+        f'<ul>{"".join(f"<li>{a}</li>" for a in ("Pool", "Fitness Center", "Dishwasher", "Elevator"))}</ul>'
+        f'<button>Contact Property</button><a href="tel:6465550100">(646) 555-0100</a>'
+        f'<p>{"Spacious apartments with great light and city views. " * 20}</p></article></li>'
+        for i in range(listings)
+    )
+    return (f'<html><body><div id="placardContainer" class="placardContainer">'
+            f'<h1 class="placardSearchHeading">{listings * 28:,} Rentals</h1><ul>{placards}</ul></div></body></html>')
+
+def bench_parse_scaling(pages:int=200, worker_counts=(1, 2, 4)):
+    '''
+    Times parsing `pages` synthetic pages inline versus through the process pool.
+
+    Returns:
+     A dict mapping worker count to seconds (1 is the single-thread path).
+    '''
+    import utils.extractor as extractor
+    from main import get_config
+
+    html_pages = [synthetic_page(n) for n in range(pages)]
+    results = {}
+    for workers in worker_counts:
+        config = dict(get_config())
+        config["parsePool"] = {"workers": workers, "minPages": 1, "compressLevel": 1}
+        if workers > 1:
+            # Warm the pool up so process start-up isn't counted
+            extractor._parse_pool = None
+            asyncio.run(extractor.prepare_pages(html_pages[:workers], config))
+        start = time.perf_counter()
+        asyncio.run(extractor.prepare_pages(html_pages, config))
+        results[workers] = time.perf_counter() - start
+        if extractor._parse_pool is not None:
+            extractor._parse_pool.shutdown()
+            extractor._parse_pool = None
+    return results
+
+def bench_output_modes(listings:int=10, modes=("json", "compact", "tools")):
+    '''
+    Sends the same listings through each LLM output mode and records generated tokens and latency.
+
+    Needs GROQ_API_KEY; the listings come from a synthetic page.
+
+    Returns:
+     A dict mapping mode to average completion tokens and latency per listing, and the
+     share of outputs that passed validation.
+    '''
+    import dotenv
+    from main import get_config
+    from utils.extractor import parse_listings
+    from utils.llm import get_groq_client, cascade_models, build_request, parse_response, validate_property
+
+    dotenv.load_dotenv(".env")
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key:
+        raise RuntimeError("GROQ_API_KEY not set")
+
+    base_config = get_config()
+    client = get_groq_client(api_key, base_config)
+    model = cascade_models(base_config)[0]
+    texts = [text for text, _, _ in parse_listings(synthetic_page(1, listings), base_config)]
+
+    results = {}
+    for mode in modes:
+        config = dict(base_config, llmConfig=dict(base_config["llmConfig"], outputMode=mode))
+        tokens, latencies, valid = [], [], 0
+        for text in texts:
+            start = time.perf_counter()
+            chat = client.chat.completions.create(model=model, **build_request(text, config))
+            latencies.append(time.perf_counter() - start)
+            tokens.append(chat.usage.completion_tokens)
+            try:
+                valid += not validate_property(parse_response(chat, config))
+            except Exception:
+                pass
+        results[mode] = {
+            "completion_tokens": statistics.mean(tokens),
+            "latency_ms": statistics.mean(latencies) * 1000,
+            "valid": valid / len(texts),
+        }
+    return results
+
+def bench_render_replay(location:str, runs:int=3):
+    '''
+    Times rendering `location` from its HAR recording (see `python main.py LOCATION --record-har`),
+    so render-path changes can be compared offline on real page structure.
+
+    Returns:
+     A dict with the page count and the median and best seconds per render.
+    '''
+    from main import get_config
+    from utils.har import har_settings, har_files
+    from utils.render import render, location_slug
+
+    config = get_config()
+    har = har_settings(config, "replay")
+    browser_har, http_har = har_files(location_slug(location), har)
+    if not os.path.exists(browser_har) and not os.path.exists(http_har):
+        raise FileNotFoundError(f"no recording for {location} in {har['dir']}")
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        pages = asyncio.run(render(location, config, har=har))
+        timings.append(time.perf_counter() - start)
+    return {"pages": len(pages), "median_s": statistics.median(timings), "best_s": min(timings)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the scraper pipeline.")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions per measurement.")
+    parser.add_argument("--location", default="New York, NY", help="Location whose HAR recording is replayed.")
+    args = parser.parse_args(argv)
+
+    print("== Import time ==")
+    for module in IMPORT_TARGETS:
+        result = bench_import_time(module, runs=args.runs)
+        if "error" in result:
+            print(f"{module}: skipped ({result['error']})")
+        else:
+            print(f"{module}: median {result['median_ms']} ms, best {result['best_ms']} ms")
+
+    print("== Page parsing ==")
+    try:
+        scaling = bench_parse_scaling()
+    except ImportError as e:
+        print(f"skipped ({e})")
+    else:
+        single = scaling[1]
+        for workers, seconds in scaling.items():
+            label = "single thread" if workers == 1 else f"{workers} processes"
+            print(f"{label}: {seconds:.2f} s ({single / seconds:.1f}x)")
+
+    print("== Render replay ==")
+    try:
+        replay = bench_render_replay(args.location)
+    except Exception as e:
+        print(f"skipped ({e})")
+    else:
+        print(f"{replay['pages']} pages: median {replay['median_s']:.2f} s, best {replay['best_s']:.2f} s")
+
+    print("== LLM output modes ==")
+    try:
+        modes = bench_output_modes()
+    except Exception as e:
+        print(f"skipped ({e})")
+    else:
+        baseline = modes["json"]
+        for mode, result in modes.items():
+            print(f"{mode}: {result['completion_tokens']:.1f} output tokens/listing, "
+                  f"{result['latency_ms']:.0f} ms/listing ({result['latency_ms'] - baseline['latency_ms']:+.0f} ms vs json), "
+                  f"{result['valid']:.0%} valid")
+
+if __name__ == "__main__":
+    main()
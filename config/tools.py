@@ -1,9 +1,73 @@
 import json
+import os
+import sys
+from functools import lru_cache
 
 _config = {
     "url": "https://apartments.com",
+    "searchUrl": "https://www.apartments.com",
     "timeout":120000,
+    # "auto": fetch result pages over plain HTTP and use the browser only for pages without listings.
+    # "browser": drive the site's search box and Next button in Playwright for every page.
+    "fetchMode": "auto",
+    # Result pages loaded at once (HTTP requests or browser tabs) once the page count is known.
+    # The window grows by `increase` per window of successful loads up to `max`, and is multiplied
+    # by `decrease` on timeouts, bot challenges and HTTP errors (AIMD, see utils/concurrency.py).
+    # Failed pages are retried `retries` times; loads over `slowFactor` x the median latency hold the window.
+    "pageConcurrency": {
+        "initial": 2,
+        "min": 1,
+        "max": 8,
+        "increase": 1,
+        "decrease": 0.5,
+        "slowFactor": 3,
+        "retries": 2
+    },
+    # Large metros hit the site's pagination cap, so a location listed in the `table` file is
+    # searched as its neighborhoods instead, `concurrency` searches at a time (each in its own
+    # browser context, sharing the page window above). See utils/shards.py.
+    "sharding": {
+        "enabled": True,
+        "table": "config/shards.json",
+        "concurrency": 3
+    },
+    # scrapes that may be queued or running at once across all app sessions
+    "maxConcurrentJobs": 3,
+    # share of a job's --deadline spent loading pages; the rest is kept for extracting them
+    "deadlineRenderShare": 0.7,
+    # Distributed workers (queue_worker.py). `queue` and `store` are URLs; point them at a shared
+    # volume for several machines. A worker holds a job's lease for leaseSeconds, renewed every
+    # heartbeatInterval; expired leases and failed jobs are retried up to maxAttempts times,
+    # failures after retryDelay seconds (doubling per attempt). `store` defaults to the queue's database.
+    "distributed": {
+        "queue": "sqlite://status/queue.db",
+        "store": None,
+        "concurrency": 1,
+        "leaseSeconds": 120,
+        "heartbeatInterval": 20,
+        "maxAttempts": 3,
+        "retryDelay": 30,
+        "pollInterval": 2
+    },
+    # seconds between background writes of a job's status files
+    "statusFlushInterval": 0.5,
+    # "record" saves each job's browser and HTTP traffic to dir/<location>.har and .http.har,
+    # "replay" serves the job from those recordings without touching the network. "off" disables both.
+    "har": {
+        "mode": "off",
+        "dir": "recordings"
+    },
+    # Job log storage. "debug" also keeps per-listing lines; log.txt rotates into gzip segments
+    # past maxBytes, and the UI shows the last tailLines lines.
+    "logging": {
+        "level": "info",
+        "maxBytes": 262144,
+        "keepSegments": 5,
+        "tailLines": 200
+    },
     "waitSelector": "div#placardContainer ul li.mortar-wrapper",
+    # Bot challenge markers; a page showing one makes the renderer back off
+    "captchaSelector": "#px-captcha, iframe[src*='captcha'], div.g-recaptcha",
 
     "parentContainer":{
         "selector":"div#placardContainer ul li.mortar-wrapper",
@@ -15,7 +79,7 @@ _config = {
         "searchHeading":{
             "selector":"div.placardContainer > h1.placardSearchHeading",
             "type": "node",
-            "description": "Used to fetch the location currently being scraped."
+            "description": "Used to fetch the location currently being scraped and its result count."
         },
         "searchBox":{
             "selector": "input#quickSearchLookup",
@@ -32,12 +96,100 @@ _config = {
             "selector": "a[aria-label='Next Page'] > span.pagingBtn",
             "type": "node",
             "description": "returns the next button used to go forward."
+        },
+        "pageRange":{
+            "selector": "div#paging span.pageRange",
+            "type": "node",
+            "description": "Page position text such as 'Page 1 of 28', used to plan pagination up front."
+        },
+        "nextLink":{
+            "selector": "a[aria-label='Next Page']",
+            "type": "node",
+            "description": "Link to the next results page, read from the HTML when fetching without a browser."
+        },
+        "address":{
+            "selector": ".property-address",
+            "type": "node",
+            "description": "Address inside a listing, used to skip duplicate listings before they reach the LLM."
         }
     },
+    # Address deduplication across pages: streets at least this similar (0-1) within the same
+    # street number and zip code / street name are treated as the same building
+    "dedup": {
+        "enabled": True,
+        "threshold": 0.9
+    },
+
+    # parsing of large batches across processes, see utils/extractor.py::prepare_pages
+    "parsePool": {
+        "workers": 0,
+        "minPages": 20,
+        "compressLevel": 1
+    },
 
     "llmConfig": {
         "model":"llama-3.1-8b-instant",
+        # cascade tried per listing, cheapest first; later models only see listings that failed validation
+        "models": ["llama-3.1-8b-instant", "llama-3.3-70b-versatile"],
         "responseFormat": { "type": "json_object" },
+        # "json": verbose record (systemPrompt), "compact": positional array (compactPrompt),
+        # "tools": function call (toolsPrompt). Compact and tools output is expanded locally.
+        "outputMode": "json",
+        "compactPrompt": {
+            "role": "system",
+            "content": "Extract the rental listing as JSON {\"r\":[price_min,price_max,beds,baths,address]}. Prices are numbers without symbols; price_max is null unless a range. beds is an int (studio=0), baths a number or null, address a string or null. Output only the JSON."
+        },
+        "toolsPrompt": {
+            "role": "system",
+            "content": "Record the rental listing by calling the listing function. Prices are numbers without symbols; hi is null unless a range. Studio = 0 beds."
+        },
+        # max listings extracted at once per process (across jobs; a hedge adds one more request
+        # per listing); also sizes the shared HTTP connection pool and the LLM call thread pool
+        "concurrency": 4,
+        # seconds to wait for an answer to one LLM call; a call past it fails over to the next model
+        "deadline": 30,
+        # Hedged requests: a call still running after the model's `percentile` latency (once
+        # `minSamples` calls have been timed, and at least `minDelay` seconds) gets a duplicate and
+        # the first answer wins. Duplicates go to `secondary`, an OpenAI-compatible endpoint, e.g.
+        # {"baseUrl": "http://localhost:8000/v1", "apiKeyEnv": "SECONDARY_LLM_API_KEY", "model": "llama3"},
+        # or to Groq again when it is null. See utils/hedging.py.
+        "hedging": {
+            "enabled": False,
+            "percentile": 90,
+            "minSamples": 20,
+            "minDelay": 0.5,
+            "secondary": None
+        },
+        # USD per million prompt ("input") and completion ("output") tokens, for the cost estimates
+        # in the job metrics (utils/usage.py). Models not listed here are counted but not priced.
+        "pricing": {
+            "llama-3.1-8b-instant": {"input": 0.05, "output": 0.08},
+            "llama-3.3-70b-versatile": {"input": 0.59, "output": 0.79}
+        },
+        "connectionPool": {
+            "keepaliveExpiry": 120,
+            "http2": True,
+            "timeout": 60,
+            "connectTimeout": 10
+        },
+        # trims each placard's text before it is sent, see utils/extractor.py::prepare_listing_text
+        "preprocess": {
+            "maxInputTokens": 200,
+            "charsPerToken": 4,
+            "boilerplatePatterns": [
+                "contact property", "check availability", "request (a )?tour", "(virtual |video |3d )?tours?",
+                "email", "call", "video", "verified", "top rated", "price drop", "new", "save", "share",
+                "specials?", "today", "\\(?\\d{3}\\)?[\\s.-]?\\d{3}[\\s.-]\\d{4}",
+                "pets allowed", "(dog|cat|dog & cat) friendly", "fitness center", "pool", "dishwasher",
+                "refrigerator", "kitchen", "range", "microwave", "(in unit )?washer ?(&|/|and) ?dryer",
+                "walk-in closets", "clubhouse", "balcony", "patio", "elevator", "doorman", "concierge",
+                "laundry (facilities|service)", "parking", "garage", "air conditioning", "hardwood floors",
+                "granite countertops", "stainless steel appliances", "roof terrace", "business center",
+                "package service", "furnished", "utilities included", "grill", "playground", "gated",
+                "storage space", "wheelchair accessible", "high-speed internet access", "controlled access",
+                "maximum occupancy", "maintenance on site", "property manager on site"
+            ]
+        },
 
             "systemPrompt":{
                 "role": "system",
@@ -75,6 +227,52 @@ _config = {
 def get_config():
     return _config
 
+# Parsed JSON files keyed by path, invalidated when the file's mtime changes
+_json_cache = {}
+
+def read_json_cached(path:str):
+    '''
+    Reads and parses a JSON file, reusing the parsed result until the file changes on disk.
+
+    Args:
+     - path: (str) Path of the JSON file to read.
+
+    Returns:
+     The parsed JSON. It is shared between callers, so treat it as read-only.
+    '''
+    mtime = os.path.getmtime(path)
+    cached = _json_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r") as f:
+        data = json.load(f)
+    _json_cache[path] = (mtime, data)
+    return data
+
+# The probes below can't change for the lifetime of a process, so run them once
+@lru_cache(maxsize=None)
+def is_cloud_environment():
+    # Check for common cloud environment indicators
+    if (os.environ.get("STREAMLIT_CLOUD") is not None or 
+            os.environ.get("IS_CLOUD_ENV") is not None or 
+            "streamlit.app" in os.environ.get("HOSTNAME", "") or 
+            os.path.exists("/.dockerenv")):
+        return True
+    
+    # Check for Streamlit Cloud specific paths
+    if (os.path.exists("/mount/src") or 
+            "/home/adminuser/venv" in sys.path or 
+            os.path.exists("/home/adminuser/venv")):
+        return True
+        
+    # Check if we're running in a path that looks like Streamlit Cloud
+    current_path = os.getcwd()
+    if "/mount/src" in current_path:
+        return True
+        
+    return False
+
 def generate_config():
     with open("config/config.json", "w") as f:
         json.dump(_config, f, indent=4, ensure_ascii=True) 
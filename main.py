@@ -1,53 +1,72 @@
 import json
 import os
 import subprocess
-import dotenv
 import asyncio
-from utils.render import render
-from utils.extractor import extract_property_data
-from config.tools import get_config
-from playwright.async_api import async_playwright
-import sys
-
-# Function to check if running in cloud environment
-def is_cloud_environment():
-    # Check for common cloud environment indicators
-    if (os.environ.get("STREAMLIT_CLOUD") is not None or 
-            os.environ.get("IS_CLOUD_ENV") is not None or 
-            "streamlit.app" in os.environ.get("HOSTNAME", "") or 
-            os.path.exists("/.dockerenv")):
-        return True
-    
-    # Check for Streamlit Cloud specific paths
-    if (os.path.exists("/mount/src") or 
-            "/home/adminuser/venv" in sys.path or 
-            os.path.exists("/home/adminuser/venv")):
-        return True
-        
-    # Check if we're running in a path that looks like Streamlit Cloud
-    current_path = os.getcwd()
-    if "/mount/src" in current_path:
-        return True
-        
-    return False
+import argparse
+from config.tools import read_json_cached, is_cloud_environment
+from utils.budget import Budget
+
+# Browser automation, LLM SDK and HTML parser imports are deferred to render_and_extract,
+# so importing this module (e.g. from app.py or for demo data) stays cheap.
+
+# Set once browsers have been installed, so long-lived processes only pay for it on the first job
+_browsers_installed = False
 
 # Install Playwright browsers on startup
 async def install_browsers():
     """Install required browsers for Playwright"""
+    global _browsers_installed
     # Skip installation in cloud environments
     if is_cloud_environment():
         print("Cloud environment detected - skipping browser installation")
         return
+    if _browsers_installed:
+        return
     
     try:
         # Use a less privileged installation approach
         subprocess.run(["playwright", "install", "chromium"], check=True)
+        _browsers_installed = True
     except subprocess.CalledProcessError as e:
         print(f"Browser installation failed with error: {str(e)}")
         print("Continuing with pre-installed browsers...")
 
-async def render_and_extract(location, headless_browser=True, running_from_file=False, callback=None):
-    """Render webpage and extract data"""
+async def render_and_extract(location, headless_browser=True, running_from_file=False, callback=None, browser=None, client=None,
+                             max_pages=None, max_listings=None, max_tokens=None, deadline=None, har_mode=None, deduplicator=None,
+                             memory_profile=None, cpu_profile=None, get_browser=None):
+    """Render webpage and extract data
+
+    `browser` and `client` let long-lived callers (see utils/worker.py) pass in an
+    already-launched Playwright browser and Groq client instead of creating new ones per job.
+    `get_browser` is an async function returning such a browser, called only once one is needed
+    (e.g. for the fallback of the "auto" fetch mode).
+
+    `max_pages`, `max_listings`, `max_tokens` (LLM prompt + completion) and `deadline`
+    (seconds of wall-clock time) bound the job; once one is reached the job stops early and
+    returns the properties extracted so far. Loading pages only gets `deadlineRenderShare` of the
+    deadline, so there is time left to extract the pages that were loaded.
+
+    `har_mode` ("record" or "replay") overrides the config's `har.mode`, to save the job's
+    network traffic or run it offline from an earlier recording.
+
+    Locations listed in the `sharding.table` file (large metros that hit the site's pagination
+    cap) are searched as their neighborhoods, several in parallel, and merged into one result
+    (utils/shards.py).
+
+    Listings of the same building are dropped before extraction, and extracted duplicates are
+    merged, through an address index (utils/dedup.py). This also merges the overlap between shards.
+    Pass a shared `deduplicator` to catch duplicates across several jobs, e.g. overlapping searches.
+
+    `memory_profile` is a report path: when set, tracemalloc snapshots and RSS samples (Python and
+    Chromium) are taken after each page capture and each page's extraction, and a top-allocators
+    report is written there when the job ends (see utils/memprofile.py).
+
+    `cpu_profile` is a path for a cProfile dump of the job, including LLM calls made off the event
+    loop and status writes by `callback`'s writer thread. A summary of the top functions by
+    cumulative time is written next to it with a .txt suffix (see utils/cpuprofile.py).
+    """
+    budget = Budget(max_pages=max_pages, max_listings=max_listings, max_tokens=max_tokens, deadline=deadline,
+                    render_share=get_config().get("deadlineRenderShare", 0.7))
     # Check for cloud environment
     if is_cloud_environment():
         if callback:
@@ -55,6 +74,19 @@ async def render_and_extract(location, headless_browser=True, running_from_file=
         print("Cloud environment detected - cannot perform live scraping")
         return load_demo_data()
     
+    import dotenv
+    from utils.render import render
+    from utils.shards import plan_shards, render_shards
+    from utils.har import har_settings
+    from utils.extractor import extract_property_data, prepare_pages
+    from utils.llm import get_groq_client, new_extraction_stats, escalation_rate
+    from utils.hedging import latency_summary
+    from utils.usage import UsageLedger
+    from utils.dedup import AddressDeduplicator
+    from utils.concurrency import AdaptiveConcurrency
+    from utils.memprofile import MemoryProfiler, checkpoint
+    from utils.cpuprofile import JobProfiler, summary_path
+
     try:
         # Load environment variables
         dotenv.load_dotenv(".env")
@@ -71,59 +103,230 @@ async def render_and_extract(location, headless_browser=True, running_from_file=
     # Get API key from environment variables
     API_KEY = os.environ.get("GROQ_API_KEY")
     config = get_config()
+    # One long-lived client for every page of the job (and for later jobs in the same process)
+    if client is None and API_KEY:
+        client = get_groq_client(API_KEY, config)
     
     if callback:
         callback("status", f"Starting scrape for {location}")
 
-    # Render the HTML pages
-    html_pages = await render(location, config=config, headless=headless_browser, callback=callback)
+    # Optional memory profiling, with checkpoints at each stage boundary
+    profiler = MemoryProfiler(memory_profile).start() if memory_profile else None
+    # Optional CPU profiling; only one job per process can be profiled at a time
+    cpu_profiler = JobProfiler(cpu_profile) if cpu_profile else None
+    if cpu_profiler is not None and not cpu_profiler.start():
+        status_msg = "Another job is being CPU profiled in this process; running without the CPU profiler"
+        print(status_msg)
+        if callback:
+            callback("status", status_msg)
+    try:
+        # Render the HTML pages, with the number of pages loaded at once adapting to the site
+        concurrency = AdaptiveConcurrency.from_config(config)
+        # Page loading gets part of the deadline; the rest is kept for extraction
+        page_budget = budget.for_render()
+        # Large metros are searched as their neighborhoods, several at a time
+        shards = plan_shards(location, config, page_budget)
+        if len(shards) > 1:
+            html_pages = await render_shards(location, shards, config, headless=headless_browser, callback=callback, browser=browser,
+                                             budget=page_budget, har=har_settings(config, har_mode), profiler=profiler,
+                                             concurrency=concurrency, get_browser=get_browser)
+        else:
+            html_pages = await render(location, config=config, headless=headless_browser, callback=callback, browser=browser,
+                                      budget=page_budget, har=har_settings(config, har_mode), profiler=profiler,
+                                      concurrency=concurrency, get_browser=get_browser)
+        budget.pages += page_budget.pages
+        if page_budget.reason and html_pages:
+            status_msg = f"Stopped loading pages early ({page_budget.reason}); extracting the {len(html_pages)} pages loaded"
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+        checkpoint(profiler, f"rendered {len(html_pages)} pages")
+        if concurrency.outcomes:
+            window = concurrency.summary()
+            status_msg = (f"Loaded up to {int(window['peak_window'])} pages at a time (backed off {window['cuts']} times, "
+                          f"median page load {window['latency_p50']}s)")
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
     
-    # Count the total properties found
-    property_count = 0
+        # Count the total properties found
+        property_count = 0
+        # Per-run extraction counters (model cascade escalations etc.)
+        stats = new_extraction_stats()
+        # Tokens, cost and latency per listing and page
+        usage = UsageLedger.from_config(config)
     
-    # Extract data from each HTML page
-    for index, html in enumerate(html_pages):
-        if callback:
-            callback("status", f"Extracting data from page {index+1}/{len(html_pages)}")
+        # Parse all pages up front (in a process pool for large batches)
+        listings_per_page = await prepare_pages(html_pages, config)
+        checkpoint(profiler, "pages parsed")
+    
+        # Skip listings of buildings already seen on an earlier page (or by an earlier job)
+        dedup_config = config.get("dedup", {})
+        if deduplicator is None and dedup_config.get("enabled", True):
+            deduplicator = AddressDeduplicator(dedup_config.get("threshold", 0.9))
+        if deduplicator is not None:
+            listings_per_page = [[listing for listing in page if deduplicator.claim(listing[2])] for page in listings_per_page]
+    
+        # Extract data from each HTML page
+        for index, html in enumerate(html_pages):
+            if budget.exhausted():
+                break
+            if callback:
+                callback("status", f"Extracting data from page {index+1}/{len(html_pages)}")
             
-        properties_from_page = await extract_property_data(
-            html, 
-            config=config, 
-            api_key=API_KEY,
-            page_number=index+1,
-            callback=callback
-        )
+            properties_from_page = await extract_property_data(
+                html, 
+                config=config, 
+                api_key=API_KEY,
+                page_number=index+1,
+                callback=callback,
+                client=client,
+                listings=listings_per_page[index],
+                stats=stats,
+                budget=budget,
+                deduplicator=deduplicator,
+                usage=usage
+            )
         
-        property_count += len(properties_from_page)
-        properties.extend(properties_from_page)
+            property_count += len(properties_from_page)
+            properties.extend(properties_from_page)
+            checkpoint(profiler, f"page {index+1} extracted")
     
-    # Store the properties in a file
-    os.makedirs("outputs", exist_ok=True)
-    with open("outputs/outputs.json", "w") as f:
-        json.dump(properties, f, indent=4)
+        # Store the properties in a file. Several jobs may finish at once, so write to a
+        # temporary file and swap it in; the last job to finish wins.
+        os.makedirs("outputs", exist_ok=True)
+        tmp_path = f"outputs/outputs.json.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(properties, f, indent=4)
+        os.replace(tmp_path, "outputs/outputs.json")
+        checkpoint(profiler, "results written")
     
-    if callback:
-        callback("status", f"Completed scraping {len(html_pages)} pages with {property_count} properties found!")
-        callback("complete", property_count)
+        if stats["listings"]:
+            status_msg = f"Escalated {stats['escalations']}/{stats['listings']} listings to a larger model ({escalation_rate(stats):.0%})"
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+    
+        job_usage = usage.summary()
+        if job_usage["listings"]:
+            status_msg = (f"LLM usage: {job_usage['tokens_per_listing']} tokens per listing, "
+                          f"{job_usage['listings_per_minute']} listings per minute, estimated cost ${job_usage['cost']:.4f}")
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+    
+        llm_latency = latency_summary(stats)
+        if llm_latency["hedged"] or llm_latency["deadline_exceeded"]:
+            status_msg = (f"Hedged {llm_latency['hedged']}/{llm_latency['calls']} LLM calls ({llm_latency['hedge_rate']:.0%}), "
+                          f"{llm_latency['deadline_exceeded']} past the deadline; p99 {llm_latency['p99']}s "
+                          f"(primary calls alone: {llm_latency['p99_unhedged']}s)")
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+    
+        if deduplicator is not None and deduplicator.duplicates:
+            status_msg = f"Removed {deduplicator.duplicates} duplicate listings ({deduplicator.duplicate_rate():.0%}), {deduplicator.skipped} of them before extraction"
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+    
+        if budget.reason:
+            status_msg = f"Stopped early ({budget.reason}); returning partial results"
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+    
+        memory = None
+        if profiler is not None:
+            report = profiler.stop()
+            memory = {key: report[key] for key in ("traced_peak_mb", "peak_rss_mb", "peak_chromium_rss_mb")}
+            status_msg = f"Memory report written to {memory_profile} (peak RSS {memory['peak_rss_mb']} MB, Chromium {memory['peak_chromium_rss_mb']} MB)"
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+    
+        if callback:
+            callback("metrics", {
+                "extraction": dict({key: value for key, value in stats.items() if key not in ("latencies", "primary_latencies")},
+                                   escalation_rate=escalation_rate(stats)),
+                "llm_latency": llm_latency,
+                "usage": job_usage,
+                "budget": budget.summary(),
+                "dedup": deduplicator.summary() if deduplicator is not None else None,
+                "concurrency": concurrency.summary(),
+                "memory": memory,
+            })
+            callback("status", f"Completed scraping {len(html_pages)} pages with {property_count} properties found!")
+            callback("complete", property_count)
+    finally:
+        # Still tracing if the job failed part way; the report then covers the stages reached
+        if profiler is not None:
+            profiler.stop()
+        # Stopped last, so the profile covers the final callbacks too
+        if cpu_profiler is not None and cpu_profiler.stop() is not None:
+            status_msg = f"CPU profile written to {cpu_profile}, summary in {summary_path(cpu_profile)}"
+            print(status_msg)
+            if callback:
+                callback("log", status_msg)
     
     return properties
 
 def load_demo_data():
-    """Load pre-scraped data for demo purposes"""
+    """Load pre-scraped data for demo purposes (from a cached snapshot, see utils/demo.py)"""
+    from utils.demo import load_demo_properties
     try:
-        with open("outputs/outputs.json", "r") as f:
-            return json.load(f)
+        return list(load_demo_properties())
     except Exception as e:
         print(f"Error loading demo data: {e}")
         return []
 
 def get_config():
     """Read configuration from config file"""
-    with open("config/config.json", "r") as f:
-        return json.load(f)
+    return read_json_cached("config/config.json")
+
+def parse_args(argv=None):
+    """Parse command line arguments for `python -m main`"""
+    parser = argparse.ArgumentParser(description="Scrape property listings for a location.")
+    parser.add_argument("location", nargs="?", help="City, neighborhood or zip code. Prompted for if omitted.")
+    parser.add_argument("--headed", action="store_true", help="Show the browser window instead of running headless.")
+    add_budget_args(parser)
+    add_profile_args(parser)
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument("--record-har", dest="har_mode", action="store_const", const="record",
+                     help="Save the session's network traffic under the config's har.dir.")
+    har.add_argument("--replay-har", dest="har_mode", action="store_const", const="replay",
+                     help="Serve the session from an earlier recording, without network access.")
+    return parser.parse_args(argv)
+
+def add_profile_args(parser):
+    """Add the profiling options shared by this CLI and run_scraper.py"""
+    parser.add_argument("--memory-profile", metavar="REPORT",
+                        help="Profile memory with tracemalloc and write a top-allocators report to REPORT.")
+    parser.add_argument("--profile", metavar="PROFILE", nargs="?", const=True,
+                        help="Profile CPU time with cProfile and write the profile to PROFILE (default: in the job's "
+                             "directory, or outputs/profile.prof), with a summary of the top functions next to it.")
+
+def add_budget_args(parser):
+    """Add the per-job budget options shared by this CLI and run_scraper.py"""
+    parser.add_argument("--max-pages", type=int, help="Stop after this many result pages.")
+    parser.add_argument("--max-listings", type=int, help="Stop after extracting this many listings.")
+    parser.add_argument("--max-tokens", type=int, help="Stop after spending this many LLM tokens.")
+    parser.add_argument("--deadline", type=float, help="Stop after this many seconds.")
 
 if __name__ == "__main__":
-    location = input("Enter the location you want to scrape property listings for: ")
+    args = parse_args()
+    location = args.location or input("Enter the location you want to scrape property listings for: ")
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    loop.run_until_complete(render_and_extract(location, running_from_file=True, headless_browser=True))
+    loop.run_until_complete(render_and_extract(
+        location,
+        running_from_file=True,
+        headless_browser=not args.headed,
+        max_pages=args.max_pages,
+        max_listings=args.max_listings,
+        max_tokens=args.max_tokens,
+        deadline=args.deadline,
+        har_mode=args.har_mode,
+        memory_profile=args.memory_profile,
+        cpu_profile="outputs/profile.prof" if args.profile is True else args.profile
+    ))
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+from main import get_config, add_budget_args
+from utils.jobqueue import open_queue, open_store
+
+# Distributed scraping: any number of workers, on one machine or many sharing a volume, pull
+# location jobs from a common queue and write their results to a common store.
+#
+#   python queue_worker.py enqueue "New York, NY" "Boston, MA" --max-pages 5
+#   python queue_worker.py work --concurrency 2          # on every worker node
+#   python queue_worker.py status
+#   python queue_worker.py export results.json
+
+def parse_args(argv=None):
+    """Parse command line arguments for `python queue_worker.py`"""
+    settings = get_config().get("distributed", {})
+    parser = argparse.ArgumentParser(description="Run scrape jobs from a queue shared by several workers.")
+    parser.add_argument("--queue", default=settings.get("queue", "sqlite://status/queue.db"),
+                        help="Job queue URL, e.g. sqlite:///mnt/shared/queue.db.")
+    parser.add_argument("--store", default=settings.get("store"),
+                        help="Result store URL (sqlite://... or dir://...). Defaults to the queue's database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Add location jobs to the queue.")
+    enqueue.add_argument("locations", nargs="*", help="Locations to scrape.")
+    enqueue.add_argument("--file", help="File with one location per line.")
+    enqueue.add_argument("--headed", action="store_true", help="Show the browser window instead of running headless.")
+    enqueue.add_argument("--max-attempts", type=int, default=settings.get("maxAttempts", 3),
+                         help="Attempts per job before it is marked failed.")
+    add_budget_args(enqueue)
+
+    work = commands.add_parser("work", help="Run jobs from the queue.")
+    work.add_argument("--concurrency", type=int, default=settings.get("concurrency", 1), help="Jobs run at once by this worker.")
+    work.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}", help="Unique name of this worker.")
+    work.add_argument("--until-empty", action="store_true", help="Exit once the queue has no pending or running jobs.")
+
+    commands.add_parser("status", help="Show job counts per state.")
+
+    export = commands.add_parser("export", help="Write all stored results to a JSON file.")
+    export.add_argument("output")
+    return parser.parse_args(argv)
+
+def read_locations(args):
+    locations = list(args.locations)
+    if args.file:
+        with open(args.file, "r") as f:
+            locations.extend(line.strip() for line in f if line.strip())
+    return locations
+
+if __name__ == "__main__":
+    args = parse_args()
+    job_queue = open_queue(args.queue)
+    store = open_store(args.store or args.queue)
+
+    if args.command == "enqueue":
+        limits = {
+            "max_pages": args.max_pages,
+            "max_listings": args.max_listings,
+            "max_tokens": args.max_tokens,
+            "deadline": args.deadline,
+        }
+        for location in read_locations(args):
+            job_id = job_queue.put(location, {"headless": not args.headed, "limits": limits}, max_attempts=args.max_attempts)
+            print(f"Queued {location} as {job_id}")
+
+    elif args.command == "work":
+        from utils.worker import drain_queue
+        print(f"Worker {args.worker_id} pulling from {args.queue}")
+        completed = asyncio.run(drain_queue(job_queue, store, args.worker_id, concurrency=args.concurrency,
+                                            settings=get_config().get("distributed"), stop_when_empty=args.until_empty))
+        print(f"Worker {args.worker_id} completed {completed} jobs")
+
+    elif args.command == "status":
+        counts = job_queue.counts()
+        print(", ".join(f"{state}: {count}" for state, count in counts.items()))
+
+    elif args.command == "export":
+        results = store.results()
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"Wrote {len(results)} results ({sum(len(result['properties']) for result in results)} properties) to {args.output}")
@@ -0,0 +1,49 @@
+import math
+
+from utils.analytics import property_frame, summarize
+
+PROPERTIES = [
+    {"Price": "$1,500", "Beds": 0, "Baths": 1, "Address": "1 Elm St"},
+    {"Price": "1800 - 2,300", "Beds": 1, "Baths": 1, "Address": "2 Elm St"},
+    {"Price": "$2,100-$2,500 range", "price_type": "range", "Beds": 1, "Baths": 1.5, "Address": "3 Elm St"},
+    {"Price": "3000", "Beds": 2, "Baths": 2, "Address": "4 Elm St"},
+    {"Price": "3,400.50", "Beds": 2, "Baths": 2, "Address": "5 Elm St"},
+    {"Price": "N/A", "Beds": 3, "Baths": 2, "Address": "6 Elm St"},
+    {"price": "2,600", "beds": "N/A", "baths": None, "address": "7 Elm St"},
+]
+
+def test_property_frame_parses_prices():
+    frame = property_frame(PROPERTIES)
+
+    assert frame["price_min"].tolist()[:5] == [1500, 1800, 2100, 3000, 3400.5]
+    assert frame["price_max"].tolist()[:5] == [1500, 2300, 2500, 3000, 3400.5]
+    # "N/A" is no price, lower case fields are read too
+    assert math.isnan(frame["price_min"][5]) and math.isnan(frame["price_max"][5])
+    assert frame["price_min"][6] == 2600 and math.isnan(frame["beds"][6])
+
+def test_property_frame_price_per_bed():
+    frame = property_frame(PROPERTIES)
+    # A studio's price per bed is its price
+    assert frame["price_per_bed"].tolist()[:5] == [1500, 1800, 2100, 1500, 1700.25]
+
+def test_property_frame_without_fields():
+    frame = property_frame([{"Address": "1 Elm St"}])
+    assert frame[["price_min", "beds", "baths"]].isna().all(axis=None)
+
+def test_summarize():
+    summary = summarize(PROPERTIES)
+
+    assert summary["listings"] == 7 and summary["priced"] == 6
+    assert summary["median_price"] == 2350
+    assert summary["median_by_beds"] == ([0, 1, 2], [1500, 1950, 3200])
+    assert summary["median_price_per_bed"] == 1700.25
+
+    starts, counts = summary["price_histogram"]
+    assert sum(counts) == 6 and starts[0] == 1500
+    starts, counts = summary["price_per_bed_histogram"]
+    assert sum(counts) == 5
+
+def test_summarize_without_prices():
+    summary = summarize([{"Price": "N/A", "Beds": 1}, {"Price": "Call for rent", "Beds": 2}])
+    assert summary["listings"] == 2 and summary["priced"] == 0
+    assert summary["median_price"] is None and summary["median_by_beds"] is None and summary["price_histogram"] is None
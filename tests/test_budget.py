@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils import budget as budget_module
+from utils.budget import Budget
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(budget_module, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+def test_zero_or_none_limits_are_unlimited():
+    for budget in (Budget(), Budget(max_pages=0, max_listings=0, max_tokens=0, deadline=0)):
+        assert budget.max_pages is None and budget.deadline is None
+        assert budget.page_limit(40) == 40
+        assert not budget.pages_exhausted() and not budget.exhausted()
+        assert budget.timeout_ms(30000) == 30000
+
+def test_page_limit():
+    budget = Budget(max_pages=5)
+    assert budget.page_limit(3) == 3
+    assert budget.page_limit(28) == 5
+
+    budget.pages = 5
+    assert budget.page_capped() and budget.pages_exhausted()
+    assert budget.summary()["page_capped"]
+
+def test_for_render_keeps_part_of_the_deadline(clock):
+    budget = Budget(max_pages=5, deadline=100, render_share=0.7)
+    clock.value += 10
+
+    page_budget = budget.for_render()
+    assert page_budget.max_pages == 5
+    assert page_budget.deadline == pytest.approx(1010 + 90 * 0.7)
+    assert page_budget.timeout_ms(120000) == 63000
+
+    clock.value += 63
+    assert page_budget.out_of_time() and page_budget.reason == "deadline reached"
+    # Extraction still has the rest of the job's deadline
+    assert not budget.out_of_time() and not budget.exhausted()
+
+def test_for_render_pages_are_carried_back():
+    budget = Budget(max_pages=5)
+    budget.pages = 1
+
+    # As in main.render_and_extract: render against the share, then add its pages back
+    page_budget = budget.for_render()
+    assert page_budget.max_pages == 4
+    page_budget.pages += 4
+    assert page_budget.pages_exhausted()
+    budget.pages += page_budget.pages
+
+    assert budget.pages == 5 and budget.page_capped()
+    # Nothing left: the share is capped at 0 pages, not unlimited
+    assert budget.for_render().max_pages == 0
+    assert budget.for_render().pages_exhausted()
+
+def test_split_shares_the_remaining_pages():
+    budget = Budget(max_pages=10, deadline=60)
+    budget.pages = 3
+
+    shares = budget.split(3)
+    assert [share.max_pages for share in shares] == [3, 2, 2]
+    assert all(share.deadline == budget.deadline for share in shares)
+
+def test_split_with_zero_share():
+    shares = Budget(max_pages=2).split(3)
+
+    assert [share.max_pages for share in shares] == [1, 1, 0]
+    # A share of 0 pages has nothing to fetch
+    assert shares[2].page_capped() and shares[2].page_limit(8) == 0
+    assert not shares[0].page_capped()
+
+def test_split_without_page_limit():
+    assert [share.max_pages for share in Budget().split(2)] == [None, None]
+
+def test_exhausted():
+    budget = Budget(max_listings=2, max_tokens=1000)
+    budget.listings = 1
+    budget.tokens = 999
+    assert not budget.exhausted() and budget.reason is None
+
+    budget.tokens = 1000
+    assert budget.exhausted() and budget.reason == "token limit of 1000 reached"
+    # The first reason sticks
+    budget.listings = 2
+    assert budget.exhausted() and budget.reason == "token limit of 1000 reached"
+    assert budget.summary()["stopped_early"] == budget.reason
+
+def test_exhausted_by_deadline(clock):
+    budget = Budget(deadline=5)
+    assert not budget.exhausted()
+    clock.value += 5
+    assert budget.exhausted() and budget.reason == "deadline reached"
+    assert budget.timeout_ms(30000) == 1
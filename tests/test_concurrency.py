@@ -0,0 +1,133 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils import concurrency as concurrency_module
+from utils.concurrency import AdaptiveConcurrency, BACKOFF_OUTCOMES, BLOCKED_OUTCOMES
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=100.0)
+    monkeypatch.setattr(concurrency_module, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+def test_window_grows_by_increase_per_window_of_successes(clock):
+    controller = AdaptiveConcurrency(initial=2, maximum=8)
+    controller.record(clock.value, 1.0, "ok")
+    assert controller.window == 2.5
+    controller.record(clock.value, 1.0, "ok")
+    assert controller.window == pytest.approx(2.9)
+    assert controller.limit() == 2
+
+    controller.record(clock.value, 1.0, "ok")
+    assert controller.limit() == 3
+    assert controller.peak_window == controller.window
+
+def test_window_respects_its_ceiling(clock):
+    controller = AdaptiveConcurrency(initial=3, maximum=4)
+    for _ in range(50):
+        controller.record(clock.value, 1.0, "ok")
+    assert controller.window == 4 and controller.limit() == 4
+
+@pytest.mark.parametrize("outcome", BACKOFF_OUTCOMES)
+def test_backoff_outcomes_halve_the_window(clock, outcome):
+    controller = AdaptiveConcurrency(initial=8)
+    controller.record(clock.value, 1.0, outcome)
+    assert controller.window == 4 and controller.cuts == 1
+    assert controller.outcomes == {outcome: 1}
+
+def test_blocked_outcomes_back_off():
+    assert set(BLOCKED_OUTCOMES) <= set(BACKOFF_OUTCOMES)
+    assert "blocked" in BLOCKED_OUTCOMES and "captcha" in BLOCKED_OUTCOMES
+
+def test_window_is_cut_once_per_round(clock):
+    controller = AdaptiveConcurrency(initial=8)
+    started = clock.value
+    clock.value += 1
+    controller.record(started, 1.0, "timeout")
+    # Loads sent at the old window fail too, but don't cut it again
+    controller.record(started, 1.0, "blocked")
+    controller.record(started + 0.5, 1.5, "http_error")
+    assert controller.window == 4 and controller.cuts == 1
+
+    # A load started after the cut does
+    clock.value += 1
+    controller.record(clock.value, 0.5, "captcha")
+    assert controller.window == 2 and controller.cuts == 2
+    assert controller.outcomes == {"timeout": 1, "blocked": 1, "http_error": 1, "captcha": 1}
+
+def test_window_respects_its_floor(clock):
+    controller = AdaptiveConcurrency(initial=4, minimum=2)
+    for _ in range(5):
+        clock.value += 1
+        controller.record(clock.value, 1.0, "timeout")
+    assert controller.window == 2 and controller.limit() == 2
+    assert controller.cuts == 5
+
+def test_other_outcomes_leave_the_window(clock):
+    controller = AdaptiveConcurrency(initial=3)
+    controller.record(clock.value, 1.0, "empty")
+    assert controller.window == 3 and controller.cuts == 0
+    assert controller.outcomes == {"empty": 1}
+
+def test_slow_loads_hold_the_window(clock):
+    controller = AdaptiveConcurrency(initial=2, slow_factor=3.0)
+    for _ in range(5):
+        controller.record(clock.value, 1.0, "ok")
+    window = controller.window
+
+    controller.record(clock.value, 3.5, "ok")
+    assert controller.window == window
+    assert controller.outcomes == {"ok": 5, "slow": 1}
+
+def test_percentile_and_summary(clock):
+    controller = AdaptiveConcurrency(initial=2)
+    assert controller.percentile(50) is None
+    assert controller.summary()["latency_p50"] is None
+
+    for latency in (0.5, 0.6, 0.4, 0.7, 0.3, 0.9, 0.1, 0.8, 0.2, 1.0):
+        controller.record(clock.value, latency, "ok")
+    clock.value += 1
+    controller.record(clock.value, 2.0, "timeout")
+
+    assert controller.percentile(50) == 0.6
+    assert controller.percentile(90) == 1.0
+    assert controller.percentile(100) == 1.0
+    summary = controller.summary()
+    assert summary["latency_p50"] == 0.6 and summary["latency_p90"] == 1.0 and summary["latency_max"] == 1.0
+    assert summary["loads"] == 11 and summary["cuts"] == 1
+    assert summary["outcomes"] == {"ok": 10, "timeout": 1}
+    assert summary["limit"] == controller.limit() and summary["peak_window"] >= summary["window"]
+
+def test_from_config():
+    controller = AdaptiveConcurrency.from_config({"pageConcurrency": {"initial": 12, "min": 2, "max": 6, "retries": 1}})
+    assert (controller.window, controller.minimum, controller.maximum, controller.retries) == (6, 2, 6, 1)
+
+def test_slots_keep_loads_within_the_window():
+    async def run():
+        controller = AdaptiveConcurrency(initial=2, maximum=2)
+        peak = [0]
+
+        async def load():
+            async with controller.slot() as slot:
+                peak[0] = max(peak[0], controller.in_flight)
+                await asyncio.sleep(0.01)
+                slot.done("empty")
+
+        await asyncio.gather(*(load() for _ in range(6)))
+        return controller, peak[0]
+
+    controller, peak = asyncio.run(run())
+    assert peak == 2 and controller.in_flight == 0
+    assert controller.outcomes == {"empty": 6}
+
+def test_slot_without_outcome_counts_as_error():
+    async def run():
+        controller = AdaptiveConcurrency(initial=4)
+        async with controller.slot():
+            pass
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.outcomes == {"error": 1} and controller.window == 2
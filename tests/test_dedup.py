@@ -0,0 +1,59 @@
+from utils.dedup import AddressDeduplicator, normalize_address
+
+def test_normalize_address():
+    assert normalize_address("123 Main Street, Apt 4B, New York, NY 10001") == ("123 main st", "10001")
+    assert normalize_address("45 West 5th Avenue #12, New York, NY 10011-1234") == ("45 w 5th ave", "10011")
+    assert normalize_address("Back Bay, Boston, MA") == ("back bay", None)
+
+def test_claim_skips_seen_buildings():
+    dedup = AddressDeduplicator()
+
+    assert dedup.claim("123 Main Street, Boston, MA 02116")
+    assert not dedup.claim("123 Main St, Apt 2, Boston, MA 02116")
+    # Directions and zip codes tell buildings apart
+    assert dedup.claim("12 E 5th St, New York, NY 10003")
+    assert dedup.claim("12 W 5th St, New York, NY 10003")
+    assert dedup.claim("123 Main Street, Cambridge, MA 02139")
+    assert not dedup.claim("123 Main St, Cambridge, MA 02139-4307")
+    # Addresses without a street number don't identify a building
+    assert dedup.claim("Back Bay, Boston, MA 02116")
+    assert dedup.claim("Back Bay, Boston, MA 02116")
+    assert dedup.claim(None)
+
+    assert (dedup.seen, dedup.duplicates, dedup.skipped, dedup.unique) == (9, 2, 2, 0)
+
+def test_add_merges_records_of_one_building():
+    dedup = AddressDeduplicator()
+    first = {"Address": "7 Elm Street, Boston, MA 02115", "Price": "2000", "Beds": 1, "Baths": None}
+
+    assert dedup.add(first)
+    assert not dedup.add({"Address": "7 Elm St, Boston, MA 02115", "Price": "2100", "Beds": 1, "Baths": 1})
+    assert dedup.add({"Address": "N/A", "Price": "900"})
+
+    # The kept record gets the fields it was missing, and keeps its own
+    assert first["Baths"] == 1 and first["Price"] == "2000"
+    assert (dedup.unique, dedup.duplicates) == (1, 1)
+    assert dedup.duplicate_rate() == 0.5
+
+def test_claimed_listing_is_counted_once_when_added():
+    dedup = AddressDeduplicator()
+    assert dedup.claim("7 Elm Street, Boston, MA 02115")
+    assert dedup.add({"Address": "7 Elm Street, Boston, MA 02115", "Price": "2000"})
+
+    assert (dedup.seen, dedup.unique, dedup.duplicates) == (1, 1, 0)
+
+def test_duplicate_rate_counts_listings_never_extracted():
+    dedup = AddressDeduplicator()
+    addresses = [f"{number} Beacon St, Boston, MA 02116" for number in range(1, 7)]
+    claimed = [address for address in addresses * 3 if dedup.claim(address)]
+
+    # Only some of the kept listings are extracted (e.g. the budget ran out)
+    for address in claimed[:4]:
+        dedup.add({"Address": address})
+
+    assert (dedup.seen, dedup.duplicates, dedup.unique) == (18, 12, 4)
+    assert dedup.duplicate_rate() == 12 / 18
+    assert dedup.summary()["skipped_before_extraction"] == 12
+
+def test_duplicate_rate_without_listings():
+    assert AddressDeduplicator().duplicate_rate() == 0.0
@@ -0,0 +1,47 @@
+import json
+import math
+import os
+
+import pytest
+
+from utils.extractor import prepare_listing_text
+
+with open(os.path.join(os.path.dirname(__file__), "..", "config", "config.json"), "r") as f:
+    PREPROCESS = json.load(f)["llmConfig"]["preprocess"]
+
+PLACARD = """
+The Elm
+  7 Elm St,   Boston, MA 02115
+$2,000 - $2,400
+Verified
+1-2 Beds
+Pets Allowed
+Dishwasher
+(617) 555-0123
+Check Availability
+1-2 Beds
+"""
+
+def test_prepare_listing_text_drops_boilerplate_and_repeats():
+    text, tokens = prepare_listing_text(PLACARD, PREPROCESS)
+
+    assert text == "The Elm\n7 Elm St, Boston, MA 02115\n$2,000 - $2,400\n1-2 Beds"
+    assert tokens == math.ceil(len(text) / 4)
+
+def test_prepare_listing_text_without_preprocessing():
+    text, tokens = prepare_listing_text("a  b\n\nc\nC\n")
+    # Whitespace is collapsed and repeats are dropped, but nothing is cut
+    assert text == "a b\nc"
+    assert tokens == 2
+
+def test_prepare_listing_text_cuts_at_a_line_boundary():
+    raw_text = "\n".join(f"line {n} " + "x" * 30 for n in range(10))
+    text, tokens = prepare_listing_text(raw_text, {"maxInputTokens": 25, "charsPerToken": 4})
+
+    # 100 characters fit two 38-character lines with their newlines, not a third
+    assert text.splitlines() == [f"line {n} " + "x" * 30 for n in range(2)]
+    assert len(text) <= 100 and tokens == 19
+
+@pytest.mark.parametrize("chars_per_token, tokens", [(4, 2), (2, 4), (3, 3), (3.5, 3)])
+def test_token_estimate(chars_per_token, tokens):
+    assert prepare_listing_text("1 Elm St", {"charsPerToken": chars_per_token}) == ("1 Elm St", tokens)
@@ -0,0 +1,91 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from utils import hedging
+from utils.hedging import DeadlineExceeded, complete
+from utils.llm import OpenAICompatibleClient, new_extraction_stats
+
+REQUEST = {"messages": [{"role": "user", "content": "Extract info from the following text:\n\n1 Main St"}]}
+
+class StubHandler(BaseHTTPRequestHandler):
+    '''OpenAI-compatible chat completions endpoint; a model named "sleep-<seconds>" answers after that delay.'''
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(float(body["model"].split("-", 1)[1]))
+        out = json.dumps({
+            "choices": [{"message": {"content": "{}"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5},
+            "model": body["model"],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+
+def make_config(deadline, hedging_settings=None):
+    return {"llmConfig": {"deadline": deadline, "concurrency": 4, "hedging": hedging_settings or {"enabled": False}}}
+
+def test_answer_within_deadline(base_url):
+    stats = new_extraction_stats()
+    usage = {}
+    chat = complete(OpenAICompatibleClient(base_url), "sleep-0.01", REQUEST, make_config(2), stats, usage)
+
+    assert chat.model == "sleep-0.01"
+    assert stats["calls"] == 1 and stats["prompt_tokens"] == 10 and stats["completion_tokens"] == 5
+    assert usage["sleep-0.01"]["calls"] == 1
+
+def test_deadline_exceeded(base_url):
+    stats = new_extraction_stats()
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        complete(OpenAICompatibleClient(base_url), "sleep-1.0", REQUEST, make_config(0.3), stats)
+
+    assert time.monotonic() - started < 0.9
+    assert stats["deadline_exceeded"] == 1
+
+def test_deadline_counts_from_call_start(base_url):
+    # Fill the shared pool so the call waits in its queue for longer than the deadline
+    pool = hedging._get_executor({"concurrency": 4})
+    blockers = [pool.submit(time.sleep, 0.5) for _ in range(pool._max_workers)]
+    try:
+        chat = complete(OpenAICompatibleClient(base_url), "sleep-0.05", REQUEST, make_config(0.3))
+    finally:
+        for blocker in blockers:
+            blocker.result()
+    assert chat.model == "sleep-0.05"
+
+def test_hedge_wins_and_loser_is_billed(base_url):
+    # The primary model has a latency history, so a slow call gets hedged after its p90
+    for _ in range(20):
+        hedging._tracker("sleep-0.6").add(0.05)
+    hedging_settings = {"enabled": True, "percentile": 90, "minSamples": 20, "minDelay": 0.05,
+                        "secondary": {"baseUrl": base_url, "model": "sleep-0.01"}}
+    stats = new_extraction_stats()
+    usage = {}
+    started = time.monotonic()
+    chat = complete(OpenAICompatibleClient(base_url), "sleep-0.6", REQUEST, make_config(2, hedging_settings), stats, usage)
+
+    assert chat.model == "sleep-0.01"
+    assert time.monotonic() - started < 0.4
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+    # The abandoned primary call still finishes, and its tokens are counted once it does
+    time.sleep(0.8)
+    assert set(usage) == {"sleep-0.6", "sleep-0.01"}
+    assert stats["prompt_tokens"] == 20 and stats["completion_tokens"] == 10
+    assert stats["primary_latencies"] and stats["primary_latencies"][-1] >= 0.6
@@ -0,0 +1,131 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from utils import jobqueue
+from utils.jobqueue import JobQueue, ResultStore, SQLiteJobQueue, open_queue, open_store
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(jobqueue, "time", SimpleNamespace(time=lambda: now.value))
+    return now
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return SQLiteJobQueue(str(tmp_path / "queue.db"))
+
+def job_row(queue, job_id):
+    with sqlite3.connect(queue.path) as db:
+        state, attempts, available_at, error = db.execute(
+            "SELECT state, attempts, available_at, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return {"state": state, "attempts": attempts, "available_at": available_at, "error": error}
+
+def test_lease_hands_out_each_job_once(queue):
+    first = queue.put("Boston, MA", {"limits": {"max_pages": 2}})
+    second = queue.put("Austin, TX")
+
+    job = queue.lease("worker-1", 60)
+    assert job == {"id": first, "location": "Boston, MA", "options": {"limits": {"max_pages": 2}}, "attempts": 1}
+    assert queue.lease("worker-2", 60)["id"] == second
+    assert queue.lease("worker-3", 60) is None
+    assert queue.counts() == {"pending": 0, "leased": 2, "done": 0, "failed": 0}
+
+    assert queue.complete(job, "worker-1")
+    assert queue.counts()["done"] == 1
+
+def test_only_the_lease_owner_updates_a_job(queue):
+    queue.put("Boston, MA")
+    job = queue.lease("worker-1", 60)
+
+    assert not queue.heartbeat(job, "worker-2", 60)
+    assert not queue.complete(job, "worker-2")
+    assert queue.heartbeat(job, "worker-1", 60)
+
+def test_expired_lease_is_leased_again(queue, clock):
+    job_id = queue.put("Boston, MA")
+    job = queue.lease("worker-1", 60)
+
+    clock.value += 30
+    assert queue.heartbeat(job, "worker-1", 60)
+    clock.value += 59
+    assert queue.lease("worker-2", 60) is None
+
+    # The worker died: once its lease runs out another worker takes over
+    clock.value += 2
+    retry = queue.lease("worker-2", 60)
+    assert retry["id"] == job_id and retry["attempts"] == 2
+    # The first worker lost the job
+    assert not queue.complete(job, "worker-1")
+    assert queue.complete(retry, "worker-2")
+
+def test_expired_lease_of_the_last_attempt_fails_the_job(queue, clock):
+    job_id = queue.put("Boston, MA", max_attempts=1)
+    queue.lease("worker-1", 60)
+
+    clock.value += 61
+    assert queue.lease("worker-2", 60) is None
+    assert job_row(queue, job_id)["state"] == "failed"
+    assert job_row(queue, job_id)["error"] == "lease expired"
+
+def test_fail_retries_with_exponential_delay(queue, clock):
+    job_id = queue.put("Boston, MA", max_attempts=3)
+
+    job = queue.lease("worker-1", 60)
+    assert queue.fail(job, "worker-1", "timeout", retry_delay=30)
+    assert job_row(queue, job_id) == {"state": "pending", "attempts": 1, "available_at": 1030, "error": "timeout"}
+    assert queue.lease("worker-1", 60) is None
+
+    clock.value += 30
+    job = queue.lease("worker-1", 60)
+    assert job["attempts"] == 2
+    queue.fail(job, "worker-1", "timeout", retry_delay=30)
+    assert job_row(queue, job_id)["available_at"] == clock.value + 60
+
+    clock.value += 60
+    job = queue.lease("worker-1", 60)
+    assert job["attempts"] == 3
+    # The last attempt failed the job for good
+    queue.fail(job, "worker-1", "blocked", retry_delay=30)
+    assert job_row(queue, job_id)["state"] == "failed"
+    clock.value += 1000
+    assert queue.lease("worker-1", 60) is None
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 1}
+
+def test_release_doesnt_count_the_attempt(queue):
+    job_id = queue.put("Boston, MA", max_attempts=1)
+    job = queue.lease("worker-1", 60)
+
+    assert queue.release(job, "worker-1")
+    assert job_row(queue, job_id)["state"] == "pending" and job_row(queue, job_id)["attempts"] == 0
+    assert queue.lease("worker-2", 60)["attempts"] == 1
+
+@pytest.mark.parametrize("url", ["sqlite://{tmp}/queue.db", "dir://{tmp}/results"])
+def test_result_stores(tmp_path, clock, url):
+    store = open_store(url.format(tmp=tmp_path))
+    store.put("a", "Boston, MA", "worker-1", [{"Price": "2000"}], {"pages": 1})
+    clock.value += 1
+    store.put("b", "Austin, TX", "worker-1", [])
+    clock.value += 1
+    # A retried job replaces its earlier result
+    store.put("a", "Boston, MA", "worker-2", [{"Price": "2100"}])
+
+    results = store.results()
+    assert [(result["job_id"], result["worker"]) for result in results] == [("b", "worker-1"), ("a", "worker-2")]
+    assert results[1]["properties"] == [{"Price": "2100"}]
+
+def test_backends_by_url(tmp_path):
+    assert isinstance(open_queue(str(tmp_path / "queue.db")), SQLiteJobQueue)
+    with pytest.raises(ValueError):
+        open_queue(f"redis://{tmp_path}")
+
+def test_incomplete_backends_cant_be_created():
+    class Queue(JobQueue):
+        def put(self, location, options=None, max_attempts=3):
+            pass
+
+    with pytest.raises(TypeError):
+        Queue()
+    with pytest.raises(TypeError):
+        ResultStore()
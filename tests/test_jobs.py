@@ -0,0 +1,87 @@
+import gzip
+import os
+
+import pytest
+
+from utils import jobs
+from utils.jobs import JobReporter, job_paths, read_log, read_properties, read_status
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", str(tmp_path))
+    os.makedirs(job_paths("job")["dir"])
+    return job_paths("job")
+
+def read_text(path):
+    with open(path, "r") as f:
+        return f.read()
+
+def messages(lines):
+    return [line.split("] ", 1)[1].rstrip("\n") for line in lines]
+
+def test_log_level_filters_lines(paths):
+    reporter = JobReporter("job", flush_interval=None)
+    reporter("status", "Moving to page 2...")
+    reporter("log", "Processing property 1/20")
+    reporter("property", {"address": "7 Elm St", "price": "2000"})
+    reporter("status", "Error: page 3 timed out")
+
+    assert messages(read_log("job")) == ["Moving to page 2...", "Error: page 3 timed out"]
+    # The status and results are written whatever the log level
+    assert read_status("job") == "Error: page 3 timed out"
+    assert read_properties("job") == [{"address": "7 Elm St", "price": "2000"}]
+
+def test_debug_level_keeps_every_line(paths):
+    reporter = JobReporter("job", flush_interval=None, log_config={"level": "debug"})
+    reporter("log", "Processing property 1/20")
+    reporter("property", {"address": "7 Elm St", "price": "2000"})
+
+    assert messages(read_log("job")) == ["Processing property 1/20", "Found property: 7 Elm St - 2000"]
+
+def test_error_level_keeps_errors_only(paths):
+    reporter = JobReporter("job", flush_interval=None, log_config={"level": "error"})
+    reporter("status", "Moving to page 2...")
+    reporter("status", "Error: page 3 timed out")
+
+    assert messages(read_log("job")) == ["Error: page 3 timed out"]
+
+def test_log_is_rotated_into_gzip_segments(paths):
+    reporter = JobReporter("job", flush_interval=None, log_config={"maxBytes": 100, "keepSegments": 2, "tailLines": 50})
+    for n in range(12):
+        # Each line is 49 bytes with its timestamp, so every third line rotates the log
+        reporter("log", f"line {n:02d} " + "x" * 29)
+
+    segments = sorted(name for name in os.listdir(paths["dir"]) if name.endswith(".gz"))
+    assert segments == ["log.txt.1.gz", "log.txt.2.gz"]
+    with gzip.open(f"{paths['log']}.1.gz", "rt") as f:
+        assert [message[:7] for message in messages(f.readlines())] == ["line 09", "line 10", "line 11"]
+    with gzip.open(f"{paths['log']}.2.gz", "rt") as f:
+        assert [message[:7] for message in messages(f.readlines())] == ["line 06", "line 07", "line 08"]
+    # The oldest segments were dropped, the current log starts over
+    assert not os.path.exists(paths["log"])
+
+    # The tail still has every line
+    assert len(read_log("job")) == 12
+
+def test_log_tail_is_a_ring_buffer(paths):
+    reporter = JobReporter("job", flush_interval=None, log_config={"tailLines": 3})
+    for n in range(5):
+        reporter("log", f"line {n}")
+
+    assert messages(read_log("job")) == ["line 2", "line 3", "line 4"]
+    assert len(read_text(paths["log"]).splitlines()) == 5
+
+    # A new reporter for the same job (e.g. after a restart) continues the tail
+    reporter = JobReporter("job", flush_interval=None, log_config={"tailLines": 3})
+    reporter("log", "line 5")
+    assert messages(read_log("job")) == ["line 3", "line 4", "line 5"]
+
+def test_background_writer_flushes_on_close(paths):
+    reporter = JobReporter("job", flush_interval=60)
+    reporter("log", "queued")
+    reporter("status", "Extracting data from page 1/1")
+    assert read_log("job") == []
+
+    reporter.close()
+    assert messages(read_log("job")) == ["queued", "Extracting data from page 1/1"]
+    assert read_status("job") == "Extracting data from page 1/1"
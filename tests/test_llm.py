@@ -0,0 +1,80 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from utils.llm import expand_compact, parse_response, validate_property
+
+def record(**fields):
+    return dict({"Price": "2000", "price_type": "fixed", "Beds": 1, "Baths": 1, "Address": "7 Elm St"}, **fields)
+
+@pytest.mark.parametrize("price", ["2000", "$2,000", "1850.50", "$1,800 - $2,400", "1800-2400", 2000])
+def test_valid_prices(price):
+    assert validate_property(record(Price=price)) == []
+
+@pytest.mark.parametrize("price", ["N/A", "Call for rent", "", "1800-", "-2400", "1800 to 2400"])
+def test_invalid_prices(price):
+    assert validate_property(record(Price=price)) == [f"price {price!r} is not numeric"]
+
+@pytest.mark.parametrize("beds, valid", [
+    (0, True), (3, True), (20, True),
+    (True, False), (False, False), (-1, False), (21, False), (1.5, False), ("2", False), (None, False),
+])
+def test_beds(beds, valid):
+    assert (validate_property(record(Beds=beds)) == []) == valid
+
+@pytest.mark.parametrize("baths, valid", [
+    (None, True), (1, True), (0.5, True), (1.5, True), (2.5, True), (20, True),
+    (0, False), (1.25, False), (21, False), (True, False), ("1", False),
+])
+def test_baths(baths, valid):
+    assert (validate_property(record(Baths=baths)) == []) == valid
+
+def test_not_a_record():
+    assert validate_property(["2000", 1, 1]) == ["not a JSON object"]
+
+def test_every_problem_is_reported():
+    assert len(validate_property(record(Price="N/A", Beds=True, Baths=0.3))) == 3
+
+@pytest.mark.parametrize("values, expected", [
+    ([2000, None, 1, 1, "7 Elm St"], ("2000", "fixed")),
+    ([2000.0, 2000, 1, 1, "7 Elm St"], ("2000", "fixed")),
+    ([1800, 2400, 2, 1.5, "7 Elm St"], ("1800-2400", "range")),
+    ([1850.5, 2400.0, 2, 1.5, "7 Elm St"], ("1850.5-2400", "range")),
+    # min only, max only, neither
+    ([1800, None, 2, 1, "7 Elm St"], ("1800", "fixed")),
+    ([None, 2400, 2, 1, "7 Elm St"], ("2400", "fixed")),
+    ([None, None, 2, 1, "7 Elm St"], ("N/A", "fixed")),
+])
+def test_expand_compact_prices(values, expected):
+    expanded = expand_compact(values)
+    assert (expanded["Price"], expanded["price_type"]) == expected
+
+def test_expand_compact_fields():
+    assert expand_compact([1800, 2400, 0, 1.5, "7 Elm St"]) == {
+        "Price": "1800-2400", "price_type": "range", "Beds": 0, "Baths": 1.5, "Address": "7 Elm St"}
+    # Short output is padded
+    assert expand_compact([1800]) == {"Price": "1800", "price_type": "fixed", "Beds": None, "Baths": None, "Address": None}
+
+def chat(content=None, tool_arguments=None):
+    tool_calls = [SimpleNamespace(function=SimpleNamespace(arguments=json.dumps(tool_arguments)))] if tool_arguments else None
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+def config(mode):
+    return {"llmConfig": {"outputMode": mode}}
+
+def test_parse_json_mode():
+    assert parse_response(chat(json.dumps(record())), config("json")) == record()
+
+def test_parse_compact_mode():
+    parsed = parse_response(chat('{"r": [1800, 2400, 2, 1, "7 Elm St"]}'), config("compact"))
+    assert parsed == record(Price="1800-2400", price_type="range", Beds=2)
+
+@pytest.mark.parametrize("arguments, expected", [
+    ({"lo": 1800, "hi": 2400, "bd": 2, "ba": 1, "ad": "7 Elm St"}, record(Price="1800-2400", price_type="range", Beds=2)),
+    ({"lo": 2000, "hi": None, "bd": 1, "ba": 1, "ad": "7 Elm St"}, record()),
+    ({"hi": 2000, "bd": 1, "ba": 1, "ad": "7 Elm St"}, record()),
+    ({"lo": None, "hi": None, "bd": 0, "ba": None, "ad": None}, record(Price="N/A", Beds=0, Baths=None, Address=None)),
+])
+def test_parse_tools_mode(arguments, expected):
+    assert parse_response(chat(tool_arguments=arguments), config("tools")) == expected
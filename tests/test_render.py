@@ -0,0 +1,33 @@
+import json
+import os
+
+import pytest
+from selectolax.parser import HTMLParser
+
+from utils.render import parse_search_summary
+
+with open(os.path.join(os.path.dirname(__file__), "..", "config", "config.json"), "r") as f:
+    CONFIG = json.load(f)
+
+def results_page(heading=None, page_range=None, placards=3):
+    items = "".join(f'<li class="mortar-wrapper"><p class="property-address">{n} Elm St, Boston, MA 02115</p>'
+                    f'<p>${2000 + n}</p><p>Verified</p></li>' for n in range(1, placards + 1))
+    heading = f'<h1 class="placardSearchHeading">{heading}</h1>' if heading else ""
+    paging = f'<div id="paging"><span class="pageRange">{page_range}</span></div>' if page_range else ""
+    return f'<div id="placardContainer" class="placardContainer">{heading}<ul>{items}</ul></div>{paging}'
+
+@pytest.mark.parametrize("heading, page_range, expected", [
+    ("1,234 Rentals in Boston, MA", "Page 1 of 28", (1234, 28)),
+    ("Boston, MA Apartments for Rent - 57 Apartments", None, (57, 19)),
+    ("Boston, MA Apartments for Rent", "Page 1 of 3", (None, 3)),
+    ("12 Homes for rent", "Page 1 of 1", (12, 1)),
+    ("Apartments in Boston", None, (None, None)),
+    (None, "Page 2 of 5", (None, 5)),
+])
+def test_parse_search_summary(heading, page_range, expected):
+    summary = parse_search_summary(HTMLParser(results_page(heading, page_range)), CONFIG)
+    assert (summary["total_results"], summary["total_pages"]) == expected
+
+def test_parse_search_summary_of_a_page_without_listings():
+    summary = parse_search_summary(HTMLParser(results_page("0 Rentals", None, placards=0)), CONFIG)
+    assert summary == {"total_results": 0, "total_pages": None}
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from utils import jobs
+from utils.budget import Budget
+from utils.jobs import JobReporter, read_page_info, read_status
+from utils.shards import _shard_callback, plan_shards
+
+@pytest.fixture
+def reporter(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", str(tmp_path))
+    os.makedirs(jobs.job_paths("job")["dir"])
+    return JobReporter("job", flush_interval=None)
+
+def test_page_progress_of_two_shards_is_summed(reporter):
+    progress = {}
+    upper = _shard_callback(reporter, "Upper West Side", progress)
+    harlem = _shard_callback(reporter, "Harlem", progress)
+
+    # One shard knows its page count up front and loads its pages in parallel
+    upper("pages", {"current_page": 1, "total_pages": 3})
+    # The other follows next-page links and reports progress in its status messages
+    harlem("pages", {"current_page": 1, "total_pages": None})
+    harlem("status", "Moving to page 2...")
+    assert read_page_info("job") == {"current_page": 3, "total_pages": 5}
+    assert read_status("job") == "[Harlem] Moving to page 2..."
+
+    upper("pages", {"current_page": 3, "total_pages": 3})
+    harlem("status", "No further pages to scrape. Total pages: 2")
+    assert read_page_info("job") == {"current_page": 5, "total_pages": 5}
+
+def test_unsharded_page_progress(reporter):
+    reporter("pages", {"current_page": 1, "total_pages": None})
+    reporter("status", "Moving to page 2...")
+    assert read_page_info("job") == {"current_page": 2, "total_pages": None}
+
+    reporter("status", "No further pages to scrape. Total pages: 2")
+    assert read_page_info("job") == {"current_page": 2, "total_pages": 2}
+
+def test_plan_shards(tmp_path):
+    table = tmp_path / "shards.json"
+    table.write_text('{"New York, NY": ["Harlem", "Upper West Side", "Harlem"]}')
+    config = {"sharding": {"enabled": True, "table": str(table)}}
+
+    assert plan_shards("new york ny", config) == ["Harlem", "Upper West Side"]
+    assert plan_shards("Boston, MA", config) == ["Boston, MA"]
+    # A page limit too small for one page per shard searches the metro as a whole
+    assert plan_shards("New York, NY", config, Budget(max_pages=1)) == ["New York, NY"]
+    assert plan_shards("New York, NY", dict(config, sharding={"enabled": False})) == ["New York, NY"]
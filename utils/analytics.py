@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# "$1,500", "1500 - 2,300", "$1,500-$2,300 range" -> min and max price
+_PRICE_RANGE = r"^(\d+(?:\.\d+)?)(?:-(\d+(?:\.\d+)?))?"
+
+def property_frame(properties:list):
+    '''
+    Parses extracted properties into numeric columns.
+
+    Field names are matched case-insensitively, since LLM output uses "Price"/"Beds" while
+    other sources use lower case.
+
+    Returns:
+     A DataFrame with `price_min`, `price_max`, `beds`, `baths` and `price_per_bed`
+     (NaN where a value couldn't be parsed).
+    '''
+    frame = pd.DataFrame([{key.lower(): value for key, value in prop.items()} for prop in properties])
+    for column in ("price", "beds", "baths"):
+        if column not in frame:
+            frame[column] = None
+
+    prices = (frame["price"].astype(str)
+              .str.lower()
+              .str.replace(r"[$,\s]|range|fixed", "", regex=True)
+              .str.extract(_PRICE_RANGE)
+              .astype(float))
+    result = pd.DataFrame({
+        "price_min": prices[0],
+        "price_max": prices[1].fillna(prices[0]),
+        "beds": pd.to_numeric(frame["beds"], errors="coerce"),
+        "baths": pd.to_numeric(frame["baths"], errors="coerce"),
+    })
+    # A studio counts as one bed, so its price per bed is its price
+    result["price_per_bed"] = result["price_min"] / result["beds"].clip(lower=1)
+    return result
+
+def summarize(properties:list, bins:int=20):
+    '''
+    Aggregates for the analytics panel.
+
+    Returns:
+     A dict with listing counts, median prices, a price histogram, the median price per bed
+     count and a price-per-bed histogram. Histograms are `(bin_starts, counts)` over the listings'
+     lowest price, and the per-bed medians `(bed_counts, medians)` with 0 for studios. Everything
+     is None when no price could be parsed.
+    '''
+    frame = property_frame(properties)
+    priced = frame.dropna(subset=["price_min"])
+    summary = {
+        "listings": len(frame),
+        "priced": len(priced),
+        "median_price": None,
+        "median_price_per_bed": None,
+        "price_histogram": None,
+        "median_by_beds": None,
+        "price_per_bed_histogram": None,
+    }
+    if priced.empty:
+        return summary
+
+    summary["median_price"] = float(np.median(priced["price_min"].to_numpy()))
+    summary["price_histogram"] = _histogram(priced["price_min"].to_numpy(), bins)
+
+    with_beds = priced.dropna(subset=["beds"])
+    if not with_beds.empty:
+        summary["median_price_per_bed"] = float(np.median(with_beds["price_per_bed"].to_numpy()))
+        summary["price_per_bed_histogram"] = _histogram(with_beds["price_per_bed"].to_numpy(), bins)
+        by_beds = with_beds.groupby(with_beds["beds"].astype(int))["price_min"].median()
+        summary["median_by_beds"] = (by_beds.index.tolist(), by_beds.round().tolist())
+    return summary
+
+def _histogram(values, bins:int):
+    counts, edges = np.histogram(values, bins=min(bins, max(1, len(np.unique(values)))))
+    return np.round(edges[:-1]).astype(int).tolist(), counts.tolist()
@@ -0,0 +1,106 @@
+import time
+
+class Budget:
+    '''
+    Per-job limits on pages, listings, LLM tokens and wall-clock time.
+
+    Each limit is optional (None means unlimited). The renderer and extractor check the budget
+    as they go and stop early with whatever they have, so a job's latency and cost stay bounded.
+    Rendering only gets part of the deadline (see `for_render`), so the pages it loaded can
+    still be extracted.
+    '''
+    def __init__(self, max_pages:int=None, max_listings:int=None, max_tokens:int=None, deadline:float=None,
+                 render_share:float=0.7):
+        '''
+        Args:
+         - max_pages: (int) Maximum result pages to fetch.
+         - max_listings: (int) Maximum listings to send to the LLM.
+         - max_tokens: (int) Maximum LLM tokens (prompt + completion) to spend.
+         - deadline: (float) Seconds from now after which the job stops.
+         - render_share: (float) Fraction of the time left that `for_render` gives to loading pages.
+
+        A limit of 0 passed in here means no limit, like None.
+        '''
+        self.render_share = render_share
+        self.max_pages = max_pages or None
+        self.max_listings = max_listings or None
+        self.max_tokens = max_tokens or None
+        self.deadline = time.monotonic() + deadline if deadline else None
+        self.pages = 0
+        self.listings = 0
+        self.tokens = 0
+        self.reason = None  # why the job stopped early, once it has
+
+    def page_limit(self, total_pages:int):
+        '''Caps a planned page count to the page budget.'''
+        return min(total_pages, self.max_pages) if self.max_pages is not None else total_pages
+
+    def pages_exhausted(self):
+        '''True once no further page should be fetched.'''
+        return self.page_capped() or self.out_of_time()
+
+    def page_capped(self):
+        return self.max_pages is not None and self.pages >= self.max_pages
+
+    def exhausted(self):
+        '''True once no further listing should be extracted.'''
+        if self.max_listings and self.listings >= self.max_listings:
+            self.reason = self.reason or f"listing limit of {self.max_listings} reached"
+        if self.max_tokens and self.tokens >= self.max_tokens:
+            self.reason = self.reason or f"token limit of {self.max_tokens} reached"
+        return self.out_of_time() or self.reason is not None
+
+    def timeout_ms(self, timeout:int):
+        '''Shortens a per-operation timeout so it can't run past the deadline.'''
+        if self.deadline is None:
+            return timeout
+        return max(1, min(timeout, int((self.deadline - time.monotonic()) * 1000)))
+
+    def out_of_time(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = self.reason or "deadline reached"
+            return True
+        return False
+
+    def for_render(self):
+        '''
+        Budget for loading pages: the remaining page limit, and `render_share` of the time left.
+
+        The rest of the deadline is kept for extraction, so a job whose pages load slowly still
+        returns the listings of the pages it got. Add the budget's `pages` back here afterwards.
+        '''
+        share = Budget()
+        share.max_pages = max(0, self.max_pages - self.pages) if self.max_pages is not None else None
+        if self.deadline is not None:
+            now = time.monotonic()
+            share.deadline = now + max(0, self.deadline - now) * self.render_share
+        return share
+
+    def split(self, parts:int):
+        '''
+        Page budgets for `parts` searches run side by side (see utils/shards.py).
+
+        The remaining page limit is shared out evenly, so the searches can't overshoot it together,
+        and the deadline is the same for all of them. Listing and token limits stay with this budget.
+
+        Returns:
+         `parts` budgets; one with a page share of 0 has nothing left to fetch.
+        '''
+        shares = []
+        remaining = max(0, self.max_pages - self.pages) if self.max_pages is not None else None
+        for index in range(parts):
+            share = Budget()
+            share.deadline = self.deadline
+            if remaining is not None:
+                share.max_pages = remaining // parts + (1 if index < remaining % parts else 0)
+            shares.append(share)
+        return shares
+
+    def summary(self):
+        return {
+            "pages": self.pages,
+            "listings": self.listings,
+            "tokens": self.tokens,
+            "page_capped": self.page_capped(),
+            "stopped_early": self.reason,
+        }
@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+# Outcomes that mean the site is pushing back, so fewer pages should load at once
+BACKOFF_OUTCOMES = ("timeout", "captcha", "blocked", "http_error", "error")
+# Outcomes where the site turned the client away (bot block or challenge); repeating the same
+# plain HTTP request won't help, so the page goes to the browser right away
+BLOCKED_OUTCOMES = ("blocked", "captcha")
+# Latencies kept for the median and percentiles
+LATENCY_SAMPLES = 200
+
+class AdaptiveConcurrency:
+    '''
+    AIMD controller for the number of result pages loaded at once.
+
+    Every successful load widens the window by `increase / window`, so a full window of
+    successes adds `increase`. A load much slower than usual (over `slow_factor` times the
+    median) holds the window where it is. A timeout, bot challenge or HTTP error multiplies it
+    by `decrease`, at most once per round: loads started before the last cut were sent at the
+    old window, so their failures don't cut it again. Throughput settles just under the rate
+    the site tolerates.
+
+    Loads run inside `slot()`, which waits until fewer than `limit()` loads are in flight.
+    '''
+    def __init__(self, initial:int=2, minimum:int=1, maximum:int=8, increase:float=1.0, decrease:float=0.5,
+                 slow_factor:float=3.0, retries:int=2):
+        '''
+        Args:
+         - initial: (int) Pages loaded at once to begin with.
+         - minimum: (int) The window never drops below this.
+         - maximum: (int) The window never grows past this.
+         - increase: (float) Window growth per window of successful loads.
+         - decrease: (float) Factor applied to the window on a timeout, bot challenge or HTTP error.
+         - slow_factor: (float) Loads slower than this times the median latency don't grow the window.
+         - retries: (int) How often a page is retried after a failed load.
+        '''
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.window = float(min(max(initial, self.minimum), self.maximum))
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_factor = slow_factor
+        self.retries = retries
+        self.in_flight = 0
+        self.peak_window = self.window
+        self.cuts = 0
+        self.outcomes = {}
+        self.latencies = []  # seconds, of loads that returned a page
+        self._last_cut = 0.0
+        self._changed = asyncio.Condition()
+
+    @classmethod
+    def from_config(cls, config:dict):
+        '''A controller with the config's `pageConcurrency` settings.'''
+        settings = config.get("pageConcurrency", {})
+        return cls(
+            initial=settings.get("initial", 2),
+            minimum=settings.get("min", 1),
+            maximum=settings.get("max", 8),
+            increase=settings.get("increase", 1.0),
+            decrease=settings.get("decrease", 0.5),
+            slow_factor=settings.get("slowFactor", 3.0),
+            retries=settings.get("retries", 2),
+        )
+
+    def limit(self):
+        '''Pages that may load at once right now.'''
+        return int(self.window)
+
+    def slot(self):
+        '''
+        Async context manager around one page load. Report how it went with `slot.done(outcome)`;
+        a slot left without an outcome counts as an "error".
+        '''
+        return _Slot(self)
+
+    def record(self, started:float, latency:float, outcome:str):
+        '''
+        Adjusts the window for one finished load.
+
+        Args:
+         - started: (float) `time.monotonic()` when the load started.
+         - latency: (float) Seconds the load took.
+         - outcome: (str) "ok", one of `BACKOFF_OUTCOMES`, or anything else for outcomes that
+           say nothing about load on the site (e.g. a page without listings).
+        '''
+        if outcome == "ok":
+            median = self.percentile(50)
+            if len(self.latencies) >= 5 and latency > self.slow_factor * median:
+                outcome = "slow"
+            else:
+                self.window = min(self.maximum, self.window + self.increase / self.window)
+                self.peak_window = max(self.peak_window, self.window)
+            self.latencies.append(latency)
+            del self.latencies[:-LATENCY_SAMPLES]
+        elif outcome in BACKOFF_OUTCOMES and started >= self._last_cut:
+            self.window = max(self.minimum, self.window * self.decrease)
+            self._last_cut = time.monotonic()
+            self.cuts += 1
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def percentile(self, percent:float):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def summary(self):
+        def seconds(value):
+            return round(value, 2) if value is not None else None
+
+        return {
+            "window": round(self.window, 2),
+            "limit": self.limit(),
+            "peak_window": round(self.peak_window, 2),
+            "cuts": self.cuts,
+            "loads": sum(self.outcomes.values()),
+            "outcomes": dict(self.outcomes),
+            "latency_p50": seconds(self.percentile(50)),
+            "latency_p90": seconds(self.percentile(90)),
+            "latency_max": seconds(max(self.latencies) if self.latencies else None),
+        }
+
+class _Slot:
+    def __init__(self, controller:AdaptiveConcurrency):
+        self.controller = controller
+        self.started = None
+        self.outcome = None
+
+    def done(self, outcome:str):
+        '''Records the load's outcome, with its latency measured up to now.'''
+        if self.outcome is None:
+            self.outcome = outcome
+            self.controller.record(self.started, time.monotonic() - self.started, outcome)
+
+    async def __aenter__(self):
+        controller = self.controller
+        async with controller._changed:
+            await controller._changed.wait_for(lambda: controller.in_flight < controller.limit())
+            controller.in_flight += 1
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not asyncio.CancelledError:
+            self.done("error")
+        controller = self.controller
+        async with controller._changed:
+            controller.in_flight -= 1
+            controller._changed.notify_all()
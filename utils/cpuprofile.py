@@ -0,0 +1,126 @@
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+
+# The profiler of the job running in the current context. asyncio tasks and asyncio.to_thread
+# inherit it, so code deep in the pipeline can find it without it being passed down.
+_current = contextvars.ContextVar("cpu_profiler", default=None)
+# The event loop thread can only be profiled for one job at a time
+_loop_lock = threading.Lock()
+
+class JobProfiler:
+    '''
+    Profiles one job with cProfile and writes a `.prof` file plus a text summary.
+
+    cProfile only sees the thread it is enabled on, so the event loop thread is profiled from
+    `start` to `stop`, and work the job hands to other threads (LLM calls in `asyncio.to_thread`,
+    status file flushes) is profiled by running it through `wrap` (see `profiled`). The
+    per-thread profiles are merged into one artifact.
+
+    While a job is profiled, everything else on the same event loop (e.g. other jobs in the
+    worker) shows up in its profile as well.
+    '''
+    def __init__(self, path:str, top:int=30):
+        '''
+        Args:
+         - path: (str) Where to write the profile. The summary goes next to it with a .txt suffix.
+         - top: (int) Number of functions listed in the summary.
+        '''
+        self.path = path
+        self.top = top
+        self.active = False
+        self._loop_profile = None
+        self._loop_thread = None
+        self._thread_profiles = {}
+        self._lock = threading.Lock()
+        self._token = None
+
+    def start(self):
+        '''
+        Starts profiling the calling thread.
+
+        Returns:
+         True if profiling started, False if another job is already being profiled in this process.
+        '''
+        if not _loop_lock.acquire(blocking=False):
+            return False
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiler is active
+            _loop_lock.release()
+            return False
+        self._loop_profile = profile
+        self._loop_thread = threading.get_ident()
+        self._token = _current.set(self)
+        self.active = True
+        return True
+
+    def wrap(self, fn):
+        '''Returns `fn` wrapped so calls made while the job is profiled are recorded for their thread.'''
+        def run(*args, **kwargs):
+            ident = threading.get_ident()
+            if not self.active or ident == self._loop_thread:
+                # The loop thread's profile already records the call
+                return fn(*args, **kwargs)
+            with self._lock:
+                profile = self._thread_profiles.setdefault(ident, cProfile.Profile())
+            try:
+                profile.enable()
+            except ValueError:  # this thread is already being profiled
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+        return run
+
+    def stop(self):
+        '''
+        Stops profiling and writes the profile and its summary.
+
+        Returns:
+         The summary text, or None if this profiler never started.
+        '''
+        if not self.active:
+            return None
+        self._loop_profile.disable()
+        self.active = False
+        _current.reset(self._token)
+        _loop_lock.release()
+
+        stats = pstats.Stats(self._loop_profile)
+        with self._lock:
+            for profile in self._thread_profiles.values():
+                stats.add(profile)
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        stats.dump_stats(self.path)
+
+        output = io.StringIO()
+        summary = pstats.Stats(self.path, stream=output)
+        summary.strip_dirs()
+        output.write(f"Profile: {self.path} ({len(self._thread_profiles) + 1} threads)\n\n")
+        output.write(f"== Top {self.top} functions by cumulative time ==\n")
+        summary.sort_stats("cumulative").print_stats(self.top)
+        output.write(f"== Top {self.top} functions by own time ==\n")
+        summary.sort_stats("tottime").print_stats(self.top)
+        text = output.getvalue()
+        with open(summary_path(self.path), "w") as f:
+            f.write(text)
+        return text
+
+def current():
+    '''The profiler of the job running in this context, if it is being profiled.'''
+    return _current.get()
+
+def profiled(fn):
+    '''`fn`, wrapped by the current job's profiler when there is one. Call on the job's own thread.'''
+    profiler = _current.get()
+    return profiler.wrap(fn) if profiler is not None and profiler.active else fn
+
+def summary_path(path:str):
+    return os.path.splitext(path)[0] + ".txt"
@@ -0,0 +1,186 @@
+import re
+from difflib import SequenceMatcher
+
+# Street suffixes and directions, abbreviated the way USPS does
+_ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "av": "ave", "boulevard": "blvd", "road": "rd", "drive": "dr",
+    "lane": "ln", "place": "pl", "court": "ct", "terrace": "ter", "parkway": "pkwy", "highway": "hwy",
+    "square": "sq", "circle": "cir", "plaza": "plz", "expressway": "expy", "turnpike": "tpke",
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw",
+}
+# Words that introduce a unit, dropped together with the unit number that follows
+_UNIT_WORDS = {"apt", "apartment", "unit", "suite", "ste", "fl", "floor", "rm", "room", "bldg", "building", "#"}
+_DIRECTIONS = {"n", "s", "e", "w", "ne", "nw", "se", "sw"}
+_ZIP = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+_MISSING = (None, "", "N/A")
+
+def normalize_address(address:str):
+    '''
+    Normalizes an address for comparison: lower case, no punctuation or unit numbers, and
+    abbreviated street suffixes and directions.
+
+    Returns:
+     A `(street, zip_code)` tuple, e.g. "123 Main Street, Apt 4B, New York, NY 10001" ->
+     ("123 main st", "10001"). `zip_code` is None when the address has none.
+    '''
+    parts = address.lower().replace("#", " # ").split(",")
+    zips = _ZIP.findall(",".join(parts[1:]))
+
+    tokens = []
+    skip = False
+    for token in re.sub(r"[^\w# ]", " ", parts[0]).split():
+        if skip:
+            skip = False
+            continue
+        if token in _UNIT_WORDS:
+            skip = True
+            continue
+        tokens.append(_ABBREVIATIONS.get(token, token))
+    return " ".join(tokens), zips[-1] if zips else None
+
+class AddressDeduplicator:
+    '''
+    Finds listings of the same building across pages and searches without comparing every pair.
+
+    Addresses are normalized (see `normalize_address`) and indexed under blocking keys: the
+    street number with the zip code, and the street number with the first street word. Only
+    entries sharing a key are compared, using a fuzzy match on the street, so each lookup stays
+    close to constant time however many listings have been seen.
+
+    Only addresses starting with a street number are deduplicated. Listings often carry just
+    "Neighborhood, City, ST ZIP" as their address, which doesn't tell buildings apart, so those
+    are always kept.
+
+    One instance can be shared by several jobs (e.g. overlapping city and zip searches) so
+    duplicates are caught across them too.
+    '''
+    def __init__(self, threshold:float=0.9):
+        '''
+        Args:
+         - threshold: (float) Minimum similarity (0-1) of two normalized streets to count as the same.
+        '''
+        self.threshold = threshold
+        self.blocks = {}  # blocking key -> list of entry ids
+        self.entries = []  # per entry: {"street", "zip", "record"}
+        self.seen = 0  # listings passed to `claim`, extracted or not
+        self.unique = 0  # buildings kept, counted once each when their record is added
+        self.duplicates = 0
+        self.skipped = 0  # duplicates dropped before extraction
+
+    def claim(self, address:str):
+        '''
+        Registers a listing's address before it is extracted.
+
+        Returns:
+         False if the address was already seen (the listing can be skipped), True otherwise.
+         Listings without a street address are always kept.
+        '''
+        self.seen += 1
+        if not address or not _street_number(normalize_address(address)[0]):
+            return True
+        if self._find(address) is not None:
+            self.duplicates += 1
+            self.skipped += 1
+            return False
+        self._insert(address, None)
+        return True
+
+    def add(self, record:dict):
+        '''
+        Adds an extracted record, merging it into an earlier record of the same address.
+
+        Returns:
+         True if the record is new and should be kept, False if it was merged into an existing one.
+        '''
+        address = _field(record, "address")
+        if address in _MISSING or not _street_number(normalize_address(address)[0]):
+            return True
+
+        entry_id = self._find(address)
+        if entry_id is None:
+            self._insert(address, record)
+            self.unique += 1
+            return True
+
+        entry = self.entries[entry_id]
+        if entry["record"] is None:
+            # The listing claimed this address before extraction
+            entry["record"] = record
+            self.unique += 1
+            return True
+        _merge(entry["record"], record)
+        self.duplicates += 1
+        return False
+
+    def duplicate_rate(self):
+        '''
+        Share of the listings seen that were duplicates.
+
+        Every listing passed to `claim` counts, including ones that were never extracted (budget,
+        failed calls) or have no street number. When records are only passed to `add`, the
+        records added count instead.
+        '''
+        total = self.seen or self.unique + self.duplicates
+        return self.duplicates / total if total else 0.0
+
+    def summary(self):
+        return {
+            "seen": self.seen,
+            "unique": self.unique,
+            "duplicates": self.duplicates,
+            "skipped_before_extraction": self.skipped,
+            "duplicate_rate": self.duplicate_rate(),
+        }
+
+    def _keys(self, street:str, zip_code:str):
+        tokens = street.split()
+        number = _street_number(street)
+        keys = [f"{number}|{tokens[1] if len(tokens) > 1 else ''}"]
+        if zip_code:
+            keys.append(f"{number}|{zip_code}")
+        return keys
+
+    def _find(self, address:str):
+        street, zip_code = normalize_address(address)
+        candidates = {entry_id for key in self._keys(street, zip_code) for entry_id in self.blocks.get(key, ())}
+        for entry_id in sorted(candidates):
+            entry = self.entries[entry_id]
+            if zip_code and entry["zip"] and zip_code != entry["zip"]:
+                continue
+            if self._same_street(entry["street"], street):
+                return entry_id
+        return None
+
+    def _same_street(self, a:str, b:str):
+        if a == b:
+            return True
+        # Numbers and directions must match exactly ("12 e 5th st" is not "12 w 5th st"),
+        # only the street name itself may differ slightly
+        if _fixed_tokens(a) != _fixed_tokens(b):
+            return False
+        return SequenceMatcher(None, a, b).ratio() >= self.threshold
+
+    def _insert(self, address:str, record):
+        street, zip_code = normalize_address(address)
+        entry_id = len(self.entries)
+        self.entries.append({"street": street, "zip": zip_code, "record": record})
+        for key in self._keys(street, zip_code):
+            self.blocks.setdefault(key, []).append(entry_id)
+
+def _street_number(street:str):
+    tokens = street.split()
+    return tokens[0] if tokens and tokens[0][:1].isdigit() else ""
+
+def _fixed_tokens(street:str):
+    return [token for token in street.split() if token[:1].isdigit() or token in _DIRECTIONS]
+
+def _field(record:dict, name:str):
+    # LLM output capitalizes field names ("Address"), other sources don't
+    return record.get(name.capitalize(), record.get(name))
+
+def _merge(kept:dict, duplicate:dict):
+    '''Fills fields missing from `kept` with values from `duplicate`.'''
+    for key, value in duplicate.items():
+        if kept.get(key) in _MISSING and value not in _MISSING:
+            kept[key] = value
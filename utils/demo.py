@@ -0,0 +1,70 @@
+import json
+import os
+import pickle
+
+# Pre-scraped results shown in demo mode (cloud deployments, "Load Demo Data")
+DEMO_SOURCE = "outputs/outputs.json"
+
+# source path -> ((mtime_ns, size), properties), so each process loads the demo data once
+_loaded = {}
+
+def load_demo_properties(source:str=DEMO_SOURCE):
+    '''
+    The pre-scraped properties for demo mode, loaded in one step.
+
+    The JSON results are compiled into a binary snapshot next to them the first time (and
+    again whenever the JSON changes), and the loaded list is kept in memory for the lifetime of
+    the process, so later loads cost nothing.
+
+    Returns:
+     The list of properties. It is shared between callers, so treat it as read-only.
+    '''
+    stat = os.stat(source)
+    version = (stat.st_mtime_ns, stat.st_size)
+    loaded = _loaded.get(source)
+    if loaded and loaded[0] == version:
+        return loaded[1]
+
+    properties = _read_snapshot(snapshot_path(source), version)
+    if properties is None:
+        properties = compile_snapshot(source, version)
+    _loaded[source] = (version, properties)
+    return properties
+
+def compile_snapshot(source:str=DEMO_SOURCE, version:tuple=None):
+    '''
+    Writes the binary snapshot of `source`.
+
+    Returns:
+     The properties read from `source`.
+    '''
+    if version is None:
+        stat = os.stat(source)
+        version = (stat.st_mtime_ns, stat.st_size)
+    with open(source, "r") as f:
+        properties = json.load(f)
+
+    path = snapshot_path(source)
+    # Write to a temporary file and swap it in, so concurrent loads never see a partial snapshot
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump((version, properties), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # A read-only deployment still works, it just parses the JSON on each cold start
+        print(f"Could not write demo snapshot {path}: {e}")
+    return properties
+
+def snapshot_path(source:str=DEMO_SOURCE):
+    '''"outputs/outputs.json" -> "outputs/outputs.snapshot.pickle"'''
+    return os.path.splitext(source)[0] + ".snapshot.pickle"
+
+def _read_snapshot(path:str, version:tuple):
+    # Only ever a file compiled by this module from the results JSON
+    try:
+        with open(path, "rb") as f:
+            snapshot_version, properties = pickle.load(f)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+    return properties if snapshot_version == version else None
@@ -1,7 +1,6 @@
-from selectolax.parser import HTMLParser
-from groq import Groq
 import json
 import asyncio
+from utils.llm import get_groq_client
 
 class Extract:
     '''
@@ -19,7 +18,7 @@ class Extract:
         self.config = config
         self.callback = callback  # Callback function to report progress
         #initialize the model
-        self.client = Groq(api_key=api_key)
+        self.client = get_groq_client(api_key, config)
 
     async def extract(self, house, model:str, system_prompt:str, response_format:dict):
         '''
@@ -62,6 +61,8 @@ class Extract:
         Returns:
          A json of all the property data.
         '''
+        from selectolax.parser import HTMLParser
+
         HOUSE_SELECTOR = self.config.get("parentContainer").get("selector")
         SYSTEM_PROMPT = self.config.get("llmConfig").get("systemPrompt")
         MODEL = self.config.get("llmConfig").get("model")
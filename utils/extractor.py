@@ -1,37 +1,167 @@
-from selectolax.parser import HTMLParser
-from groq import Groq
-import json
 import asyncio
+import math
+import multiprocessing
+import os
+import re
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from utils.llm import get_groq_client, extract_listing, new_extraction_stats
+from utils.cpuprofile import profiled
 
-async def extract_property_data(html, config, api_key, page_number=1, callback=None):
-    """Extract property data from HTML using LLM"""
+def prepare_listing_text(raw_text:str, preprocess:dict=None):
+    """Trim a placard's text down to what the prompt needs before it is sent to the LLM.
+
+    `raw_text` is the placard text with one text node per line (see `listing_text`).
+    Whitespace runs are collapsed, lines fully matching one of `preprocess["boilerplatePatterns"]`
+    and repeated lines (badges) are dropped, and the result is cut at a line boundary to fit
+    `preprocess["maxInputTokens"]`.
+
+    Returns a `(text, input_tokens)` tuple, where `input_tokens` is an estimate based on
+    `preprocess["charsPerToken"]`.
+    """
+    preprocess = preprocess or {}
+    chars_per_token = preprocess.get("charsPerToken", 4)
+    max_chars = preprocess.get("maxInputTokens", 0) * chars_per_token
+    boilerplate = _compile_patterns(tuple(preprocess.get("boilerplatePatterns", [])))
+
+    lines = []
+    seen = set()
+    length = 0
+    for line in raw_text.splitlines():
+        line = " ".join(line.split())
+        if not line or line.lower() in seen:
+            continue
+        if boilerplate and boilerplate.fullmatch(line):
+            continue
+        if max_chars and length + len(line) + 1 > max_chars:
+            break
+        seen.add(line.lower())
+        lines.append(line)
+        length += len(line) + 1
+
+    text = "\n".join(lines)
+    return text, math.ceil(len(text) / chars_per_token)
+
+def listing_text(house):
+    """Text of a placard node with one text node per line"""
+    return house.text(separator="\n", strip=True)
+
+# Compiled boilerplate regexes, keyed by the pattern tuple from the config
+_pattern_cache = {}
+
+def _compile_patterns(patterns:tuple):
+    if not patterns:
+        return None
+    if patterns not in _pattern_cache:
+        _pattern_cache[patterns] = re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+    return _pattern_cache[patterns]
+
+def parse_listings(html, config):
+    """Parse a results page into prepared `(text, input_tokens, address)` tuples, one per placard
+
+    `address` is the text of the placard's `items.address` node, or None if it has none.
+    """
+    from selectolax.parser import HTMLParser
+
+    house_selector = config.get("parentContainer").get("selector")
+    address_selector = config.get("items").get("address").get("selector")
+    preprocess = config.get("llmConfig").get("preprocess")
+    listings = []
+    for house in HTMLParser(html).css(house_selector):
+        address = house.css_first(address_selector)
+        text, tokens = prepare_listing_text(listing_text(house), preprocess)
+        listings.append((text, tokens, address.text(separator=" ", strip=True) if address is not None else None))
+    return listings
+
+def _parse_compressed_page(payload):
+    # Process pool entry point: pages arrive zlib-compressed so large strings aren't pickled as-is
+    compressed, config = payload
+    return parse_listings(zlib.decompress(compressed).decode("utf-8"), config)
+
+# Process pool for batch parsing, created on first use and reused across jobs
+_parse_pool = None
+
+def _get_parse_pool(workers):
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _parse_pool
+
+async def prepare_pages(html_pages, config):
+    """Parse pages into prepared listings, across a process pool for large batches
+
+    Batches of at least `parsePool.minPages` pages are compressed and parsed in
+    `parsePool.workers` processes (0 means one per CPU), so parsing doesn't compete with
+    the event loop driving the browser and network. Smaller batches are parsed inline.
+
+    Returns one list of `(text, input_tokens, address)` tuples per page.
+    """
+    pool_config = config.get("parsePool", {})
+    workers = pool_config.get("workers", 0) or os.cpu_count() or 1
+    if workers < 2 or len(html_pages) < pool_config.get("minPages", 20):
+        return [parse_listings(html, config) for html in html_pages]
+
+    level = pool_config.get("compressLevel", 1)
+    # Only the parts of the config the parser reads are sent to the workers
+    parse_config = {
+        "parentContainer": config.get("parentContainer"),
+        "items": {"address": config.get("items").get("address")},
+        "llmConfig": {"preprocess": config.get("llmConfig").get("preprocess")},
+    }
+    pool = _get_parse_pool(workers)
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(pool, _parse_compressed_page, (zlib.compress(html.encode("utf-8"), level), parse_config))
+        for html in html_pages
+    ))
+
+async def extract_property_data(html, config, api_key, page_number=1, callback=None, client=None, listings=None, stats=None, budget=None,
+                                deduplicator=None, usage=None):
+    """Extract property data from HTML using LLM
+
+    `listings` can carry the page's already prepared listings (see `prepare_pages`), in which
+    case `html` isn't parsed again. `stats` is an optional counters dict from
+    `utils.llm.new_extraction_stats`, updated in place. With a `budget` (utils.budget.Budget),
+    extraction stops early once its listing, token or time limit is reached. With a
+    `deduplicator` (utils.dedup.AddressDeduplicator), records of an already seen address are
+    merged into the earlier record instead of being returned again. With a `usage`
+    (utils.usage.UsageLedger), each listing's tokens, cost and latency are recorded.
+    """
     if callback:
         callback("status", f"Extracting properties from page {page_number}")
     
     # Parse HTML
-    tree = HTMLParser(html)
-    house_selector = config.get("parentContainer").get("selector")
-    houses = tree.css(house_selector)
+    if listings is None:
+        listings = parse_listings(html, config)
     
     if callback:
-        callback("status", f"Found {len(houses)} properties on page {page_number}")
-    
-    # LLM config
-    system_prompt = config.get("llmConfig").get("systemPrompt")
-    model = config.get("llmConfig").get("model") 
-    response_format = config.get("llmConfig").get("responseFormat")
+        callback("status", f"Found {len(listings)} properties on page {page_number}")
     
-    # Initialize Groq client if API key is provided
-    client = None
-    if api_key:
-        client = Groq(api_key=api_key)
+    # Use the shared Groq client if API key is provided and none was passed in
+    if client is None and api_key:
+        client = get_groq_client(api_key, config)
     
     properties = []
+    if stats is None:
+        stats = new_extraction_stats()
+    
+    input_tokens = 0
+    processed = 0
     
     # Process each house
-    for i, house in enumerate(houses):
+    for i, (listing, listing_tokens, _) in enumerate(listings):
+        if budget and budget.exhausted():
+            if callback:
+                callback("status", f"Budget reached ({budget.reason}) - stopping with partial results")
+            break
+        input_tokens += listing_tokens
+        processed += 1
         if callback:
-            callback("status", f"Processing property {i+1}/{len(houses)} on page {page_number}")
+            callback("status", f"Processing property {i+1}/{len(listings)} on page {page_number} (~{listing_tokens} input tokens)")
+        
+        if budget:
+            budget.listings += 1
         
         # If we don't have a client, return dummy data
         if not client:
@@ -47,28 +177,24 @@ async def extract_property_data(html, config, api_key, page_number=1, callback=N
                 callback("property", dummy_data)
             continue
         
-        # Extract data with LLM
+        # Extract data with LLM, escalating through the model cascade on invalid output.
+        # The Groq client blocks, so run it off the event loop that other jobs share.
+        listing_usage = {}
+        started = time.monotonic()
         try:
-            chat = client.chat.completions.create(
-                messages=[
-                    system_prompt,
-                    {
-                        "role": "user",
-                        "content": f"Extract info from the following text:\n\n{house.text()}",
-                    },
-                ],
-                model=model,
-                response_format=response_format,
-            )
-            response = chat.choices[0].message.content
-            property_data = json.loads(response)
-            properties.append(property_data)
-            
-            if callback:
-                callback("property", property_data)
+            property_data = await asyncio.to_thread(profiled(extract_listing), client, listing, config, stats, listing_usage)
+            if usage is not None:
+                usage.record(page_number, listing_usage, time.monotonic() - started)
+            if deduplicator is None or deduplicator.add(property_data):
+                properties.append(property_data)
+                
+                if callback:
+                    callback("property", property_data)
                 
         except Exception as e:
             print(f"Error extracting data: {e}")
+            if usage is not None:
+                usage.record(page_number, listing_usage, time.monotonic() - started, error=True)
             # Add placeholder data on error
             error_data = {
                 "Price": "N/A",
@@ -81,7 +207,19 @@ async def extract_property_data(html, config, api_key, page_number=1, callback=N
             if callback:
                 callback("property", error_data)
         
+        if budget:
+            budget.tokens = stats["prompt_tokens"] + stats["completion_tokens"]
+        
         # Delay to avoid rate limiting
         await asyncio.sleep(1)
     
+    if callback and processed:
+        callback("status", f"Page {page_number}: ~{input_tokens} input tokens, ~{input_tokens // processed} per listing")
+        if usage is not None and client:
+            page_usage = usage.page_summary(page_number)
+            callback("log", f"Page {page_number}: {page_usage['tokens_per_listing']} tokens per listing, "
+                            f"{page_usage['seconds_per_listing']}s per listing, ~${page_usage['cost']:.4f}")
+            # Running totals for the app's Statistics panel; the per-listing entries follow with the job's final metrics
+            callback("metrics", {"usage": usage.summary(per_listing=False)})
+    
     return properties 
\ No newline at end of file
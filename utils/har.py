@@ -0,0 +1,122 @@
+import json
+import os
+import time
+
+# Recorded sessions can be replayed offline with `--replay-har`. Browser contexts record and replay
+# through Playwright's own HAR support; plain HTTP fetches (fetchMode "auto") are written to a
+# second HAR file in the same format and served back through an httpx mock transport.
+
+def har_settings(config:dict, mode:str=None):
+    '''
+    The HAR settings for a job: the config's `har` section, with `mode` overriding its mode.
+
+    Returns:
+     A dict with `mode` ("record" or "replay") and `dir`, or None when HAR mode is off.
+    '''
+    har = dict(config.get("har") or {})
+    if mode:
+        har["mode"] = mode
+    if har.get("mode") not in ("record", "replay"):
+        return None
+    har.setdefault("dir", "recordings")
+    return har
+
+def har_files(location_slug:str, har:dict):
+    '''
+    Paths of the recordings for a location.
+
+    Returns:
+     A `(browser_har, http_har)` tuple.
+    '''
+    base = os.path.join(har["dir"], location_slug)
+    return f"{base}.har", f"{base}.http.har"
+
+def context_options(path:str, har:dict):
+    '''Extra `browser.new_context` arguments that record the context to `path`.'''
+    if har is None or har["mode"] != "record":
+        return {}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return {"record_har_path": path, "record_har_content": "embed"}
+
+async def replay_into(context, path:str, har:dict):
+    '''
+    Serves every request of `context` from the recording at `path`; anything not recorded is aborted.
+    '''
+    if har is not None and har["mode"] == "replay":
+        await context.route_from_har(path, not_found="abort")
+
+class HarRecorder:
+    '''
+    Collects plain HTTP responses and saves them as a HAR 1.2 file.
+    '''
+    def __init__(self, path:str):
+        self.path = path
+        self.entries = []
+
+    async def hook(self, response):
+        '''
+        httpx response hook. Every hop of a redirect chain is recorded, so replay follows it the same way.
+        '''
+        await response.aread()
+        elapsed = response.elapsed.total_seconds()
+        self.entries.append({
+            "startedDateTime": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(time.time() - elapsed)),
+            "time": round(elapsed * 1000, 1),
+            "request": {
+                "method": "GET",
+                "url": str(response.request.url),
+                "httpVersion": response.http_version,
+                "headers": [{"name": k, "value": v} for k, v in response.request.headers.items()],
+                "queryString": [],
+                "cookies": [],
+                "headersSize": -1,
+                "bodySize": 0,
+            },
+            "response": {
+                "status": response.status_code,
+                "statusText": response.reason_phrase,
+                "httpVersion": response.http_version,
+                "headers": [{"name": k, "value": v} for k, v in response.headers.items()
+                            if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")],
+                "cookies": [],
+                "content": {
+                    "size": len(response.content),
+                    "mimeType": response.headers.get("content-type", "text/html"),
+                    "text": response.text,
+                },
+                "redirectURL": response.headers.get("location", ""),
+                "headersSize": -1,
+                "bodySize": len(response.content),
+            },
+            "cache": {},
+            "timings": {"send": 0, "wait": round(elapsed * 1000, 1), "receive": 0},
+        })
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump({"log": {"version": "1.2", "creator": {"name": "ai-estate-scraper", "version": "1.0"},
+                               "entries": self.entries}}, f)
+
+def replay_transport(path:str):
+    '''
+    An httpx transport answering GETs from the HAR file at `path`. Unrecorded URLs get a 404,
+    so the renderer falls back exactly as it would for a page without listings.
+    '''
+    import httpx
+
+    with open(path, "r") as f:
+        entries = json.load(f)["log"]["entries"]
+    responses = {entry["request"]["url"]: entry["response"] for entry in entries}
+
+    def handle(request):
+        recorded = responses.get(str(request.url))
+        if recorded is None:
+            return httpx.Response(404, text="Not in recording")
+        return httpx.Response(
+            recorded["status"],
+            headers=[(h["name"], h["value"]) for h in recorded["headers"]],
+            text=recorded["content"].get("text", ""),
+        )
+
+    return httpx.MockTransport(handle)
@@ -0,0 +1,198 @@
+import concurrent.futures
+import threading
+import time
+from collections import deque
+
+# Process-wide so latency percentiles, and so hedging thresholds, carry over between pages and jobs
+_trackers = {}  # model -> LatencyTracker
+_trackers_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+# Token counts of calls that finish after their caller stopped waiting arrive from pool threads
+_usage_lock = threading.Lock()
+
+class DeadlineExceeded(TimeoutError):
+    '''Raised when no answer to an LLM call arrived within `llmConfig.deadline` seconds.'''
+
+class LatencyTracker:
+    '''
+    Rolling window of call latencies for one model.
+    '''
+    def __init__(self, size:int=500):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, seconds:float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, percent:float):
+        with self.lock:
+            ordered = sorted(self.samples)
+        return percentile(ordered, percent)
+
+    def __len__(self):
+        return len(self.samples)
+
+def complete(client, model:str, request:dict, config:dict, stats:dict=None, usage:dict=None):
+    '''
+    Runs one chat completion with a deadline, hedging it when it is slow.
+
+    The call runs on a shared thread pool so the caller can stop waiting at `llmConfig.deadline`
+    seconds, counted from when the call starts rather than from when it was queued. With `llmConfig.hedging.enabled`, a call still running after the model's p90
+    latency (`hedging.percentile`, once `hedging.minSamples` calls have been timed) gets a
+    duplicate: to the `hedging.secondary` OpenAI-compatible endpoint when one is configured,
+    otherwise to the same provider. Whichever answers first is returned; the other call is
+    left to finish in the background, and its latency and tokens are recorded when it does.
+
+    Args:
+     - client: Groq client (or anything with the same `chat.completions.create`).
+     - model: (str) Model for the primary call.
+     - request: (dict) Other chat completion arguments, see `utils.llm.build_request`.
+     - config: (dict) Scraper config.
+     - stats: (dict) Optional counters from `utils.llm.new_extraction_stats`, updated in place.
+     - usage: (dict) Optional per-model token counts for the listing, see `utils.llm.add_usage`.
+       Token counts of every call, the hedge's and abandoned ones included, go to `stats` and
+       `usage`, since all of them are billed.
+
+    Returns:
+     The chat completion. Raises `DeadlineExceeded` if none arrived in time, or the call's error.
+    '''
+    llm_config = config.get("llmConfig", {})
+    deadline = llm_config.get("deadline")
+    hedging = llm_config.get("hedging") or {}
+    tracker = _tracker(model)
+    pool = _get_executor(llm_config)
+
+    # Set by the pool thread when the primary call starts; deadline and hedge delay count from there
+    started = []
+    primary = pool.submit(_call, client, model, request, deadline, started, stats, usage)
+    primary.add_done_callback(lambda future: _record_primary(future, tracker, stats, deadline))
+    pending = {primary: "primary"}
+    hedge_at = _hedge_delay(tracker, hedging) if hedging.get("enabled") else None
+    error = None
+
+    if stats is not None:
+        stats["calls"] += 1
+    while pending:
+        elapsed = time.monotonic() - started[0] if started else 0
+        waits = [limit - elapsed for limit in (deadline, hedge_at) if limit is not None]
+        done, _ = concurrent.futures.wait(pending, timeout=max(0, min(waits)) if waits else None,
+                                          return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            source = pending.pop(future)
+            if future.exception() is not None:
+                error = future.exception()
+                continue
+            chat, _ = future.result()
+            if stats is not None:
+                stats["latencies"].append(round(time.monotonic() - started[0], 3))
+                if source == "hedge":
+                    stats["hedge_wins"] += 1
+            return chat
+
+        if not started:
+            # Still queued behind other calls on the pool
+            continue
+        elapsed = time.monotonic() - started[0]
+        if deadline is not None and elapsed >= deadline:
+            if stats is not None:
+                stats["deadline_exceeded"] += 1
+                stats["latencies"].append(deadline)
+            raise DeadlineExceeded(f"no answer from {model} within {deadline}s")
+        if hedge_at is not None and elapsed >= hedge_at and pending:
+            hedge_at = None
+            hedge_client, hedge_model = _hedge_target(client, model, hedging, config)
+            pending[pool.submit(_call, hedge_client, hedge_model, request, deadline, [], stats, usage)] = "hedge"
+            if stats is not None:
+                stats["hedged"] += 1
+    raise error
+
+def latency_summary(stats:dict):
+    '''
+    Hedging and latency figures for a job's metrics.
+
+    `p99_unhedged` is the p99 of the primary calls alone, i.e. what callers would have waited
+    without hedges; `p99` is what they actually waited.
+    '''
+    calls = stats.get("calls", 0)
+    answered = sorted(stats.get("latencies", []))
+    primary = sorted(stats.get("primary_latencies", []))
+    p99 = percentile(answered, 99)
+    p99_unhedged = percentile(primary, 99)
+    return {
+        "calls": calls,
+        "hedged": stats.get("hedged", 0),
+        "hedge_rate": stats.get("hedged", 0) / calls if calls else 0.0,
+        "hedge_wins": stats.get("hedge_wins", 0),
+        "deadline_exceeded": stats.get("deadline_exceeded", 0),
+        "p50": percentile(answered, 50),
+        "p99": p99,
+        "p99_unhedged": p99_unhedged,
+        "p99_improvement": round(p99_unhedged - p99, 3) if p99 is not None and p99_unhedged is not None else None,
+    }
+
+def percentile(ordered:list, percent:float):
+    '''Nearest-rank percentile of an already sorted list, or None if it is empty.'''
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+def _call(client, model:str, request:dict, timeout:float, started:list, stats:dict=None, usage:dict=None):
+    started.append(time.monotonic())
+    chat = client.chat.completions.create(model=model, timeout=timeout, **request)
+    latency = time.monotonic() - started[0]
+    # Recorded here, before the result is visible, so the caller sees the tokens of the call it returns
+    _record_usage(chat, model, stats, usage)
+    return chat, latency
+
+def _record_usage(chat, model:str, stats:dict, usage:dict):
+    from utils.llm import add_usage
+
+    with _usage_lock:
+        if stats is not None and getattr(chat, "usage", None):
+            stats["prompt_tokens"] += chat.usage.prompt_tokens or 0
+            stats["completion_tokens"] += chat.usage.completion_tokens or 0
+        if usage is not None:
+            add_usage(usage, model, chat)
+
+def _record_primary(future, tracker:LatencyTracker, stats:dict, deadline:float):
+    '''Keeps the primary call's latency, even when a hedge answered first.'''
+    if future.exception() is not None:
+        # Only calls cut off by their timeout say anything about latency
+        if deadline is None or "timeout" not in type(future.exception()).__name__.lower():
+            return
+        latency = deadline
+    else:
+        latency = future.result()[1]
+    tracker.add(latency)
+    if stats is not None:
+        stats["primary_latencies"].append(round(latency, 3))
+
+def _hedge_delay(tracker:LatencyTracker, hedging:dict):
+    if len(tracker) < hedging.get("minSamples", 20):
+        return None
+    return max(hedging.get("minDelay", 0.5), tracker.percentile(hedging.get("percentile", 90)))
+
+def _hedge_target(client, model:str, hedging:dict, config:dict):
+    secondary = hedging.get("secondary")
+    if not secondary:
+        return client, model
+    from utils.llm import get_secondary_client
+    return get_secondary_client(secondary, config), secondary.get("model") or model
+
+def _tracker(model:str):
+    with _trackers_lock:
+        tracker = _trackers.get(model)
+        if tracker is None:
+            tracker = _trackers[model] = LatencyTracker()
+        return tracker
+
+def _get_executor(llm_config:dict):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Room for a primary and a hedge per in-flight extraction
+            workers = max(8, llm_config.get("concurrency", 4) * 2)
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-call")
+        return _executor
@@ -0,0 +1,243 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+# Location jobs shared by scraper workers on several processes or machines (see queue_worker.py).
+# Backends are picked by URL scheme, e.g. "sqlite://status/queue.db"; register others in
+# QUEUE_BACKENDS / STORE_BACKENDS.
+
+class JobQueue(ABC):
+    '''
+    Interface of a shared queue of location jobs.
+
+    A worker leases a job for a limited time and keeps the lease alive with heartbeats while it
+    runs. A lease that runs out (the worker died or stalled) makes the job available again,
+    and a failed job is retried after a delay, both until `max_attempts` attempts were made.
+    '''
+    @abstractmethod
+    def put(self, location:str, options:dict=None, max_attempts:int=3):
+        '''Adds a job for `location`; `options` are passed to the worker (headless, limits). Returns its id.'''
+
+    @abstractmethod
+    def lease(self, worker_id:str, lease_seconds:float):
+        '''
+        Takes the oldest available job for `worker_id`.
+
+        Returns:
+         A dict with `id`, `location`, `options` and `attempts`, or None if no job is available.
+        '''
+
+    @abstractmethod
+    def heartbeat(self, job:dict, worker_id:str, lease_seconds:float):
+        '''Extends the lease on `job`. Returns False if the worker no longer holds it.'''
+
+    @abstractmethod
+    def complete(self, job:dict, worker_id:str):
+        '''Marks `job` done. Returns False if the worker no longer held its lease.'''
+
+    @abstractmethod
+    def fail(self, job:dict, worker_id:str, error:str, retry_delay:float=30):
+        '''Records a failed attempt; the job is retried after `retry_delay` seconds (doubling per attempt) while attempts remain.'''
+
+    @abstractmethod
+    def release(self, job:dict, worker_id:str):
+        '''Hands `job` back without counting the attempt, e.g. when the worker shuts down.'''
+
+    @abstractmethod
+    def counts(self):
+        '''Number of jobs per state ("pending", "leased", "done", "failed").'''
+
+class ResultStore(ABC):
+    '''
+    Interface of the store all workers write their results to.
+    '''
+    @abstractmethod
+    def put(self, job_id:str, location:str, worker_id:str, properties:list, metrics:dict=None):
+        '''Stores the result of job `job_id`, replacing an earlier result of the same job.'''
+
+    @abstractmethod
+    def results(self):
+        '''All stored results as dicts with `job_id`, `location`, `worker`, `properties`, `metrics` and `finished`.'''
+
+class SQLiteJobQueue(JobQueue):
+    '''
+    Job queue in a SQLite database, which can sit on a volume shared by several machines.
+
+    Every state change runs in its own `BEGIN IMMEDIATE` transaction, so two workers can never
+    lease the same job. The default rollback journal is kept because WAL mode doesn't work
+    across machines on network filesystems.
+    '''
+    def __init__(self, path:str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with _connect(path) as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    location TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    available_at REAL NOT NULL,
+                    created REAL NOT NULL,
+                    finished REAL,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS jobs_available ON jobs (state, available_at);
+            """)
+
+    def put(self, location:str, options:dict=None, max_attempts:int=3):
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with _connect(self.path) as db:
+            db.execute("INSERT INTO jobs (id, location, options, state, max_attempts, available_at, created) VALUES (?, ?, ?, 'pending', ?, ?, ?)",
+                       (job_id, location, json.dumps(options or {}), max_attempts, now, now))
+        return job_id
+
+    def lease(self, worker_id:str, lease_seconds:float):
+        now = time.time()
+        with _connect(self.path) as db:
+            db.execute("BEGIN IMMEDIATE")
+            # Leases that ran out belong to workers that died or stalled
+            db.execute("UPDATE jobs SET state = 'failed', finished = ?, error = 'lease expired', lease_owner = NULL "
+                       "WHERE state = 'leased' AND lease_expires < ? AND attempts >= max_attempts", (now, now))
+            db.execute("UPDATE jobs SET state = 'pending', available_at = ?, lease_owner = NULL, error = 'lease expired' "
+                       "WHERE state = 'leased' AND lease_expires < ?", (now, now))
+            row = db.execute("SELECT id, location, options, attempts FROM jobs WHERE state = 'pending' AND available_at <= ? "
+                             "ORDER BY available_at, created LIMIT 1", (now,)).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute("UPDATE jobs SET state = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                       (worker_id, now + lease_seconds, row[0]))
+            db.execute("COMMIT")
+        return {"id": row[0], "location": row[1], "options": json.loads(row[2]), "attempts": row[3] + 1}
+
+    def heartbeat(self, job:dict, worker_id:str, lease_seconds:float):
+        return self._update_leased(job, worker_id, "lease_expires = ?", (time.time() + lease_seconds,))
+
+    def complete(self, job:dict, worker_id:str):
+        return self._update_leased(job, worker_id, "state = 'done', finished = ?, lease_owner = NULL, error = NULL", (time.time(),))
+
+    def fail(self, job:dict, worker_id:str, error:str, retry_delay:float=30):
+        now = time.time()
+        return self._update_leased(
+            job, worker_id,
+            "state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+            "finished = CASE WHEN attempts >= max_attempts THEN ? END, available_at = ?, lease_owner = NULL, error = ?",
+            (now, now + retry_delay * 2 ** (job["attempts"] - 1), error),
+        )
+
+    def release(self, job:dict, worker_id:str):
+        return self._update_leased(job, worker_id, "state = 'pending', attempts = attempts - 1, available_at = ?, lease_owner = NULL",
+                                   (time.time(),))
+
+    def counts(self):
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        with _connect(self.path) as db:
+            counts.update(db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return counts
+
+    def _update_leased(self, job:dict, worker_id:str, assignments:str, params:tuple):
+        with _connect(self.path) as db:
+            cursor = db.execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                                params + (job["id"], worker_id))
+            return cursor.rowcount == 1
+
+class SQLiteResultStore(ResultStore):
+    '''
+    Results in a SQLite database, by default the queue's own. A job retried after its lease
+    expired may be stored twice; the later result replaces the earlier one.
+    '''
+    def __init__(self, path:str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with _connect(path) as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    job_id TEXT PRIMARY KEY,
+                    location TEXT NOT NULL,
+                    worker TEXT,
+                    properties TEXT NOT NULL,
+                    metrics TEXT,
+                    finished REAL NOT NULL
+                )
+            """)
+
+    def put(self, job_id:str, location:str, worker_id:str, properties:list, metrics:dict=None):
+        with _connect(self.path) as db:
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                       (job_id, location, worker_id, json.dumps(properties), json.dumps(metrics), time.time()))
+
+    def results(self):
+        with _connect(self.path) as db:
+            rows = db.execute("SELECT job_id, location, worker, properties, metrics, finished FROM results ORDER BY finished").fetchall()
+        return [{"job_id": job_id, "location": location, "worker": worker, "properties": json.loads(properties),
+                 "metrics": json.loads(metrics) if metrics else None, "finished": finished}
+                for job_id, location, worker, properties, metrics, finished in rows]
+
+class DirectoryResultStore(ResultStore):
+    '''
+    Results as one JSON file per job in a (shared) directory.
+    '''
+    def __init__(self, path:str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def put(self, job_id:str, location:str, worker_id:str, properties:list, metrics:dict=None):
+        result = {"job_id": job_id, "location": location, "worker": worker_id, "properties": properties,
+                  "metrics": metrics, "finished": time.time()}
+        # Write to a temporary file and swap it in, so readers never see a partial file
+        tmp_path = os.path.join(self.path, f".{job_id}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, os.path.join(self.path, f"{job_id}.json"))
+
+    def results(self):
+        results = []
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                with open(os.path.join(self.path, name), "r") as f:
+                    results.append(json.load(f))
+        return sorted(results, key=lambda result: result["finished"])
+
+QUEUE_BACKENDS = {"sqlite": SQLiteJobQueue}
+STORE_BACKENDS = {"sqlite": SQLiteResultStore, "dir": DirectoryResultStore}
+
+def open_queue(url:str):
+    '''The job queue at `url`, e.g. "sqlite:///mnt/shared/queue.db". A bare path means SQLite.'''
+    scheme, path = _split_url(url)
+    return QUEUE_BACKENDS[scheme](path)
+
+def open_store(url:str):
+    '''The result store at `url`, e.g. "sqlite:///mnt/shared/queue.db" or "dir:///mnt/shared/results".'''
+    scheme, path = _split_url(url)
+    return STORE_BACKENDS[scheme](path)
+
+def _split_url(url:str):
+    scheme, separator, path = url.partition("://")
+    if not separator:
+        return "sqlite", url
+    if scheme not in QUEUE_BACKENDS and scheme not in STORE_BACKENDS:
+        raise ValueError(f"Unknown queue backend {scheme!r} in {url!r}")
+    return scheme, path
+
+@contextmanager
+def _connect(path:str):
+    '''A short-lived connection in autocommit mode; concurrent writers wait up to 30 s for each other.'''
+    db = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        yield db
+    except BaseException:
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        raise
+    finally:
+        db.close()
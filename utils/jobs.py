@@ -0,0 +1,450 @@
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from utils import cpuprofile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Every job gets its own directory of status files under here
+JOBS_DIR = "status/jobs"
+REGISTRY_LOCK = os.path.join(JOBS_DIR, ".registry.lock")
+# How long a submitted job may wait for the worker before it's treated as lost
+QUEUE_GRACE = 60  # seconds
+
+# Log levels, lowest first. Per-listing progress is "debug", everything else "info".
+LOG_LEVELS = {"debug": 10, "info": 20, "error": 40}
+DEBUG_PREFIXES = ("Processing property", "Found property")
+DEFAULT_LOG_CONFIG = {"level": "info", "maxBytes": 256 * 1024, "keepSegments": 5, "tailLines": 200}
+
+class JobLimitReached(Exception):
+    '''Raised when a new job would exceed the concurrent job cap.'''
+
+def job_paths(job_id:str):
+    '''
+    Paths of the status files for `job_id`.
+    '''
+    job_dir = os.path.join(JOBS_DIR, job_id)
+    return {
+        "dir": job_dir,
+        "meta": os.path.join(job_dir, "meta.json"),
+        "lock": os.path.join(job_dir, "owner.lock"),
+        "status": os.path.join(job_dir, "current_status.txt"),
+        "properties": os.path.join(job_dir, "properties.json"),
+        "log": os.path.join(job_dir, "log.txt"),
+        "log_tail": os.path.join(job_dir, "log_tail.txt"),
+        "page_info": os.path.join(job_dir, "page_info.json"),
+        "metrics": os.path.join(job_dir, "metrics.json"),
+        "profile": os.path.join(job_dir, "profile.prof"),
+    }
+
+class JobRegistry:
+    '''
+    Tracks scrape jobs on disk so several sessions can scrape at the same time.
+
+    A job is owned by the process running it, which holds an exclusive lock on the job's
+    `owner.lock` for as long as it runs. Whether a job is still running is answered by that
+    lock rather than by timestamps, so a crashed runner releases its job immediately.
+    '''
+    def __init__(self, max_concurrent:int=3):
+        '''
+        Args:
+         - max_concurrent: (int) Maximum number of queued or running jobs, or None for no cap
+           (queue workers, which are bounded by their own concurrency).
+        '''
+        self.max_concurrent = max_concurrent
+        os.makedirs(JOBS_DIR, exist_ok=True)
+
+    def create(self, location:str, owner:str=None, state:str="queued"):
+        '''
+        Registers a new job and creates its status directory.
+
+        Args:
+         - location: (str) The location the job scrapes.
+         - owner: (str) Optional id of the session that submitted the job.
+         - state: (str) "queued" for scrapes (counted against the cap), "done" for
+           jobs whose results are written directly, such as demo data.
+
+        Returns:
+         The new job id. Raises JobLimitReached if the cap is already reached.
+        '''
+        with _FileLock(REGISTRY_LOCK):
+            if state == "queued" and self.max_concurrent is not None and len(self.active_jobs()) >= self.max_concurrent:
+                raise JobLimitReached(f"{self.max_concurrent} scrapes are already running")
+
+            job_id = uuid.uuid4().hex[:12]
+            paths = job_paths(job_id)
+            os.makedirs(paths["dir"])
+            _write_json(paths["meta"], {
+                "job_id": job_id,
+                "location": location,
+                "owner": owner,
+                "state": state,
+                "created": time.time(),
+            })
+        return job_id
+
+    def active_jobs(self):
+        '''Ids of jobs that are queued or running.'''
+        if not os.path.isdir(JOBS_DIR):
+            return []
+        return [job_id for job_id in os.listdir(JOBS_DIR) if not job_id.startswith(".") and self.is_active(job_id)]
+
+    def is_active(self, job_id:str):
+        '''
+        True while the job is running (its owner lock is held) or waiting to be picked up.
+        '''
+        meta = read_meta(job_id)
+        if meta is None:
+            return False
+        if meta["state"] == "queued":
+            return time.time() - meta["created"] < QUEUE_GRACE
+        if meta["state"] == "running":
+            return _is_locked(job_paths(job_id)["lock"])
+        return False
+
+    def claim(self, job_id:str):
+        '''
+        Takes ownership of a job for the calling process and marks it running.
+
+        Returns:
+         A lock handle to pass to `release` when the job ends.
+        '''
+        lock = _FileLock(job_paths(job_id)["lock"])
+        lock.acquire()
+        update_meta(job_id, state="running", started=time.time(), pid=os.getpid())
+        return lock
+
+    def release(self, job_id:str, lock, state:str="done"):
+        '''Marks the job finished (or failed/stopped) and drops its ownership lock.'''
+        update_meta(job_id, state=state, finished=time.time())
+        lock.release()
+
+    def cleanup(self, max_age:float=24 * 60 * 60):
+        '''Removes finished jobs older than `max_age` seconds, and marks lost ones as failed.'''
+        if not os.path.isdir(JOBS_DIR):
+            return
+        for job_id in os.listdir(JOBS_DIR):
+            meta = read_meta(job_id)
+            if meta is None or self.is_active(job_id):
+                continue
+            if meta["state"] in ("queued", "running"):
+                # Its runner went away without releasing it
+                update_meta(job_id, state="failed", finished=time.time())
+            elif time.time() - meta.get("finished", meta["created"]) > max_age:
+                shutil.rmtree(job_paths(job_id)["dir"], ignore_errors=True)
+
+def read_meta(job_id:str):
+    return _read_json(job_paths(job_id)["meta"], None)
+
+def update_meta(job_id:str, **fields):
+    meta = read_meta(job_id) or {"job_id": job_id, "created": time.time()}
+    meta.update(fields)
+    _write_json(job_paths(job_id)["meta"], meta)
+
+def _write_json(path:str, data):
+    # Write to a temporary file and swap it in, so readers never see a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+class _FileLock:
+    '''
+    An exclusive advisory lock on a file, held until released or the process exits.
+    '''
+    def __init__(self, path:str):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+
+    def release(self):
+        if self.fd is not None:
+            if fcntl:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+def _is_locked(path:str):
+    '''True if another process holds the lock on `path`.'''
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except OSError:
+        return False
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        return False
+    except OSError:
+        return True
+    finally:
+        os.close(fd)
+
+def page_progress(message:str, page_info:dict):
+    '''
+    Page info after the renderer's status `message`, for renderers that follow next-page links
+    and only learn the page count at the end.
+
+    Only the renderer's own messages are parsed. Messages of one search among several (e.g. the
+    "[<shard>] Moving to page 3..." lines of utils/shards.py) are not, since their page numbers
+    are not the job's; those searches report summed "pages" events instead.
+
+    Returns:
+     The updated page info, or None if `message` says nothing about page progress.
+    '''
+    if message.startswith("Moving to page"):
+        try:
+            page_num = int(message.split()[-1].rstrip("."))
+        except (ValueError, IndexError):
+            return None
+        # Keep the total if the renderer already reported it
+        return {"current_page": page_num, "total_pages": page_info.get("total_pages")}
+    if message.startswith("No further pages to scrape"):
+        # We've reached the last page
+        return dict(page_info, total_pages=page_info.get("current_page"))
+    return None
+
+class JobReporter:
+    '''
+    Progress callback for `render_and_extract` that writes one job's status files.
+
+    Callbacks only queue the event; a background thread writes them out every `flush_interval`
+    seconds, so the scraping loop never waits on the filesystem. Each flush appends all new log
+    lines in one write, overwrites the status file once with the latest status, and rewrites the
+    properties, page info and metrics files at most once each. "complete" is flushed right away,
+    and `close()` flushes whatever is still queued. With `flush_interval=None` every event is
+    written before the call returns.
+
+    Log storage is bounded: lines below `log_config["level"]` are dropped, `log.txt` is rotated
+    into gzip-compressed segments once it exceeds `maxBytes` (keeping `keepSegments` of them),
+    and the last `tailLines` lines are kept in a ring buffer mirrored to `log_tail.txt` for the UI.
+    '''
+    def __init__(self, job_id:str, flush_interval:float=0.5, log_config:dict=None):
+        self.job_id = job_id
+        self.paths = job_paths(job_id)
+        self.flush_interval = flush_interval
+        self.log_config = dict(DEFAULT_LOG_CONFIG, **(log_config or {}))
+        self.log_level = LOG_LEVELS[self.log_config["level"]]
+        self._tail = None  # ring buffer of recent log lines, loaded on first use
+        self._events = queue.SimpleQueue()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._cpu_profiler = None  # set while the job runs under utils.cpuprofile, to profile the writes too
+        # Loaded from disk on first use, then kept in memory
+        self._properties = None
+        self._page_info = None
+        self._metrics = None
+
+    def __call__(self, update_type, data):
+        self._events.put((update_type, data, time.time()))
+        self._cpu_profiler = cpuprofile.current()
+        if self.flush_interval is None or self._closed:
+            self.flush()
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"job-{self.job_id}-writer", daemon=True)
+            self._thread.start()
+        if update_type == "complete":
+            self._wake.set()
+
+    def log(self, message:str):
+        self("log", message)
+
+    def close(self):
+        '''Stops the writer thread and flushes everything still queued.'''
+        self._closed = True
+        if self._thread is not None:
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            profiler = self._cpu_profiler
+            try:
+                profiler.wrap(self.flush)() if profiler is not None else self.flush()
+            except OSError as e:
+                print(f"Failed to write status for job {self.job_id}: {e}")
+
+    def flush(self):
+        '''Writes all queued events to the job's files.'''
+        with self._flush_lock:
+            log_lines = []
+            status = None
+            changed = set()
+            while True:
+                try:
+                    update_type, data, timestamp = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                stamp = time.strftime('%H:%M:%S', time.localtime(timestamp))
+
+                if update_type == "status":
+                    status = data
+                    # Also append to log with timestamp
+                    log_lines.append(f"[{stamp}] {data}\n")
+
+                    # Track page progress
+                    page_info = page_progress(data, self._read_page_info())
+                    if page_info is not None:
+                        self._page_info = page_info
+                        changed.add("page_info")
+
+                elif update_type == "log":
+                    log_lines.append(f"[{stamp}] {data}\n")
+
+                elif update_type == "pages":
+                    # Page totals planned up front by the renderer
+                    self._page_info = data
+                    changed.add("page_info")
+
+                elif update_type == "metrics":
+                    # Job metrics, merged section by section
+                    if self._metrics is None:
+                        self._metrics = read_metrics(self.job_id)
+                    self._metrics.update(data)
+                    changed.add("metrics")
+
+                elif update_type == "property":
+                    if self._properties is None:
+                        self._properties = read_properties(self.job_id)
+                    self._properties.append(data)
+                    changed.add("properties")
+                    # Also log the property
+                    log_lines.append(f"[{stamp}] Found property: {data.get('address', 'Unknown')} - {data.get('price', 'N/A')}\n")
+
+                elif update_type == "properties":
+                    # A whole result set at once, e.g. demo data
+                    self._properties = list(data)
+                    changed.add("properties")
+                    log_lines.append(f"[{stamp}] Loaded {len(data)} properties\n")
+
+                elif update_type == "complete":
+                    status = f"Completed! Found {data} properties."
+
+            log_lines = [line for line in log_lines if _log_level(line) >= self.log_level]
+            if log_lines:
+                self._write_log(log_lines)
+            if status is not None:
+                with open(self.paths["status"], "w") as f:
+                    f.write(status)
+            if "page_info" in changed:
+                _write_json(self.paths["page_info"], self._page_info)
+            if "metrics" in changed:
+                _write_json(self.paths["metrics"], self._metrics)
+            if "properties" in changed:
+                _write_json(self.paths["properties"], self._properties)
+
+    def _write_log(self, lines:list):
+        with open(self.paths["log"], "a") as f:
+            f.writelines(lines)
+        if os.path.getsize(self.paths["log"]) > self.log_config["maxBytes"]:
+            self._rotate_log()
+
+        if self._tail is None:
+            self._tail = deque(read_log(self.job_id), maxlen=self.log_config["tailLines"])
+        self._tail.extend(lines)
+        tmp_path = f"{self.paths['log_tail']}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(self._tail)
+        os.replace(tmp_path, self.paths["log_tail"])
+
+    def _rotate_log(self):
+        '''Compresses log.txt into log.txt.1.gz, shifting older segments up and dropping the oldest.'''
+        log_path = self.paths["log"]
+        keep = self.log_config["keepSegments"]
+        for n in range(keep, 0, -1):
+            segment = f"{log_path}.{n}.gz"
+            if os.path.exists(segment):
+                if n == keep:
+                    os.remove(segment)
+                else:
+                    os.replace(segment, f"{log_path}.{n + 1}.gz")
+        if keep:
+            with open(log_path, "rb") as src, gzip.open(f"{log_path}.1.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        os.remove(log_path)
+
+    def _read_page_info(self):
+        if self._page_info is None:
+            self._page_info = read_page_info(self.job_id)
+        return self._page_info
+
+def read_status(job_id:str):
+    try:
+        with open(job_paths(job_id)["status"], "r") as f:
+            return f.read().strip()
+    except OSError:
+        return "Ready"
+
+def read_log(job_id:str):
+    '''The most recent log lines of a job (see `JobReporter` for how many).'''
+    try:
+        with open(job_paths(job_id)["log_tail"], "r") as f:
+            return f.readlines()
+    except OSError:
+        return []
+
+def _log_level(line:str):
+    # Lines look like "[HH:MM:SS] message"
+    message = line.split("] ", 1)[-1]
+    if message.startswith(DEBUG_PREFIXES):
+        return LOG_LEVELS["debug"]
+    if message.startswith("Error"):
+        return LOG_LEVELS["error"]
+    return LOG_LEVELS["info"]
+
+def read_properties(job_id:str):
+    return _read_json(job_paths(job_id)["properties"], [])
+
+def read_page_info(job_id:str):
+    return _read_json(job_paths(job_id)["page_info"], {"current_page": 1, "total_pages": None})
+
+def read_metrics(job_id:str):
+    return _read_json(job_paths(job_id)["metrics"], {})
+
+def write_properties(job_id:str, properties:list):
+    _write_json(job_paths(job_id)["properties"], properties)
+
+def write_page_info(job_id:str, page_info:dict):
+    _write_json(job_paths(job_id)["page_info"], page_info)
+
+def _read_json(path:str, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return default
@@ -0,0 +1,329 @@
+import json
+import os
+import re
+import threading
+from types import SimpleNamespace
+from utils.hedging import complete
+
+# Process-wide Groq clients keyed by API key, so pages and jobs share one connection pool
+_clients = {}
+_clients_lock = threading.Lock()
+# Process-wide cap on listings being extracted at once, sized by `llmConfig.concurrency` on first use
+_in_flight = None
+
+def get_groq_client(api_key:str, config:dict=None):
+    '''
+    Returns the shared Groq client for `api_key`, creating it on first use.
+
+    The client is backed by a single tuned `httpx` connection pool, so keep-alive connections
+    and TLS sessions survive between listings, pages and jobs. With `llmConfig.deadline` set, the
+    SDK doesn't retry on its own: a retried call could hold a pool thread for several deadlines
+    after its caller gave up, and the model cascade already moves failed listings on.
+
+    Args:
+     - api_key: (str) Groq API key.
+     - config: (dict) Scraper config; `llmConfig.concurrency` and `llmConfig.connectionPool`
+       size the pool. Only used when the client is first created.
+
+    Returns:
+     A `groq.Groq` client.
+    '''
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            from groq import Groq
+            llm_config = (config or {}).get("llmConfig", {})
+            retries = {"max_retries": 0} if llm_config.get("deadline") else {}
+            client = Groq(api_key=api_key, http_client=_build_http_client(config or {}), **retries)
+            _clients[api_key] = client
+        return client
+
+def _build_http_client(config:dict):
+    '''
+    Builds the pooled `httpx.Client` used by the Groq SDK.
+    '''
+    import httpx
+
+    llm_config = config.get("llmConfig", {})
+    pool = llm_config.get("connectionPool", {})
+    # One connection per in-flight extraction request, and one more for its hedge
+    concurrency = llm_config.get("concurrency", 4)
+    if (llm_config.get("hedging") or {}).get("enabled"):
+        concurrency *= 2
+
+    limits = httpx.Limits(
+        max_connections=pool.get("maxConnections", concurrency),
+        max_keepalive_connections=pool.get("maxKeepaliveConnections", concurrency),
+        keepalive_expiry=pool.get("keepaliveExpiry", 120),
+    )
+    return httpx.Client(
+        limits=limits,
+        http2=pool.get("http2", True) and http2_available(),
+        timeout=httpx.Timeout(pool.get("timeout", 60), connect=pool.get("connectTimeout", 10)),
+    )
+
+def get_secondary_client(settings:dict, config:dict=None):
+    '''
+    Returns the shared client for an OpenAI-compatible endpoint, used to hedge slow calls.
+
+    Args:
+     - settings: (dict) `llmConfig.hedging.secondary`: `baseUrl` (e.g. "http://localhost:8000/v1")
+       and optionally `apiKeyEnv`, the environment variable holding its API key.
+     - config: (dict) Scraper config, for the connection pool settings.
+    '''
+    base_url = settings["baseUrl"]
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            api_key = os.environ.get(settings.get("apiKeyEnv") or "", "") or None
+            client = OpenAICompatibleClient(base_url, api_key, http_client=_build_http_client(config or {}))
+            _clients[base_url] = client
+        return client
+
+class OpenAICompatibleClient:
+    '''
+    Minimal client for an OpenAI-compatible chat completions endpoint (vLLM, llama.cpp, Ollama, ...).
+
+    Exposes `chat.completions.create` like the Groq SDK, and returns responses with the same
+    attributes (`choices[0].message.content`, `usage.prompt_tokens`, ...), so `parse_response` works on them.
+    '''
+    def __init__(self, base_url:str, api_key:str=None, http_client=None):
+        import httpx
+
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.http_client = http_client or httpx.Client()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model:str, timeout:float=None, **request):
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        response = self.http_client.post(f"{self.base_url}/chat/completions", json=dict(request, model=model),
+                                         headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return _namespace(response.json())
+
+def _namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+def http2_available():
+    '''httpx only speaks HTTP/2 when the optional `h2` package is installed.'''
+    try:
+        import h2
+        return True
+    except ImportError:
+        return False
+
+def new_extraction_stats():
+    '''
+    Counters filled in by `extract_listing` over a run and reported with the job's metrics.
+    '''
+    return {"listings": 0, "escalations": 0, "invalid": 0, "models": {}, "prompt_tokens": 0, "completion_tokens": 0,
+            # per LLM call, see utils/hedging.py::complete
+            "calls": 0, "hedged": 0, "hedge_wins": 0, "deadline_exceeded": 0, "latencies": [], "primary_latencies": []}
+
+def add_usage(usage:dict, model:str, chat):
+    '''
+    Adds the token counts (and Groq's server-side `total_time`, when reported) of one chat completion
+    to `usage`, a dict of model -> counts for one listing.
+    '''
+    tokens = usage.setdefault(model, {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0, "server_seconds": 0.0})
+    tokens["calls"] += 1
+    if getattr(chat, "usage", None):
+        tokens["prompt_tokens"] += chat.usage.prompt_tokens or 0
+        tokens["completion_tokens"] += chat.usage.completion_tokens or 0
+        tokens["server_seconds"] += getattr(chat.usage, "total_time", None) or 0.0
+
+def cascade_models(config:dict):
+    '''
+    The models to try for each listing, cheapest first. Falls back to the single `llmConfig.model`.
+    '''
+    llm_config = config.get("llmConfig")
+    return llm_config.get("models") or [llm_config.get("model")]
+
+# A price is a number or a "min-max" range once currency symbols, commas and spaces are removed
+_PRICE_PATTERN = re.compile(r"\d+(\.\d+)?(-\d+(\.\d+)?)?")
+
+def validate_property(data):
+    '''
+    Checks an extracted record against the schema the prompt asks for.
+
+    Args:
+     - data: The parsed LLM output.
+
+    Returns:
+     A list of problems, empty when the record is valid.
+    '''
+    if not isinstance(data, dict):
+        return ["not a JSON object"]
+
+    problems = []
+    price = str(data.get("Price", "")).replace("$", "").replace(",", "").replace(" ", "")
+    if not _PRICE_PATTERN.fullmatch(price):
+        problems.append(f"price {data.get('Price')!r} is not numeric")
+
+    beds = data.get("Beds")
+    if isinstance(beds, bool) or not isinstance(beds, int) or not 0 <= beds <= 20:
+        problems.append(f"beds {beds!r} is not a plausible integer")
+
+    baths = data.get("Baths")
+    if baths is not None:
+        if isinstance(baths, bool) or not isinstance(baths, (int, float)) or not 0.5 <= baths <= 20 or (baths * 2) % 1:
+            problems.append(f"baths {baths!r} is not plausible")
+
+    return problems
+
+# Function schema for the "tools" output mode. Short argument names keep generated tokens down.
+LISTING_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "listing",
+        "description": "Record one rental listing.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "lo": {"type": ["number", "null"], "description": "Lowest price, digits only."},
+                "hi": {"type": ["number", "null"], "description": "Highest price if a range, else null."},
+                "bd": {"type": ["integer", "null"], "description": "Bedrooms (studio = 0)."},
+                "ba": {"type": ["number", "null"], "description": "Bathrooms."},
+                "ad": {"type": ["string", "null"], "description": "Street address."},
+            },
+            "required": ["lo", "hi", "bd", "ba", "ad"],
+        },
+    },
+}
+
+def build_request(listing:str, config:dict):
+    '''
+    Chat completion arguments (other than the model) for `listing` in the configured output mode.
+
+    `llmConfig.outputMode` is "json" for the verbose record, "compact" for a positional
+    `[price_min, price_max, beds, baths, address]` array, or "tools" for a function call.
+    '''
+    llm_config = config.get("llmConfig")
+    mode = llm_config.get("outputMode", "json")
+    user_message = {
+        "role": "user",
+        "content": f"Extract info from the following text:\n\n{listing}",
+    }
+
+    if mode == "compact":
+        return {
+            "messages": [llm_config.get("compactPrompt"), user_message],
+            "response_format": {"type": "json_object"},
+        }
+    if mode == "tools":
+        return {
+            "messages": [llm_config.get("toolsPrompt"), user_message],
+            "tools": [LISTING_TOOL],
+            "tool_choice": {"type": "function", "function": {"name": "listing"}},
+        }
+    return {
+        "messages": [llm_config.get("systemPrompt"), user_message],
+        "response_format": llm_config.get("responseFormat"),
+    }
+
+def parse_response(chat, config:dict):
+    '''
+    Turns a chat completion into the standard property record, expanding compact output locally.
+    '''
+    mode = config.get("llmConfig").get("outputMode", "json")
+    message = chat.choices[0].message
+
+    if mode == "compact":
+        return expand_compact(json.loads(message.content)["r"])
+    if mode == "tools":
+        args = json.loads(message.tool_calls[0].function.arguments)
+        return expand_compact([args.get("lo"), args.get("hi"), args.get("bd"), args.get("ba"), args.get("ad")])
+    return json.loads(message.content)
+
+def expand_compact(values):
+    '''
+    Expands `[price_min, price_max, beds, baths, address]` into the standard property record.
+    '''
+    price_min, price_max, beds, baths, address = (list(values) + [None] * 5)[:5]
+
+    def number(value):
+        # whole numbers print without a trailing .0
+        return str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+
+    is_range = price_max is not None and price_min is not None and price_max != price_min
+    if price_min is None:
+        price_min, price_max = price_max, None
+    return {
+        "Price": f"{number(price_min)}-{number(price_max)}" if is_range else (number(price_min) if price_min is not None else "N/A"),
+        "price_type": "range" if is_range else "fixed",
+        "Beds": beds,
+        "Baths": baths,
+        "Address": address,
+    }
+
+def extract_listing(client, listing:str, config:dict, stats:dict=None, usage:dict=None):
+    '''
+    Extracts one listing through the model cascade.
+
+    The listing goes to the first (fastest/cheapest) model in `llmConfig.models`. Only when the
+    call fails or its output doesn't pass `validate_property` is it escalated to the next model.
+    Each call is bounded by `llmConfig.deadline` and may be hedged, see `utils.hedging.complete`.
+    At most `llmConfig.concurrency` listings are extracted at once per process, whichever jobs
+    they belong to; further calls wait for a free slot.
+
+    Args:
+     - client: Groq client.
+     - listing: (str) Prepared listing text.
+     - config: (dict) Scraper config.
+     - stats: (dict) Optional counters from `new_extraction_stats`, updated in place.
+     - usage: (dict) Optional per-model token counts for this listing, filled in by `add_usage`.
+       Both calls of a hedged pair are counted; the one that lost may be added after this returns.
+
+    Returns:
+     The first valid record, or the last model's parsed output if none validated.
+     Raises the last error if no model returned parseable JSON.
+    '''
+    with _extraction_slots(config):
+        return _extract_listing(client, listing, config, stats, usage)
+
+def _extraction_slots(config:dict):
+    global _in_flight
+    with _clients_lock:
+        if _in_flight is None:
+            _in_flight = threading.BoundedSemaphore(config.get("llmConfig", {}).get("concurrency", 4))
+        return _in_flight
+
+def _extract_listing(client, listing:str, config:dict, stats:dict=None, usage:dict=None):
+    models = cascade_models(config)
+    result = None
+    error = None
+
+    for tier, model in enumerate(models):
+        if stats is not None:
+            stats["models"][model] = stats["models"].get(model, 0) + 1
+            if tier == 1:
+                stats["escalations"] += 1
+        try:
+            chat = complete(client, model, build_request(listing, config), config, stats, usage)
+            result = parse_response(chat, config)
+        except Exception as e:
+            print(f"Error extracting data with {model}: {e}")
+            error = e
+            continue
+
+        problems = validate_property(result)
+        if not problems:
+            break
+        print(f"Invalid output from {model}: {'; '.join(problems)}")
+    else:
+        if stats is not None and result is not None:
+            stats["invalid"] += 1
+
+    if stats is not None:
+        stats["listings"] += 1
+    if result is None:
+        raise error
+    return result
+
+def escalation_rate(stats:dict):
+    return stats["escalations"] / stats["listings"] if stats["listings"] else 0.0
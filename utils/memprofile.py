@@ -0,0 +1,192 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+class MemoryProfiler:
+    '''
+    Records memory use at the stages of a scrape and writes a top-allocators report.
+
+    Each `checkpoint` takes a tracemalloc snapshot and samples the RSS of this process and of
+    the Chromium processes below it. The report lists, per checkpoint, traced and resident memory
+    and the lines whose allocations grew most since the previous checkpoint, followed by the
+    top allocating lines overall, so a regression can be pinned to a line.
+
+    tracemalloc is process-wide, so with several jobs in one process the numbers include all of them.
+    '''
+    def __init__(self, report_path:str, top:int=15, frames:int=1):
+        '''
+        Args:
+         - report_path: (str) Where to write the report. A JSON copy is written next to it.
+         - top: (int) Number of allocating lines to list.
+         - frames: (int) Stack frames tracemalloc keeps per allocation.
+        '''
+        self.report_path = report_path
+        self.top = top
+        self.frames = frames
+        self.stages = []
+        self.peak_chromium_rss = 0
+        self._baseline = None
+        self._previous = None
+        self._started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._baseline = self._previous = _snapshot()
+        self.started = time.time()
+        return self
+
+    def checkpoint(self, label:str):
+        '''Records memory at a stage boundary, e.g. "page 3 captured".'''
+        if self._baseline is None:
+            return
+        snapshot = _snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        chromium_rss = chromium_rss_bytes()
+        self.peak_chromium_rss = max(self.peak_chromium_rss, chromium_rss)
+        growth = snapshot.compare_to(self._previous, "lineno")[:5]
+        self.stages.append({
+            "label": label,
+            "time": round(time.time() - self.started, 2),
+            "traced_mb": _mb(current),
+            "traced_peak_mb": _mb(peak),
+            "rss_mb": _mb(rss_bytes()),
+            "chromium_rss_mb": _mb(chromium_rss),
+            "growth": [{"line": str(stat.traceback), "size_diff_kb": round(stat.size_diff / 1024, 1)} for stat in growth],
+        })
+        self._previous = snapshot
+
+    def stop(self):
+        '''Takes a final snapshot, writes the report and stops tracing if this profiler started it.'''
+        if self._baseline is None:
+            return None
+        final = _snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        report = {
+            "stages": self.stages,
+            "traced_peak_mb": _mb(peak),
+            "peak_rss_mb": _mb(peak_rss_bytes()),
+            "peak_chromium_rss_mb": _mb(self.peak_chromium_rss),
+            "top_allocators": [
+                {"line": str(stat.traceback), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                for stat in final.statistics("lineno")[:self.top]
+            ],
+            "top_growth": [
+                {"line": str(stat.traceback), "size_diff_kb": round(stat.size_diff / 1024, 1)}
+                for stat in final.compare_to(self._baseline, "lineno")[:self.top]
+            ],
+        }
+        if self._started_tracing:
+            tracemalloc.stop()
+        self._baseline = self._previous = None
+
+        os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+        with open(self.report_path, "w") as f:
+            f.write(format_report(report))
+        with open(os.path.splitext(self.report_path)[0] + ".json", "w") as f:
+            json.dump(report, f, indent=4)
+        return report
+
+def format_report(report:dict):
+    lines = [
+        f"Peak traced Python memory: {report['traced_peak_mb']} MB",
+        f"Peak RSS (Python process): {report['peak_rss_mb']} MB",
+        f"Peak RSS (Chromium, sampled at checkpoints): {report['peak_chromium_rss_mb']} MB",
+        "",
+        "Stages:",
+    ]
+    for stage in report["stages"]:
+        lines.append(f"  [{stage['time']:>7.2f}s] {stage['label']}: traced {stage['traced_mb']} MB, "
+                     f"RSS {stage['rss_mb']} MB, Chromium {stage['chromium_rss_mb']} MB")
+        for growth in stage["growth"][:3]:
+            lines.append(f"      {growth['size_diff_kb']:+.1f} KB  {growth['line']}")
+    lines += ["", "Top allocators (live at the end):"]
+    lines += [f"  {stat['size_kb']:>10.1f} KB  {stat['count']:>7} blocks  {stat['line']}" for stat in report["top_allocators"]]
+    lines += ["", "Top growth since start:"]
+    lines += [f"  {stat['size_diff_kb']:+10.1f} KB  {stat['line']}" for stat in report["top_growth"]]
+    return "\n".join(lines) + "\n"
+
+def _snapshot():
+    # Leave out the profiler's own bookkeeping
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+
+def checkpoint(profiler, label:str):
+    '''Shorthand for call sites where profiling is optional.'''
+    if profiler is not None:
+        profiler.checkpoint(label)
+
+def rss_bytes(pid:int=None):
+    '''Current resident set size of `pid` (default: this process), or 0 if it can't be read.'''
+    pid = pid or os.getpid()
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return 0
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def peak_rss_bytes():
+    '''Peak resident set size of this process.'''
+    if resource is None:
+        return rss_bytes()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def chromium_rss_bytes():
+    '''Total RSS of the Chromium processes started (through Playwright) below this process.'''
+    return sum(rss_bytes(pid) for pid, name in _descendants(os.getpid()) if "chrom" in name or "headless_shell" in name)
+
+def _descendants(root:int):
+    try:
+        import psutil
+        return [(child.pid, child.name().lower()) for child in psutil.Process(root).children(recursive=True)]
+    except ImportError:
+        pass
+    except Exception:
+        return []
+
+    # Without psutil, walk /proc (Linux only)
+    children = {}
+    try:
+        pids = [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return []
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # "pid (name) state ppid ..." - the name may contain spaces
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        children.setdefault(ppid, []).append((pid, name.lower()))
+
+    found = []
+    stack = [root]
+    while stack:
+        for pid, name in children.get(stack.pop(), []):
+            found.append((pid, name))
+            stack.append(pid)
+    return found
+
+def _mb(size:int):
+    return round(size / (1024 * 1024), 1)
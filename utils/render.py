@@ -1,31 +1,24 @@
-from playwright.async_api import async_playwright
 import asyncio
-import os
-import sys
-
-# Function to check if running in cloud environment
-def is_cloud_environment():
-    # Check for common cloud environment indicators
-    if (os.environ.get("STREAMLIT_CLOUD") is not None or 
-            os.environ.get("IS_CLOUD_ENV") is not None or 
-            "streamlit.app" in os.environ.get("HOSTNAME", "") or 
-            os.path.exists("/.dockerenv")):
-        return True
-    
-    # Check for Streamlit Cloud specific paths
-    if (os.path.exists("/mount/src") or 
-            "/home/adminuser/venv" in sys.path or 
-            os.path.exists("/home/adminuser/venv")):
-        return True
-        
-    # Check if we're running in a path that looks like Streamlit Cloud
-    current_path = os.getcwd()
-    if "/mount/src" in current_path:
-        return True
-        
-    return False
+import math
+import re
+from urllib.parse import urljoin, urlsplit
+from config.tools import is_cloud_environment
+from utils.llm import http2_available
+from utils.budget import Budget
+from utils.memprofile import checkpoint
+from utils.concurrency import AdaptiveConcurrency, BACKOFF_OUTCOMES, BLOCKED_OUTCOMES
 
-async def render(location:str, config:dict, headless:bool=True, callback=None):
+# Browser identity shared by the Playwright contexts and the plain HTTP fetcher
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+LOCALE = "en-US"
+HTTP_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+async def render(location:str, config:dict, headless:bool=True, callback=None, browser=None, budget=None, har=None, profiler=None,
+                 concurrency=None, get_browser=None):
     '''
     Function responsible for loading and rendering all the property listings for 
     given `location`.
@@ -35,6 +28,18 @@ async def render(location:str, config:dict, headless:bool=True, callback=None):
      - config: (dict) A dict containing all the configurations for rendering.
      - headless: (bool) Set it to false if you want to see the browser rendering.
      - callback: (function) Optional callback for status updates.
+     - browser: (Browser) Optional already-launched browser to reuse. Only a fresh context is
+       opened and closed on it, so the browser itself stays warm for the next call.
+     - get_browser: (async function) Optional source of a warm browser, e.g. a `LazyBrowser`,
+       called only once a browser is needed (right away in "browser" fetch mode, for the
+       fallback in "auto" mode). Used when `browser` isn't given.
+     - budget: (Budget) Optional page and deadline limits; pagination stops early once reached.
+     - har: (dict) Optional HAR settings from `utils.har.har_settings`. "record" saves the session
+       under `har["dir"]`, "replay" serves it from there with no network access.
+     - profiler: (MemoryProfiler) Optional memory profiler, checkpointed after each page capture.
+     - concurrency: (AdaptiveConcurrency) Optional controller for the number of pages loaded at
+       once; one is created from the config's `pageConcurrency` if omitted. Pass one in to read
+       its window and latencies afterwards.
     
     Returns:
      HTML body of all the pages rendered.
@@ -47,13 +52,16 @@ async def render(location:str, config:dict, headless:bool=True, callback=None):
             callback("status", error_msg)
         return []
         
-    URL = config.get("url")
-    TIMEOUT = config.get("timeout")
-    #imp selectors
-    WAIT_SELECTOR = config.get("waitSelector")
-    NEXT_BUTTON_SELECTOR = config.get("items").get("nextButton").get("selector")
-    SEARCH_BOX_SELECTOR = config.get("items").get("searchBox").get("selector")
-    SEARCH_BOX_BUTTON_SELECTOR = config.get("items").get("searchButton").get("selector")
+    if har is not None:
+        status_msg = f"HAR {har['mode']} mode: {har['dir']}"
+        print(status_msg)
+        if callback:
+            callback("status", status_msg)
+
+    # Plain HTTP fetching first, with the browser only for pages that need it
+    if config.get("fetchMode", "browser") == "auto":
+        return await fetch_pages(location, config, headless=headless, callback=callback, browser=browser, budget=budget, har=har,
+                                 profiler=profiler, concurrency=concurrency, get_browser=get_browser)
 
     if callback:
         callback("status", f"Starting browser...")
@@ -66,9 +74,23 @@ async def render(location:str, config:dict, headless:bool=True, callback=None):
             callback("status", error_msg)
         return []
 
-    async with async_playwright() as p:
-        all_html = [] # html from all pages
+    if browser is None and get_browser is not None:
+        try:
+            browser = await get_browser()
+        except Exception as e:
+            error_msg = f"Problem occurred: {e}. Check if your internet connection is working and try again."
+            print(error_msg)
+            if callback:
+                callback("status", error_msg)
+            return []
 
+    if browser is not None:
+        return await _render_pages(browser, location, config, callback=callback, budget=budget, har=har, profiler=profiler,
+                                   concurrency=concurrency)
+
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
         if callback:
             callback("status", f"Launching browser with headless={headless}...")
             
@@ -82,127 +104,714 @@ async def render(location:str, config:dict, headless:bool=True, callback=None):
 
         try:
             browser = await p.chromium.launch(headless=headless)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-                viewport={"width": 1280, "height": 800},
-                locale="en-US",
-                java_script_enabled=True,
-            )
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-            """)
-            page = await context.new_page()
+        except Exception as e:
+            error_msg = f"Problem occurred: {e}. Check if your internet connection is working and try again."
+            print(error_msg)
+            if callback:
+                callback("status", error_msg)
+            return []
 
-            try:
-                status_msg = f"Navigating to {URL}..."
-                print(status_msg)
-                if callback:
-                    callback("status", status_msg)
-                    
-                await page.goto(URL, wait_until="domcontentloaded", timeout=TIMEOUT)
-                
-                status_msg = "Initialized site navigation"
-                print(status_msg)
-                if callback:
-                    callback("status", status_msg)
-                    
-                await page.locator(selector=SEARCH_BOX_SELECTOR).click()
-                await asyncio.sleep(2)
-                
-                status_msg = f"Entering location: {location}"
+        return await _render_pages(browser, location, config, callback=callback, budget=budget, har=har, profiler=profiler,
+                                   concurrency=concurrency)
+
+class LazyBrowser:
+    '''
+    A Chromium browser launched on first use and shared by everyone holding this object.
+
+    Await the object itself (`browser = await lazy()`) to get the browser; concurrent callers
+    wait for the same launch. Pass it as `get_browser` to `render`.
+    '''
+    def __init__(self, headless:bool=True):
+        self.headless = headless
+        self.playwright = None
+        self.browser = None
+        self.lock = asyncio.Lock()
+
+    async def __call__(self):
+        async with self.lock:
+            if self.browser is None:
+                from playwright.async_api import async_playwright
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(headless=self.headless)
+            return self.browser
+
+    async def close(self):
+        if self.browser is not None:
+            await self.browser.close()
+        if self.playwright is not None:
+            await self.playwright.stop()
+        self.browser = self.playwright = None
+
+async def _new_context(browser, location:str=None, har=None):
+    '''
+    Opens a browser context with the scraper's user agent, viewport and locale.
+
+    With `har` set, the context records to, or replays from, the browser HAR for `location`.
+    '''
+    har_options = {}
+    if har is not None:
+        from utils.har import har_files, context_options
+        har_path = har_files(location_slug(location), har)[0]
+        har_options = context_options(har_path, har)
+
+    context = await browser.new_context(
+        user_agent=USER_AGENT,
+        viewport={"width": 1280, "height": 800},
+        locale=LOCALE,
+        java_script_enabled=True,
+        **har_options
+    )
+    await context.add_init_script("""
+        Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
+    """)
+    if har is not None:
+        from utils.har import replay_into
+        await replay_into(context, har_path, har)
+    return context
+
+async def _render_pages(browser, location:str, config:dict, callback=None, budget=None, har=None, profiler=None, concurrency=None):
+    '''
+    Opens a new context on `browser`, searches for `location` and walks through all result pages.
+
+    Once the first page tells how many pages there are, the rest are loaded in parallel tabs,
+    as many at a time as `concurrency` allows. Otherwise the Next button is followed page by page.
+    Pages that time out are reloaded up to `concurrency.retries` times; in parallel mode a page
+    that still fails is skipped and the others are kept.
+
+    Returns:
+     HTML body of all the pages rendered.
+    '''
+    URL = config.get("url")
+    TIMEOUT = config.get("timeout")
+    #imp selectors
+    WAIT_SELECTOR = config.get("waitSelector")
+    NEXT_BUTTON_SELECTOR = config.get("items").get("nextButton").get("selector")
+    SEARCH_BOX_SELECTOR = config.get("items").get("searchBox").get("selector")
+    SEARCH_BOX_BUTTON_SELECTOR = config.get("items").get("searchButton").get("selector")
+    budget = budget or Budget()
+    concurrency = concurrency or AdaptiveConcurrency.from_config(config)
+
+    all_html = [] # html from all pages
+
+    try:
+        context = await _new_context(browser, location, har)
+    except Exception as e:
+        error_msg = f"Problem occurred: {e}. Check if your internet connection is working and try again."
+        print(error_msg)
+        if callback:
+            callback("status", error_msg)
+        return []
+
+    try:
+        page = await context.new_page()
+
+        try:
+            status_msg = f"Navigating to {URL}..."
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+
+            await page.goto(URL, wait_until="domcontentloaded", timeout=TIMEOUT)
+
+            status_msg = "Initialized site navigation"
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+
+            await page.locator(selector=SEARCH_BOX_SELECTOR).click()
+            await asyncio.sleep(2)
+
+            status_msg = f"Entering location: {location}"
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+
+            await page.locator(selector=SEARCH_BOX_SELECTOR).type(location, delay=300)
+
+            status_msg = f"Searching for properties in {location}..."
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+
+            await page.locator(selector=SEARCH_BOX_BUTTON_SELECTOR).click()  
+            await asyncio.sleep(3)  # Wait a bit for the URL to update
+            current_url = page.url
+
+            if location.replace(" ", "-").lower()[:6] in current_url.lower():
+                status_msg = f"Location verified! URL: {current_url}"
                 print(status_msg)
                 if callback:
                     callback("status", status_msg)
-                    
-                await page.locator(selector=SEARCH_BOX_SELECTOR).type(location, delay=300)
-                
-                status_msg = f"Searching for properties in {location}..."
+            else:
+                status_msg = f"Error: Location not found in URL: {current_url}"
                 print(status_msg)
                 if callback:
                     callback("status", status_msg)
-                    
-                await page.locator(selector=SEARCH_BOX_BUTTON_SELECTOR).click()  
-                await asyncio.sleep(3)  # Wait a bit for the URL to update
-                current_url = page.url
+                return []
 
-                if location.replace(" ", "-").lower()[:6] in current_url.lower():
-                    status_msg = f"Location verified! URL: {current_url}"
+            #implementing pagination to click on next and scrape the next page
+            counter = 1
+            summary = None
+            parallel = False
+            while True:
+                try:
+                    status_msg = f"Processing page {counter}..."
                     print(status_msg)
                     if callback:
                         callback("status", status_msg)
-                else:
-                    status_msg = f"Error: Location not found in URL: {current_url}"
+
+                    await _wait_for_listings(page, counter, config, concurrency, budget, callback)
+
+                    status_msg = f"Scrolling page {counter} to load all content..."
                     print(status_msg)
                     if callback:
                         callback("status", status_msg)
-                    return []
 
-                #implementing pagination to click on next and scrape the next page
-                counter = 1
-                while True:
-                    try:
-                        status_msg = f"Processing page {counter}..."
-                        print(status_msg)
-                        if callback:
-                            callback("status", status_msg)
-                            
-                        await page.wait_for_selector(WAIT_SELECTOR, timeout=TIMEOUT) 
-                        
-                        status_msg = f"Scrolling page {counter} to load all content..."
-                        print(status_msg)
+                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                    await asyncio.sleep(3)
+
+                    status_msg = f"Capturing HTML from page {counter}"
+                    print(status_msg)
+                    if callback:
+                        callback("status", status_msg)
+
+                    all_html.append(await page.inner_html("body"))
+                    budget.pages += 1
+                    checkpoint(profiler, f"page {counter} captured")
+                    if counter == 1:
+                        from selectolax.parser import HTMLParser
+                        summary = parse_search_summary(HTMLParser(all_html[0]), config)
                         if callback:
-                            callback("status", status_msg)
-                            
-                        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                        await asyncio.sleep(3)
-                    
-                        status_msg = f"Capturing HTML from page {counter}"
+                            callback("pages", {"current_page": 1, "total_pages": summary["total_pages"]})
+                        if (summary["total_pages"] or 0) > 1 and not budget.pages_exhausted():
+                            parallel = True
+                            break
+
+                    next_button = page.locator(NEXT_BUTTON_SELECTOR)
+                    if await next_button.count()==0 or not await next_button.is_visible():
+                        status_msg = f"No further pages to scrape. Total pages: {counter}"
                         print(status_msg)
                         if callback:
                             callback("status", status_msg)
-                            
-                        all_html.append(await page.inner_html("body"))
-                        
-                        next_button = page.locator(NEXT_BUTTON_SELECTOR)
-                        if await next_button.count()==0 or not await next_button.is_visible():
-                            status_msg = f"No further pages to scrape. Total pages: {counter}"
-                            print(status_msg)
-                            if callback:
-                                callback("status", status_msg)
-                            break
+                        break
 
-                        #Clicks next button
-                        status_msg = f"Moving to page {counter+1}..."
+                    if budget.pages_exhausted():
+                        status_msg = f"Stopping after page {counter}: {budget.reason or 'page limit reached'}"
                         print(status_msg)
                         if callback:
                             callback("status", status_msg)
-                            
-                        await next_button.click(timeout=TIMEOUT)
-                        await page.wait_for_selector(WAIT_SELECTOR, timeout=TIMEOUT) 
-                        counter += 1
-                    except Exception as e:
-                        error_msg = f"Problem occurred! Error in pagination: {e}."
-                        print(error_msg)
+                        break
+
+                    #Clicks next button
+                    status_msg = f"Moving to page {counter+1}..."
+                    print(status_msg)
+                    if callback:
+                        callback("status", status_msg)
+
+                    await next_button.click(timeout=budget.timeout_ms(TIMEOUT))
+                    counter += 1
+                except Exception as e:
+                    error_msg = f"Problem occurred! Error in pagination: {e}."
+                    print(error_msg)
+                    if callback:
+                        callback("status", error_msg)
+                    return all_html if all_html else []
+
+            if parallel:
+                # The full page set is known, so load the remaining pages in parallel tabs
+                total_pages = budget.page_limit(summary["total_pages"])
+                first_url = page.url
+                done = [1]
+
+                async def load(page_number):
+                    page_html = await _load_tab(context, page_url(first_url, page_number), page_number, config, concurrency, budget, callback)
+                    if page_html is not None:
+                        done[0] += 1
+                        checkpoint(profiler, f"page {page_number} captured")
                         if callback:
-                            callback("status", error_msg)
-                        return all_html if all_html else []
-                        
-                status_msg = f"Successfully scraped {len(all_html)} pages"
-                print(status_msg)
-                if callback:
-                    callback("status", status_msg)
-                    
-                return all_html
+                            callback("pages", {"current_page": done[0], "total_pages": total_pages})
+                    if callback:
+                        callback("metrics", {"concurrency": concurrency.summary()})
+                    return page_html
+
+                pages = await asyncio.gather(*(load(n) for n in range(2, total_pages + 1)))
+                all_html.extend(page_html for page_html in pages if page_html is not None)
+                budget.pages = len(all_html)
+                _report_skipped(pages, concurrency, budget, callback)
+
+            status_msg = f"Successfully scraped {len(all_html)} pages"
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+
+            return all_html
+        except Exception as e:
+            error_msg = f"Problem occurred: {e}. Check if your internet connection is working and try again."
+            print(error_msg)
+            if callback:
+                callback("status", error_msg)
+            return []
+    finally:
+        await context.close()
+
+async def _wait_for_listings(page, page_number:int, config:dict, concurrency, budget, callback=None):
+    '''
+    Waits for the listings on `page`, reloading it when they time out. Raises once the retries are used up.
+    '''
+    TIMEOUT = config.get("timeout")
+    WAIT_SELECTOR = config.get("waitSelector")
+
+    for attempt in range(concurrency.retries + 1):
+        try:
+            await page.wait_for_selector(WAIT_SELECTOR, timeout=budget.timeout_ms(TIMEOUT))
+            return
+        except Exception as e:
+            if attempt == concurrency.retries or budget.out_of_time():
+                raise
+            status_msg = f"Listings on page {page_number} did not load ({e.__class__.__name__}), reloading (retry {attempt+1}/{concurrency.retries})..."
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+            await page.reload(wait_until="domcontentloaded", timeout=budget.timeout_ms(TIMEOUT))
+
+async def _load_tab(context, url:str, page_number:int, config:dict, concurrency, budget, callback=None):
+    '''
+    Loads one results page in its own tab of `context`, in a `concurrency` slot.
+
+    Returns:
+     The page's HTML, or None if it still failed after `concurrency.retries` retries.
+    '''
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    TIMEOUT = config.get("timeout")
+    WAIT_SELECTOR = config.get("waitSelector")
+    CAPTCHA_SELECTOR = config.get("captchaSelector")
+
+    for attempt in range(concurrency.retries + 1):
+        if budget.out_of_time():
+            return None
+        html = None
+        async with concurrency.slot() as slot:
+            status_msg = f"Processing page {page_number}..."
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+
+            page = await context.new_page()
+            try:
+                response = await page.goto(url, wait_until="domcontentloaded", timeout=budget.timeout_ms(TIMEOUT))
+                outcome = status_outcome(response.status) if response is not None else "ok"
+                if outcome == "ok":
+                    await page.wait_for_selector(WAIT_SELECTOR, timeout=budget.timeout_ms(TIMEOUT))
+                    slot.done("ok")
+                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                    await asyncio.sleep(3)
+                    html = await page.inner_html("body")
+                else:
+                    slot.done(outcome)
+            except PlaywrightTimeoutError:
+                challenged = CAPTCHA_SELECTOR and await page.locator(CAPTCHA_SELECTOR).count() > 0
+                slot.done("captcha" if challenged else "timeout")
             except Exception as e:
-                error_msg = f"Problem occurred: {e}. Check if your internet connection is working and try again."
+                print(f"Loading page {page_number} failed: {e}")
+                slot.done("error")
+            finally:
+                await page.close()
+
+        if html is not None:
+            status_msg = f"Capturing HTML from page {page_number}"
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+            return html
+        if attempt < concurrency.retries:
+            status_msg = f"Page {page_number} failed ({slot.outcome}), retrying with {concurrency.limit()} pages at a time..."
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+            await asyncio.sleep(2 ** attempt)
+    return None
+
+def _report_skipped(pages:list, concurrency, budget, callback=None):
+    '''Reports pages of a parallel load that failed even after retries.'''
+    skipped = pages.count(None)
+    if skipped and not budget.reason:
+        status_msg = f"Skipped {skipped} pages that failed to load after {concurrency.retries} retries"
+        print(status_msg)
+        if callback:
+            callback("status", status_msg)
+
+def status_outcome(status:int):
+    '''
+    Classifies an HTTP status for `AdaptiveConcurrency`: "ok", "blocked" when the site turns the
+    client away (403), "http_error" when it is rate limiting or failing (429, 5xx), or
+    "unavailable" (e.g. a 404).
+    '''
+    if status < 400:
+        return "ok"
+    if status == 403:
+        return "blocked"
+    if status == 429 or status >= 500:
+        return "http_error"
+    return "unavailable"
+
+def page_url(first_url:str, page_number:int):
+    '''URL of a later results page, from the first page's URL, e.g. /new-york-ny/ -> /new-york-ny/2/.'''
+    parts = urlsplit(first_url)
+    return parts._replace(path=f"{parts.path.rstrip('/')}/{page_number}/").geturl()
+
+def search_url(location:str, config:dict, page_number:int=1):
+    '''
+    Builds the search results URL for `location`, e.g. "New York, NY" -> /new-york-ny/ (page 2 -> /new-york-ny/2/).
+    '''
+    base = config.get("searchUrl", config.get("url")).rstrip("/")
+    slug = location_slug(location)
+    if page_number > 1:
+        return f"{base}/{slug}/{page_number}/"
+    return f"{base}/{slug}/"
+
+def location_slug(location:str):
+    '''"New York, NY" -> "new-york-ny"'''
+    return "-".join("".join(c if c.isalnum() else " " for c in location.lower()).split())
+
+async def fetch_pages(location:str, config:dict, headless:bool=True, callback=None, browser=None, budget=None, har=None, profiler=None,
+                      concurrency=None, get_browser=None):
+    '''
+    Fetches all result pages for `location` over plain HTTP, without a browser.
+
+    Each page is requested through one pooled async HTTP client with the same user agent and
+    locale as the browser. A page is only loaded in Playwright when its response doesn't contain
+    the `waitSelector` placards (e.g. a bot challenge), and the browser is launched lazily for that.
+
+    The first page's search heading tells how many pages there are, so the rest are fetched in
+    parallel, as many at a time as `concurrency` allows. If the count can't be read, pages are
+    walked one by one through the next-page link. Requests that time out or get an HTTP error are
+    retried before the browser gets the page; blocked (403) and challenged requests go to the
+    browser right away. The browser loads pages in as many tabs at once as `concurrency` allows.
+
+    Args:
+     - location: (str) The place you want to render listings for.
+     - config: (dict) A dict containing all the configurations for rendering.
+     - headless: (bool) Headless setting for the fallback browser.
+     - callback: (function) Optional callback for status updates.
+     - browser: (Browser) Optional already-launched browser to use for the fallback.
+     - get_browser: (async function) Optional source of a warm browser for the fallback; see `render`.
+     - budget: (Budget) Optional page and deadline limits.
+     - har: (dict) Optional HAR settings; see `render`.
+     - profiler: (MemoryProfiler) Optional memory profiler; see `render`.
+     - concurrency: (AdaptiveConcurrency) Optional page concurrency controller; see `render`.
+
+    Returns:
+     HTML of all the pages fetched.
+    '''
+    import httpx
+
+    NEXT_LINK_SELECTOR = config.get("items").get("nextLink").get("selector")
+    budget = budget or Budget()
+    concurrency = concurrency or AdaptiveConcurrency.from_config(config)
+
+    all_html = [] # html from all pages
+    fallback = _BrowserFallback(headless=headless, browser=browser, location=location, har=har, concurrency=concurrency,
+                                get_browser=get_browser)
+    url = search_url(location, config)
+
+    client_options = {}
+    recorder = None
+    if har is not None:
+        from utils.har import har_files, HarRecorder, replay_transport
+        http_har = har_files(location_slug(location), har)[1]
+        if har["mode"] == "record":
+            recorder = HarRecorder(http_har)
+        else:
+            try:
+                client_options["transport"] = replay_transport(http_har)
+            except OSError:
+                error_msg = f"Error: No HTTP recording for {location} at {http_har}"
                 print(error_msg)
                 if callback:
                     callback("status", error_msg)
                 return []
-        except Exception as e:
-            error_msg = f"Problem occurred: {e}. Check if your internet connection is working and try again."
+
+    async with httpx.AsyncClient(
+        headers=HTTP_HEADERS,
+        follow_redirects=True,
+        http2=http2_available(),
+        timeout=config.get("timeout") / 1000,
+        event_hooks={"response": [recorder.hook]} if recorder else {},
+        **client_options
+    ) as client:
+        try:
+            html, tree = await _load_page(client, fallback, url, 1, config, callback, concurrency, budget)
+            if html is None:
+                return []
+            all_html.append(html)
+            budget.pages += 1
+            checkpoint(profiler, "page 1 captured")
+
+            summary = parse_search_summary(tree, config)
+            total_pages = summary["total_pages"]
+            if total_pages and budget.page_limit(total_pages) < total_pages:
+                total_pages = budget.page_limit(total_pages)
+                status_msg = f"Limiting scrape to the first {total_pages} pages"
+                print(status_msg)
+                if callback:
+                    callback("status", status_msg)
+            if summary["total_results"] is not None:
+                status_msg = f"Found {summary['total_results']} results across {total_pages or 'an unknown number of'} pages"
+                print(status_msg)
+                if callback:
+                    callback("status", status_msg)
+            if callback:
+                callback("pages", {"current_page": 1, "total_pages": total_pages})
+
+            if total_pages:
+                # The full page set is known, so fetch the remaining pages in parallel
+                done = [1]
+
+                async def load(page_number):
+                    if budget.out_of_time():
+                        return None
+                    page_html, _ = await _load_page(
+                        client, fallback, search_url(location, config, page_number), page_number, config, callback, concurrency, budget
+                    )
+                    if page_html is not None:
+                        done[0] += 1
+                        checkpoint(profiler, f"page {page_number} captured")
+                        if callback:
+                            callback("pages", {"current_page": done[0], "total_pages": total_pages})
+                    if callback:
+                        callback("metrics", {"concurrency": concurrency.summary()})
+                    return page_html
+
+                pages = await asyncio.gather(*(load(n) for n in range(2, total_pages + 1)))
+                all_html.extend(page for page in pages if page is not None)
+                budget.pages = len(all_html)
+                _report_skipped(pages, concurrency, budget, callback)
+                if budget.reason:
+                    status_msg = f"Stopped fetching pages early: {budget.reason}"
+                    print(status_msg)
+                    if callback:
+                        callback("status", status_msg)
+            else:
+                # Page count unknown: follow the next-page links one at a time
+                counter = 1
+                while True:
+                    next_link = tree.css_first(NEXT_LINK_SELECTOR)
+                    href = next_link.attributes.get("href") if next_link else None
+                    if not href:
+                        status_msg = f"No further pages to scrape. Total pages: {counter}"
+                        print(status_msg)
+                        if callback:
+                            callback("status", status_msg)
+                        break
+
+                    if budget.pages_exhausted():
+                        status_msg = f"Stopping after page {counter}: {budget.reason or 'page limit reached'}"
+                        print(status_msg)
+                        if callback:
+                            callback("status", status_msg)
+                        break
+
+                    url = urljoin(url, href)
+                    status_msg = f"Moving to page {counter+1}..."
+                    print(status_msg)
+                    if callback:
+                        callback("status", status_msg)
+                    counter += 1
+
+                    html, tree = await _load_page(client, fallback, url, counter, config, callback, concurrency, budget)
+                    if html is None:
+                        break
+                    all_html.append(html)
+                    budget.pages += 1
+                    checkpoint(profiler, f"page {counter} captured")
+        finally:
+            await fallback.close()
+            if recorder is not None:
+                recorder.save()
+
+    status_msg = f"Successfully scraped {len(all_html)} pages ({fallback.pages} loaded in the browser)"
+    print(status_msg)
+    if callback:
+        callback("status", status_msg)
+
+    return all_html
+
+def parse_search_summary(tree, config:dict):
+    '''
+    Reads the result count and page count from a parsed results page.
+
+    The count comes from `items.searchHeading` (e.g. "1,234 Rentals"), the page count from
+    `items.pageRange` ("Page 1 of 28"), or failing that from the count and the placards per page.
+
+    Returns:
+     A dict with `total_results` and `total_pages`, either of which may be None.
+    '''
+    HEADING_SELECTOR = config.get("items").get("searchHeading").get("selector")
+    PAGE_RANGE_SELECTOR = config.get("items").get("pageRange").get("selector")
+    WAIT_SELECTOR = config.get("waitSelector")
+
+    total_results = None
+    heading = tree.css_first(HEADING_SELECTOR)
+    if heading is not None:
+        match = re.search(r"(\d[\d,]*)\s+(?:rentals|apartments|homes|properties|results|listings|units)",
+                          heading.text(separator=" "), re.IGNORECASE)
+        if match:
+            total_results = int(match.group(1).replace(",", ""))
+
+    total_pages = None
+    page_range = tree.css_first(PAGE_RANGE_SELECTOR)
+    if page_range is not None:
+        match = re.search(r"of\s+(\d+)", page_range.text(separator=" "))
+        if match:
+            total_pages = int(match.group(1))
+    if total_pages is None and total_results is not None:
+        per_page = len(tree.css(WAIT_SELECTOR))
+        if per_page:
+            total_pages = math.ceil(total_results / per_page)
+
+    return {"total_results": total_results, "total_pages": total_pages}
+
+async def _load_page(client, fallback, url:str, page_number:int, config:dict, callback=None, concurrency=None, budget=None):
+    '''
+    Loads one results page over HTTP, falling back to the browser when the listings are missing.
+
+    The request runs in a `concurrency` slot, and is retried (up to `concurrency.retries` times)
+    when it times out or gets an HTTP error. Blocked or challenged requests aren't retried.
+
+    Returns:
+     A `(html, tree)` tuple, or `(None, None)` if neither could load the page.
+    '''
+    from selectolax.parser import HTMLParser
+
+    TIMEOUT = config.get("timeout")
+    WAIT_SELECTOR = config.get("waitSelector")
+    CAPTCHA_SELECTOR = config.get("captchaSelector")
+    concurrency = concurrency or AdaptiveConcurrency.from_config(config)
+    budget = budget or Budget()
+
+    for attempt in range(concurrency.retries + 1):
+        async with concurrency.slot() as slot:
+            status_msg = f"Processing page {page_number}..."
+            print(status_msg)
+            if callback:
+                callback("status", status_msg)
+
+            html, outcome = await _fetch_html(client, url)
+            tree = HTMLParser(html) if html else None
+            if tree is not None and tree.css_first(WAIT_SELECTOR) is None:
+                # Challenge pages come back as 200s; anything else without listings falls through to the browser
+                outcome = "captcha" if CAPTCHA_SELECTOR and tree.css_first(CAPTCHA_SELECTOR) else "no_listings"
+            slot.done(outcome)
+
+        if outcome not in BACKOFF_OUTCOMES or outcome in BLOCKED_OUTCOMES or attempt == concurrency.retries or budget.out_of_time():
+            break
+        status_msg = f"Page {page_number} failed ({outcome}), retrying with {concurrency.limit()} pages at a time..."
+        print(status_msg)
+        if callback:
+            callback("status", status_msg)
+        await asyncio.sleep(2 ** attempt)
+
+    if tree is None or tree.css_first(WAIT_SELECTOR) is None:
+        status_msg = f"No listings in HTTP response for page {page_number}, loading it in the browser..."
+        print(status_msg)
+        if callback:
+            callback("status", status_msg)
+
+        html = await fallback.fetch(url, WAIT_SELECTOR, TIMEOUT)
+        if html is None:
+            error_msg = f"Problem occurred! Could not load page {page_number}: {url}"
             print(error_msg)
             if callback:
                 callback("status", error_msg)
-            return []
-  
\ No newline at end of file
+            return None, None
+        tree = HTMLParser(html)
+
+    status_msg = f"Capturing HTML from page {page_number}"
+    print(status_msg)
+    if callback:
+        callback("status", status_msg)
+    return html, tree
+
+async def _fetch_html(client, url:str):
+    '''
+    GETs `url`.
+
+    Returns:
+     A `(html, outcome)` tuple. `html` is the body, or None on network errors and non-200
+     responses; `outcome` is "ok", "timeout", "error" or a `status_outcome` of the response.
+    '''
+    import httpx
+
+    try:
+        response = await client.get(url)
+    except httpx.TimeoutException as e:
+        print(f"HTTP fetch timed out for {url}: {e!r}")
+        return None, "timeout"
+    except Exception as e:
+        print(f"HTTP fetch failed for {url}: {e}")
+        return None, "error"
+    if response.status_code != 200:
+        print(f"HTTP fetch for {url} returned {response.status_code}")
+        outcome = status_outcome(response.status_code)
+        return None, outcome if outcome != "ok" else "unavailable"
+    return response.text, "ok"
+
+class _BrowserFallback:
+    '''
+    Loads result pages in Playwright for `fetch_pages`, getting a browser only on first use.
+
+    Pages load in their own tabs of one context, each in a `concurrency` slot, so the browser
+    works through blocked pages as fast as the site's window allows.
+    '''
+    def __init__(self, headless:bool=True, browser=None, location:str=None, har=None, concurrency=None, get_browser=None):
+        self.browser = browser
+        # Without a warm browser from the caller, one is launched here on demand and closed with the fallback
+        self.launcher = LazyBrowser(headless) if browser is None and get_browser is None else None
+        self.get_browser = get_browser or self.launcher
+        self.location = location
+        self.har = har
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.context = None
+        self.pages = 0  # number of pages served by the browser
+        self.lock = asyncio.Lock()  # the context is opened once, by the first page that needs it
+
+    async def fetch(self, url:str, wait_selector:str, timeout:int):
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+        try:
+            async with self.lock:
+                if self.context is None:
+                    if self.browser is None:
+                        self.browser = await self.get_browser()
+                    self.context = await _new_context(self.browser, self.location, self.har)
+        except Exception as e:
+            print(f"Browser fallback failed for {url}: {e}")
+            return None
+
+        async with self.concurrency.slot() as slot:
+            page = await self.context.new_page()
+            try:
+                await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+                await page.wait_for_selector(wait_selector, timeout=timeout)
+                slot.done("ok")
+                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                await asyncio.sleep(3)
+                self.pages += 1
+                return await page.inner_html("body")
+            except PlaywrightTimeoutError as e:
+                slot.done("timeout")
+                print(f"Browser fallback timed out for {url}: {e}")
+                return None
+            except Exception as e:
+                slot.done("error")
+                print(f"Browser fallback failed for {url}: {e}")
+                return None
+            finally:
+                await page.close()
+
+    async def close(self):
+        if self.context is not None:
+            await self.context.close()
+        if self.launcher is not None:
+            await self.launcher.close()
@@ -0,0 +1,142 @@
+import asyncio
+from config.tools import read_json_cached
+from utils.budget import Budget
+from utils.concurrency import AdaptiveConcurrency
+from utils.jobs import page_progress
+from utils.render import render, location_slug, LazyBrowser
+
+# Searches for a large metro stop at the site's pagination cap, so only part of its listings are
+# ever reachable. Searching its neighborhoods (or zip codes) instead covers the whole area; the
+# sub-locations come from a local lookup table, `sharding.table` in the config.
+
+def plan_shards(location:str, config:dict, budget:Budget=None):
+    '''
+    Splits `location` into the sub-locations listed for it in the `sharding.table` file.
+
+    Locations are matched by their URL slug, so "new york ny" finds "New York, NY".
+
+    Args:
+     - location: (str) The location the user asked for.
+     - config: (dict) Scraper config.
+     - budget: (Budget) Optional job budget. When its page limit can't cover one page per
+       shard, the location is searched as a whole, since it won't reach the pagination cap.
+
+    Returns:
+     The locations to search: the shards, or `[location]` when it isn't sharded.
+    '''
+    settings = config.get("sharding") or {}
+    if not settings.get("enabled") or not settings.get("table"):
+        return [location]
+    try:
+        table = read_json_cached(settings["table"])
+    except (OSError, ValueError) as e:
+        print(f"Could not read shard table {settings['table']}: {e}")
+        return [location]
+
+    slug = location_slug(location)
+    shards = next((shards for key, shards in table.items() if location_slug(key) == slug), None)
+    if not shards:
+        return [location]
+    shards = list(dict.fromkeys(shards))
+    if budget is not None and budget.max_pages is not None and budget.max_pages - budget.pages < len(shards):
+        return [location]
+    return shards
+
+async def render_shards(location:str, shards:list, config:dict, headless:bool=True, callback=None, browser=None, budget=None,
+                        har=None, profiler=None, concurrency=None, get_browser=None):
+    '''
+    Renders the result pages of every shard of `location`, `sharding.concurrency` searches at a time.
+
+    Each search is a regular `utils.render.render` call in its own context on one shared browser:
+    `browser`, or the one `get_browser` returns, or else one launched here the first time a search
+    needs it (in "auto" fetch mode, only if a page has to go to the browser). All searches share `concurrency`, so the number of pages loading at once
+    across shards still follows the site's AIMD window, and each gets an even share of the
+    budget's page limit (see `Budget.split`).
+
+    Listings near the edge of two shards show up in both; they are merged downstream by the
+    job's address deduplicator (utils/dedup.py).
+
+    Args:
+     - location: (str) The sharded location, for status messages.
+     - shards: (list) Sub-locations from `plan_shards`.
+     - Other arguments as for `utils.render.render`.
+
+    Returns:
+     HTML body of all the pages rendered, in shard order.
+    '''
+    budget = budget or Budget()
+    concurrency = concurrency or AdaptiveConcurrency.from_config(config)
+
+    launcher = None
+    if browser is None and get_browser is None:
+        launcher = get_browser = LazyBrowser(headless)
+    try:
+        return await _render_shards(location, shards, config, headless, callback, browser, budget, har, profiler, concurrency,
+                                    get_browser)
+    finally:
+        if launcher is not None:
+            await launcher.close()
+
+async def _render_shards(location:str, shards:list, config:dict, headless:bool, callback, browser, budget, har, profiler, concurrency,
+                         get_browser):
+    status_msg = f"Splitting {location} into {len(shards)} searches to get past the pagination cap"
+    print(status_msg)
+    if callback:
+        callback("status", status_msg)
+
+    shares = budget.split(len(shards))
+    searches = asyncio.Semaphore(max(1, (config.get("sharding") or {}).get("concurrency", 3)))
+    progress = {}  # shard -> its latest page counts
+
+    async def run(shard, share):
+        async with searches:
+            if budget.out_of_time():
+                return []
+            shard_callback = _shard_callback(callback, shard, progress) if callback else None
+            pages = await render(shard, config, headless=headless, callback=shard_callback, browser=browser, budget=share,
+                                 har=har, profiler=profiler, concurrency=concurrency, get_browser=get_browser)
+            status_msg = f"{shard}: {len(pages)} pages"
+            print(status_msg)
+            if callback:
+                callback("log", status_msg)
+            return pages
+
+    results = await asyncio.gather(*(run(shard, share) for shard, share in zip(shards, shares)))
+    budget.pages += sum(share.pages for share in shares)
+    budget.out_of_time()
+
+    html_pages = [html for pages in results for html in pages]
+    status_msg = f"Scraped {len(html_pages)} pages across {len(shards)} searches for {location}"
+    empty = sum(1 for pages in results if not pages)
+    if empty:
+        status_msg += f" ({empty} returned no pages)"
+    print(status_msg)
+    if callback:
+        callback("status", status_msg)
+    return html_pages
+
+def _shard_callback(callback, shard:str, progress:dict):
+    '''
+    Tags a shard's status messages with its name and sums the page counts of all shards.
+
+    A shard's own page progress, whether from "pages" events or from the "Moving to page" messages
+    of a search that follows next-page links, is reported as the sum over all shards.
+    '''
+    def report(counts):
+        progress[shard] = counts
+        callback("pages", {
+            "current_page": sum(counts.get("current_page") or 0 for counts in progress.values()),
+            "total_pages": sum(counts.get("total_pages") or counts.get("current_page") or 0 for counts in progress.values()),
+        })
+
+    def shard_callback(update_type, data):
+        if update_type == "status":
+            counts = page_progress(data, progress.get(shard, {}))
+            if counts is not None:
+                report(counts)
+            callback("status", f"[{shard}] {data}")
+        elif update_type == "pages":
+            report(data)
+        else:
+            callback(update_type, data)
+    return shard_callback
@@ -0,0 +1,117 @@
+import time
+from utils.hedging import percentile
+
+class UsageLedger:
+    '''
+    Token, cost and latency accounting for one job, per listing and per page.
+
+    `utils.extractor.extract_property_data` records every listing it sends to the LLM with the
+    tokens each model of the cascade used for it (see `utils.llm.extract_listing`) and the
+    wall-clock seconds the extraction took. Costs come from `llmConfig.pricing`.
+    '''
+    def __init__(self, pricing:dict=None):
+        '''
+        Args:
+         - pricing: (dict) Model -> {"input": USD, "output": USD} per million tokens.
+        '''
+        self.pricing = pricing or {}
+        self.listings = []
+        self.unpriced = set()  # models used without a price, so the cost is a lower bound
+        self.first_started = None
+        self.last_finished = None
+
+    @classmethod
+    def from_config(cls, config:dict):
+        return cls(config.get("llmConfig", {}).get("pricing"))
+
+    def cost(self, usage:dict):
+        '''Estimated USD cost of `usage` (model -> token counts, see `utils.llm.add_usage`).'''
+        total = 0.0
+        for model, tokens in usage.items():
+            price = self.pricing.get(model)
+            if price is None:
+                self.unpriced.add(model)
+                continue
+            total += (tokens["prompt_tokens"] * price.get("input", 0) + tokens["completion_tokens"] * price.get("output", 0)) / 1e6
+        return total
+
+    def record(self, page:int, usage:dict, seconds:float, error:bool=False):
+        '''
+        Records one extracted listing.
+
+        Args:
+         - page: (int) Results page the listing is on.
+         - usage: (dict) Model -> token counts for this listing, filled in by `extract_listing`.
+         - seconds: (float) Wall-clock seconds the extraction took, escalations and hedges included.
+         - error: (bool) True if no model returned a usable record.
+
+        Returns:
+         The listing's entry.
+        '''
+        now = time.monotonic()
+        if self.first_started is None:
+            self.first_started = now - seconds
+        self.last_finished = now
+
+        # `usage` is kept as is: a hedged call that lost the race adds its tokens when it finishes
+        self.listings.append({"page": page, "usage": usage, "seconds": round(seconds, 3), "error": error})
+        return self._entry(self.listings[-1])
+
+    def page_summary(self, page:int):
+        '''Totals for the listings of one page.'''
+        return dict(_aggregate([self._entry(listing) for listing in self.listings if listing["page"] == page]), page=page)
+
+    def summary(self, per_listing:bool=True):
+        '''
+        Totals for the job, with one entry per page and, unless `per_listing` is False, per listing.
+        Leave the listings out of running totals reported during the job; they grow with every page.
+
+        `listings_per_minute` is measured from the start of the first extraction to the end of
+        the last, so it includes rate-limit pauses between listings but not page loading.
+        '''
+        entries = [self._entry(listing) for listing in self.listings]
+        pages = sorted({entry["page"] for entry in entries})
+        summary = _aggregate(entries)
+        elapsed = (self.last_finished - self.first_started) if entries else 0
+        summary.update({
+            "listings_per_minute": round(len(entries) * 60 / elapsed, 2) if elapsed else None,
+            "unpriced_models": sorted(self.unpriced),
+            "pages": [dict(_aggregate([entry for entry in entries if entry["page"] == page]), page=page) for page in pages],
+        })
+        if per_listing:
+            summary["per_listing"] = entries
+        return summary
+
+    def _entry(self, listing:dict):
+        usage = {model: dict(tokens) for model, tokens in list(listing["usage"].items())}
+        return {
+            "page": listing["page"],
+            "prompt_tokens": sum(tokens["prompt_tokens"] for tokens in usage.values()),
+            "completion_tokens": sum(tokens["completion_tokens"] for tokens in usage.values()),
+            "calls": sum(tokens["calls"] for tokens in usage.values()),
+            "server_seconds": round(sum(tokens["server_seconds"] for tokens in usage.values()), 3),
+            "seconds": listing["seconds"],
+            "cost": self.cost(usage),
+            "models": list(usage),
+            "error": listing["error"],
+        }
+
+def _aggregate(entries:list):
+    count = len(entries)
+    prompt_tokens = sum(entry["prompt_tokens"] for entry in entries)
+    completion_tokens = sum(entry["completion_tokens"] for entry in entries)
+    cost = sum(entry["cost"] for entry in entries)
+    seconds = sorted(entry["seconds"] for entry in entries)
+    return {
+        "listings": count,
+        "errors": sum(1 for entry in entries if entry["error"]),
+        "calls": sum(entry["calls"] for entry in entries),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "tokens_per_listing": round((prompt_tokens + completion_tokens) / count, 1) if count else None,
+        "cost": round(cost, 6),
+        "cost_per_listing": round(cost / count, 8) if count else None,
+        "seconds_per_listing": round(sum(seconds) / count, 3) if count else None,
+        "latency_p50": percentile(seconds, 50),
+        "latency_p90": percentile(seconds, 90),
+    }
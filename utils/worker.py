@@ -0,0 +1,270 @@
+import asyncio
+import multiprocessing
+import os
+import time
+import traceback
+
+class ScraperWorker:
+    '''
+    A long-lived scraper process that the app starts once and feeds jobs over a queue.
+
+    The worker imports the scraping stack once and keeps the Groq client and one browser per
+    headless setting warm between jobs, so a new job only pays for the scrape itself.
+    Jobs run concurrently, each in its own task with its own browser context and status
+    directory (see utils/jobs.py), where the app reads their progress and final state.
+    '''
+    def __init__(self):
+        # spawn gives the worker a clean interpreter instead of a fork of the Streamlit server
+        ctx = multiprocessing.get_context("spawn")
+        self.jobs = ctx.Queue()
+        self.process = ctx.Process(target=serve, args=(self.jobs,), daemon=True)
+        self.process.start()
+
+    def submit(self, job_id:str, location:str, headless:bool=True, limits:dict=None, profile:bool=False):
+        '''
+        Queues a registered scrape job for the worker.
+
+        Args:
+         - job_id: (str) Id from `JobRegistry.create`.
+         - location: (str) The place to scrape listings for.
+         - headless: (bool) Whether the browser should run headless.
+         - limits: (dict) Optional job budget, passed on to render_and_extract
+           (max_pages, max_listings, max_tokens, deadline).
+         - profile: (bool) Run the job under cProfile, writing the profile to its job directory.
+        '''
+        self.jobs.put({"job_id": job_id, "location": location, "headless": headless, "limits": limits, "profile": profile})
+
+    def cancel(self, job_id:str):
+        '''Stops a queued or running job; whatever it extracted so far is kept.'''
+        self.jobs.put({"cancel": job_id})
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        '''Asks the worker to exit once its running jobs are done.'''
+        if self.is_alive():
+            self.jobs.put(None)
+            self.process.join(timeout=10)
+
+def serve(jobs):
+    '''
+    Worker process entry point: runs jobs from `jobs` concurrently until it receives None.
+    '''
+    asyncio.run(_dispatch(jobs))
+
+async def _dispatch(jobs):
+    from utils.jobs import read_meta, update_meta
+
+    loop = asyncio.get_running_loop()
+    warm = _warm_state()
+    tasks = {}
+
+    try:
+        while True:
+            # Block on the queue in a thread so running jobs keep making progress
+            job = await loop.run_in_executor(None, jobs.get)
+            if job is None:
+                break
+            if "cancel" in job:
+                task = tasks.get(job["cancel"])
+                if task is not None:
+                    task.cancel()
+                    # A job cancelled before it claimed itself never gets to record that
+                    if (read_meta(job["cancel"]) or {}).get("state") == "queued":
+                        update_meta(job["cancel"], state="stopped", finished=time.time())
+                continue
+
+            task = asyncio.create_task(_run(job, warm))
+            tasks[job["job_id"]] = task
+            task.add_done_callback(lambda _, job_id=job["job_id"]: tasks.pop(job_id, None))
+
+        if tasks:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+    finally:
+        await _shutdown(warm)
+
+async def drain_queue(job_queue, store, worker_id:str, concurrency:int=1, settings:dict=None, stop_when_empty:bool=False):
+    '''
+    Distributed worker loop: leases location jobs from a shared queue and runs them.
+
+    Up to `concurrency` jobs run at once, sharing one warm browser and Groq client like the app's
+    worker. Each job keeps its lease alive with heartbeats while it runs and is cancelled if the
+    lease is lost (another worker then owns it). Results and metrics of finished jobs go to
+    `store`; failed jobs are handed back for a retry. On shutdown, running jobs are handed back
+    without counting the attempt.
+
+    Args:
+     - job_queue: (JobQueue) Shared queue, see utils/jobqueue.py.
+     - store: (ResultStore) Where results are written.
+     - worker_id: (str) Unique name of this worker, e.g. "host-pid".
+     - concurrency: (int) Jobs run at once by this worker.
+     - settings: (dict) The config's `distributed` section (leaseSeconds, heartbeatInterval,
+       retryDelay, pollInterval).
+     - stop_when_empty: (bool) Return once no job is pending or leased instead of polling forever.
+
+    Returns:
+     The number of jobs this worker completed.
+    '''
+    settings = settings or {}
+    lease_seconds = settings.get("leaseSeconds", 120)
+    poll_interval = settings.get("pollInterval", 2)
+    warm = _warm_state()
+    running = set()
+    completed = [0]
+
+    try:
+        while True:
+            if len(running) < concurrency:
+                job = await asyncio.to_thread(job_queue.lease, worker_id, lease_seconds)
+                if job is not None:
+                    task = asyncio.create_task(_run_leased(job, job_queue, store, worker_id, warm, settings, completed))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                    continue
+                if stop_when_empty and not running:
+                    counts = await asyncio.to_thread(job_queue.counts)
+                    if not counts["pending"] and not counts["leased"]:
+                        break
+            # Wait for a free slot, or for jobs to become available
+            if running:
+                await asyncio.wait(running, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(poll_interval)
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        await _shutdown(warm)
+    return completed[0]
+
+async def _run_leased(job:dict, job_queue, store, worker_id:str, warm:dict, settings:dict, completed:list):
+    '''Runs one leased queue job as a local job, then records the outcome in the queue and the store.'''
+    import run_scraper
+    from utils.jobs import JobRegistry, read_meta, read_metrics, read_status
+
+    location = job["location"]
+    options = job["options"]
+    # A local job for the status files and logs; the worker's own concurrency bounds these
+    job_id = JobRegistry(max_concurrent=None).create(location, owner=worker_id)
+    print(f"[{worker_id}] Job {job['id']} (attempt {job['attempts']}): {location} -> status/jobs/{job_id}")
+
+    runner = asyncio.current_task()
+    lease_lost = [False]
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(settings.get("heartbeatInterval", 20))
+            if not await asyncio.to_thread(job_queue.heartbeat, job, worker_id, settings.get("leaseSeconds", 120)):
+                lease_lost[0] = True
+                runner.cancel()
+                return
+
+    beat = asyncio.create_task(heartbeat())
+    error = None
+    try:
+        headless = options.get("headless", True)
+        properties = await run_scraper.run_job(job_id, location, headless, get_browser=_browser_source(warm, headless),
+                                               client=warm["client"], limits=options.get("limits"))
+    except asyncio.CancelledError:
+        if lease_lost[0]:
+            print(f"[{worker_id}] Lost the lease on job {job['id']}; another worker has it now")
+            return
+        # Shutting down: hand the job back for another worker
+        await asyncio.to_thread(job_queue.release, job, worker_id)
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        properties, error = None, str(e)
+    finally:
+        beat.cancel()
+
+    if (read_meta(job_id) or {}).get("state") == "done" and properties is not None:
+        await asyncio.to_thread(store.put, job["id"], location, worker_id, properties, read_metrics(job_id))
+        await asyncio.to_thread(job_queue.complete, job, worker_id)
+        completed[0] += 1
+    else:
+        # run_job reports its own errors in the job's status
+        error = error or read_status(job_id)
+        await asyncio.to_thread(job_queue.fail, job, worker_id, error, settings.get("retryDelay", 30))
+        print(f"[{worker_id}] Job {job['id']} failed: {error}")
+
+def _warm_state():
+    '''Loads .env and creates the shared Groq client; browsers are launched on demand by `_get_browser`.'''
+    # Import the scraping stack once for the lifetime of the worker
+    import dotenv
+
+    warm = {"playwright": None, "browsers": {}, "client": None, "lock": asyncio.Lock()}
+    dotenv.load_dotenv(".env")
+    api_key = os.environ.get("GROQ_API_KEY")
+    if api_key:
+        from main import get_config
+        from utils.llm import get_groq_client
+        warm["client"] = get_groq_client(api_key, get_config())
+    return warm
+
+async def _run(job:dict, warm:dict):
+    '''Runs one job; `run_scraper.run_job` records its progress and final state in the job's files.'''
+    import run_scraper
+    from main import get_config
+    from utils.jobs import JobReporter
+
+    job_id = job["job_id"]
+    reporter = JobReporter(job_id, flush_interval=None, log_config=get_config().get("logging"))
+    reporter.log(f"Worker picked up job {job_id} for {job['location']}")
+    try:
+        await run_scraper.run_job(
+            job_id,
+            job["location"],
+            job["headless"],
+            get_browser=_browser_source(warm, job["headless"]),
+            client=warm["client"],
+            limits=job.get("limits"),
+            cpu_profile=job.get("profile") or None
+        )
+    except asyncio.CancelledError:
+        # Stopped by the user; run_job has marked the job "stopped"
+        pass
+    except Exception as e:
+        traceback.print_exc()
+        reporter("status", f"Error: {e}")
+
+def _browser_source(warm:dict, headless:bool):
+    '''
+    The `get_browser` function handed to jobs: it returns the warm browser, launched on first use.
+
+    In "auto" fetch mode most pages never need a browser, so jobs only ask for it when a page
+    has to fall back to one.
+    '''
+    async def get_browser():
+        return await _get_browser(warm, headless)
+    return get_browser
+
+async def _get_browser(warm:dict, headless:bool):
+    '''
+    Returns the warm browser for `headless`, launching (or relaunching after a crash) on demand.
+    '''
+    from playwright.async_api import async_playwright
+    from main import install_browsers
+
+    # Jobs starting together must not launch duplicate browsers
+    async with warm["lock"]:
+        if warm["playwright"] is None:
+            await install_browsers()
+            warm["playwright"] = await async_playwright().start()
+
+        browser = warm["browsers"].get(headless)
+        if browser is None or not browser.is_connected():
+            browser = await warm["playwright"].chromium.launch(headless=headless)
+            warm["browsers"][headless] = browser
+        return browser
+
+async def _shutdown(warm:dict):
+    for browser in warm["browsers"].values():
+        try:
+            await browser.close()
+        except Exception:
+            pass
+    if warm["playwright"] is not None:
+        await warm["playwright"].stop()